@@ -1,8 +1,10 @@
+import os
 import sys
-sys.path.insert(0, r'C:\Users\KIRA\PycharmProjects\care')
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from database import SessionLocal
-from models import Patient
+import crud
+import schemas
 from datetime import date
 
 print("🚀 Adding patients requiring validation...")
@@ -10,44 +12,27 @@ print("🚀 Adding patients requiring validation...")
 db = SessionLocal()
 
 try:
-    # Create patients requiring validation
+    # Through crud, so the search index and the suggestions know them
     patients = [
-        Patient(
-            nom="Gharbi",
-            prenom="Sami",
-            phone="21655667788",
-            email="sami.g@email.tn",
-            date_naissance=date(1990, 4, 12),
+        crud.create_patient(db, schemas.PatientCreate(
+            nom=nom,
+            prenom=prenom,
+            phone=phone,
+            email=email,
+            date_naissance=date_naissance,
             requires_validation=True,
             notes="Nouveau patient - nécessite validation"
-        ),
-        Patient(
-            nom="Mejri",
-            prenom="Leila",
-            phone="21644556677",
-            email="leila.m@email.tn",
-            date_naissance=date(1985, 9, 25),
-            requires_validation=True,
-            notes="Nouveau patient - nécessite validation"
-        ),
-        Patient(
-            nom="Bouazizi",
-            prenom="Riadh",
-            phone="21633445566",
-            email="riadh.b@email.tn",
-            date_naissance=date(1978, 6, 8),
-            requires_validation=True,
-            notes="Nouveau patient - nécessite validation"
-        ),
+        ))
+        for nom, prenom, phone, email, date_naissance in [
+            ("Gharbi", "Sami", "21655667788", "sami.g@email.tn", date(1990, 4, 12)),
+            ("Mejri", "Leila", "21644556677", "leila.m@email.tn", date(1985, 9, 25)),
+            ("Bouazizi", "Riadh", "21633445566", "riadh.b@email.tn", date(1978, 6, 8)),
+        ]
     ]
 
-    db.add_all(patients)
-    db.commit()
-
     print(f"✅ Successfully added {len(patients)} patients requiring validation!")
     print("\n📋 Patients added:")
     for p in patients:
-        db.refresh(p)
         print(f"   • {p.prenom} {p.nom} (ID: {p.id}) - {p.phone}")
 
     print("\n🌐 Visit: http://127.0.0.1:8000/clients/valider")
@@ -0,0 +1,43 @@
+"""keyset pagination indexes
+
+Composite indexes backing the cursor pagination of /api/rdv
+(date, heure, id) and /api/patients (created_at, id).
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 09:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ("ix_appointments_date_heure_id", "appointments", ["date", "heure", "id"]),
+    ("ix_patients_created_at_id", "patients", ["created_at", "id"]),
+]
+
+
+def _existing_indexes(table: str) -> set:
+    inspector = sa.inspect(op.get_bind())
+    return {index["name"] for index in inspector.get_indexes(table)}
+
+
+def upgrade() -> None:
+    # Databases created by Base.metadata.create_all() already have them
+    for name, table, columns in INDEXES:
+        if name not in _existing_indexes(table):
+            op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    for name, table, _ in INDEXES:
+        if name in _existing_indexes(table):
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,55 @@
+"""daily statistics rollups
+
+Appointment counts per day and service, and payment totals per
+appointment day and mode, behind the dashboard statistics. crud updates
+them on every appointment or payment write, so they must exist before
+the application serves writes. Fill them after upgrading with
+`python rollups.py` (the application also backfills them at startup when
+they are empty).
+
+Revision ID: 0001a
+Revises: 0001
+Create Date: 2026-10-18 09:30:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001a'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Databases created by Base.metadata.create_all() already have them
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("daily_appointment_stats"):
+        op.create_table(
+            "daily_appointment_stats",
+            sa.Column("date", sa.Date(), nullable=False),
+            sa.Column("service_id", sa.Integer(), nullable=False),
+            sa.Column("total", sa.Integer(), nullable=False),
+            sa.Column("en_attente", sa.Integer(), nullable=False),
+            sa.Column("valide", sa.Integer(), nullable=False),
+            sa.Column("annule", sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint("date", "service_id"),
+        )
+    if not inspector.has_table("daily_revenue_stats"):
+        op.create_table(
+            "daily_revenue_stats",
+            sa.Column("date", sa.Date(), nullable=False),
+            sa.Column("total", sa.DECIMAL(12, 2), nullable=False),
+            sa.Column("espece", sa.DECIMAL(12, 2), nullable=False),
+            sa.Column("carte", sa.DECIMAL(12, 2), nullable=False),
+            sa.Column("virement", sa.DECIMAL(12, 2), nullable=False),
+            sa.Column("cheque", sa.DECIMAL(12, 2), nullable=False),
+            sa.PrimaryKeyConstraint("date"),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("daily_revenue_stats")
+    op.drop_table("daily_appointment_stats")
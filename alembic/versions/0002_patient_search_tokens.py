@@ -0,0 +1,37 @@
+"""patient search tokens
+
+Token side table used by patient search instead of LIKE '%term%' scans.
+Fill it after upgrading with `python search_index.py` (the application
+also backfills it at startup when it is empty).
+
+Revision ID: 0002
+Revises: 0001a
+Create Date: 2026-10-18 10:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table("patient_search_tokens"):
+        return
+    op.create_table(
+        "patient_search_tokens",
+        sa.Column("token", sa.String(length=64), nullable=False),
+        sa.Column("patient_id", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("token", "patient_id"),
+    )
+    op.create_index("ix_patient_search_tokens_patient_id_token", "patient_search_tokens", ["patient_id", "token"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_patient_search_tokens_patient_id_token", table_name="patient_search_tokens")
+    op.drop_table("patient_search_tokens")
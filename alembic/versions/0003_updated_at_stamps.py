@@ -0,0 +1,54 @@
+"""updated_at stamps
+
+Modification stamps on patients, services and appointments. /api/agenda
+derives its ETag from them. Existing rows start at their created_at (or
+now for services).
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 12:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+PRECISE_DATETIME = sa.DateTime().with_variant(mysql.DATETIME(fsp=6), "mysql")
+
+TABLES = [
+    ("patients", "created_at"),
+    ("services", "CURRENT_TIMESTAMP"),
+    ("appointments", "created_at"),
+]
+
+
+def _has_updated_at(table: str) -> bool:
+    inspector = sa.inspect(op.get_bind())
+    return any(column["name"] == "updated_at" for column in inspector.get_columns(table))
+
+
+def upgrade() -> None:
+    # Databases created by Base.metadata.create_all() already have them
+    for table, initial_value in TABLES:
+        if _has_updated_at(table):
+            continue
+        with op.batch_alter_table(table) as batch:
+            batch.add_column(sa.Column("updated_at", PRECISE_DATETIME, nullable=True))
+        op.execute(f"UPDATE {table} SET updated_at = {initial_value}")
+        with op.batch_alter_table(table) as batch:
+            batch.alter_column("updated_at", existing_type=PRECISE_DATETIME, nullable=False)
+
+
+def downgrade() -> None:
+    for table, _ in TABLES:
+        if _has_updated_at(table):
+            with op.batch_alter_table(table) as batch:
+                batch.drop_column("updated_at")
@@ -0,0 +1,45 @@
+"""cash register days
+
+Cash received per calendar day and payment mode, plus the end-of-day
+close. Replaces the scan of payments.created_at behind the "caisse du
+jour". Fill it after upgrading with `python rollups.py` (the application
+also backfills it at startup when it is empty).
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 14:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table("cash_register_days"):
+        return
+    op.create_table(
+        "cash_register_days",
+        sa.Column("date", sa.Date(), nullable=False),
+        sa.Column("total", sa.DECIMAL(12, 2), nullable=False),
+        sa.Column("espece", sa.DECIMAL(12, 2), nullable=False),
+        sa.Column("carte", sa.DECIMAL(12, 2), nullable=False),
+        sa.Column("virement", sa.DECIMAL(12, 2), nullable=False),
+        sa.Column("cheque", sa.DECIMAL(12, 2), nullable=False),
+        sa.Column("nb_paiements", sa.Integer(), nullable=False),
+        sa.Column("closed_at", sa.DateTime(), nullable=True),
+        sa.Column("closed_by", sa.Integer(), nullable=True),
+        sa.Column("closed_total", sa.DECIMAL(12, 2), nullable=True),
+        sa.ForeignKeyConstraint(["closed_by"], ["users.id"]),
+        sa.PrimaryKeyConstraint("date"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("cash_register_days")
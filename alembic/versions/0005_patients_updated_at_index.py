@@ -0,0 +1,35 @@
+"""patients updated_at index
+
+Lets each worker's in-memory patient index fetch only the patients
+changed since its last update, instead of reloading the table.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 09:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def _existing_indexes() -> set:
+    inspector = sa.inspect(op.get_bind())
+    return {index["name"] for index in inspector.get_indexes("patients")}
+
+
+def upgrade() -> None:
+    # Databases created by Base.metadata.create_all() already have it
+    if "ix_patients_updated_at" not in _existing_indexes():
+        op.create_index("ix_patients_updated_at", "patients", ["updated_at"])
+
+
+def downgrade() -> None:
+    if "ix_patients_updated_at" in _existing_indexes():
+        op.drop_index("ix_patients_updated_at", table_name="patients")
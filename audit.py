@@ -0,0 +1,129 @@
+"""
+Buffered audit-log writer.
+
+crud.create_audit_log() only enqueues the record; a background thread
+bulk-inserts the queue every AUDIT_FLUSH_INTERVAL seconds, or as soon as
+AUDIT_FLUSH_SIZE records are waiting. The business write therefore costs a
+single transaction, and audit rows are written in batches on their own
+connection. main.py starts the writer at startup and flushes it on
+shutdown. When the writer is not running (scripts, shell), records are
+written immediately.
+"""
+import enum
+import queue
+import threading
+import time
+from datetime import date, datetime, time as dtime
+from decimal import Decimal
+from typing import Optional
+
+from database import engine
+from models import AuditLog
+from config import get_settings
+
+settings = get_settings()
+
+
+def json_safe(value):
+    """Make audit metadata JSON-serializable (dates, Decimals, enums)"""
+    if isinstance(value, dict):
+        return {str(k): json_safe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return [json_safe(v) for v in value]
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, (datetime, date, dtime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+class AuditWriter:
+    def __init__(self, flush_size: int, flush_interval: float, queue_size: int):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._pending = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background thread and write everything still queued"""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def enqueue(self, record: dict):
+        if not self.running:
+            self._insert([record])
+            return
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            # Backpressure: never drop an audit record, write it inline instead
+            self._insert([record])
+
+    def flush(self):
+        """Drain the queue and bulk-insert it (also used by the background thread)"""
+        with self._lock:
+            while True:
+                try:
+                    self._pending.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, []
+            try:
+                self._insert(batch)
+            except Exception as e:
+                print(f"[AUDIT] Flush of {len(batch)} records failed, will retry: {e}")
+                self._pending = batch + self._pending
+
+    def _run(self):
+        next_flush = time.monotonic() + self.flush_interval
+        while not self._stop.is_set():
+            timeout = max(0.0, next_flush - time.monotonic())
+            if self._queue.qsize() >= self.flush_size or timeout == 0:
+                self.flush()
+                next_flush = time.monotonic() + self.flush_interval
+                continue
+            self._stop.wait(min(timeout, 0.05))
+
+    @staticmethod
+    def _insert(records: list):
+        with engine.begin() as conn:
+            conn.execute(AuditLog.__table__.insert(), records)
+
+
+audit_writer = AuditWriter(
+    flush_size=settings.AUDIT_FLUSH_SIZE,
+    flush_interval=settings.AUDIT_FLUSH_INTERVAL,
+    queue_size=settings.AUDIT_QUEUE_SIZE,
+)
+
+
+def record(user_id: Optional[int], action: str, target_table: str, target_id: Optional[int], metadata: dict = None):
+    audit_writer.enqueue({
+        "user_id": user_id,
+        "action": action,
+        "target_table": target_table,
+        "target_id": target_id,
+        "meta_data": json_safe(metadata) if metadata is not None else None,
+        "created_at": datetime.utcnow(),
+    })
@@ -1,21 +1,57 @@
+import os
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, NamedTuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from sqlalchemy.orm import Session
 from fastapi import Depends, HTTPException, status, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import RedirectResponse
 from fastapi.security import OAuth2PasswordBearer
 from models import User, UserRole
 from database import get_db
 from config import get_settings
+from cache import LRUCache, DataVersion, SharedGeneration
 
 settings = get_settings()
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login", auto_error=False)
 
 
+class Principal(NamedTuple):
+    """The authenticated user as seen by the routes (detached from any session)"""
+    id: int
+    username: str
+    role: UserRole
+    is_active: bool
+
+
+# Verified principals keyed by access token, so a cached request needs
+# neither the JWT decode nor the users lookup. Any user change clears the
+# cache in every worker (see invalidate_principals).
+principal_cache = LRUCache(maxsize=settings.AUTH_CACHE_SIZE, ttl=settings.AUTH_CACHE_TTL)
+principal_epoch = DataVersion()
+principal_generation = SharedGeneration(os.path.join(settings.SHARED_STATE_DIR, "principals.gen"))
+
+
+def _sync_principal_cache():
+    if principal_generation.changed():
+        principal_epoch.bump()
+        principal_cache.clear()
+
+
+def invalidate_principals():
+    """Drop cached principals here and in the other workers; call after a user change"""
+    principal_generation.bump()
+    principal_epoch.bump()
+    principal_cache.clear()
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
@@ -24,14 +60,68 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+class HashingOverloaded(Exception):
+    """Too many logins are already waiting for the password hashing pool"""
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a few dedicated threads so a burst of logins neither
+    blocks the event loop nor starves the threads that serve the other
+    routes. At most `workers + queue_size` calls are admitted at once; the
+    rest are refused immediately with HashingOverloaded.
+    """
+
+    def __init__(self, workers: int, queue_size: int):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._capacity = workers + queue_size
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    async def run(self, fn, *args):
+        with self._lock:
+            if self._in_flight >= self._capacity:
+                raise HashingOverloaded()
+            self._in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+
+password_hasher = PasswordHasher(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_QUEUE_SIZE)
+
+
 def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
     user = db.query(User).filter(User.username == username).first()
     if not user:
         return None
-    if not verify_password(password, user.password_hash):
+    valid, new_hash = pwd_context.verify_and_update(password, user.password_hash)
+    if not valid:
+        return None
+    if not user.is_active:
+        return None
+    if new_hash:
+        user.password_hash = new_hash
+        db.commit()
+    return user
+
+
+async def authenticate_user_async(db: Session, username: str, password: str) -> Optional[User]:
+    """authenticate_user for async routes: DB work in the threadpool, bcrypt in password_hasher"""
+    user = await run_in_threadpool(lambda: db.query(User).filter(User.username == username).first())
+    if not user:
+        return None
+    valid, new_hash = await password_hasher.run(pwd_context.verify_and_update, password, user.password_hash)
+    if not valid:
         return None
     if not user.is_active:
         return None
+    if new_hash:
+        # Cost factor changed since this hash was made: upgrade it transparently
+        user.password_hash = new_hash
+        await run_in_threadpool(db.commit)
     return user
 
 
@@ -54,27 +144,41 @@ def decode_token(token: str) -> Optional[dict]:
         return None
 
 
-def get_current_user_from_token(token: str, db: Session) -> Optional[User]:
+def get_current_user_from_token(token: str, db: Session) -> Optional[Principal]:
     if not token:
         return None
+    _sync_principal_cache()
+    principal = principal_cache.get(token, None)
+    if principal is not None:
+        return principal
+
     payload = decode_token(token)
     if payload is None:
         return None
     username: str = payload.get("sub")
     if username is None:
         return None
+    epoch = principal_epoch.value
     user = db.query(User).filter(User.username == username).first()
-    return user
+    if user is None or not user.is_active:
+        return None
+
+    principal = Principal(user.id, user.username, UserRole(user.role), user.is_active)
+    # Skip the cache if a user changed while we were reading, and never keep
+    # a principal past its token's expiry
+    if epoch == principal_epoch.value:
+        principal_cache.set(token, principal, ttl=payload.get("exp", 0) - time.time())
+    return principal
 
 
-def get_current_user_from_cookie(request: Request, db: Session = Depends(get_db)) -> Optional[User]:
+def get_current_user_from_cookie(request: Request, db: Session = Depends(get_db)) -> Optional[Principal]:
     token = request.cookies.get("access_token")
     if not token:
         return None
     return get_current_user_from_token(token, db)
 
 
-def require_login(request: Request, db: Session = Depends(get_db)) -> User:
+def require_login(request: Request, db: Session = Depends(get_db)) -> Principal:
     user = get_current_user_from_cookie(request, db)
     if not user:
         raise HTTPException(
@@ -84,7 +188,7 @@ def require_login(request: Request, db: Session = Depends(get_db)) -> User:
     return user
 
 
-def require_admin(current_user: User = Depends(require_login)) -> User:
+def require_admin(current_user: Principal = Depends(require_login)) -> Principal:
     if current_user.role != UserRole.admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -0,0 +1,91 @@
+"""
+Benchmark the /api/agenda read path on a busy month: column-projected,
+streamed rows (crud.get_agenda_events) versus the former ORM path that
+hydrated Appointment/Patient/Service through joinedload, capped at 1000.
+
+    python benchmarks/bench_agenda.py --events 20000
+
+Both paths build the same event dicts and serialize them to JSON. The
+legacy path is also run uncapped so the comparison is per event.
+"""
+import argparse
+import json
+import os
+from datetime import date, datetime, timedelta
+
+import common
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Database URL (default: SQLite file in benchmarks/.data)")
+    parser.add_argument("--events", type=int, default=20_000, help="Appointments in the benchmarked month")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--reuse", action="store_true", help="Reuse the dataset of a previous run")
+    args = parser.parse_args()
+
+    common.configure(args.url, name="agenda")
+    os.chdir(common.ROOT)
+
+    from database import engine, SessionLocal
+    import crud
+    from main import agenda_event
+
+    if not args.reuse:
+        print(f"Seeding {args.events:,} appointments over one month...")
+        common.reset_schema(engine)
+        common.seed(engine, appointments=args.events, patients=5000, span_days=30)
+
+    today = date.today()
+    start, end = today - timedelta(days=15), today + timedelta(days=15)
+
+    def legacy(limit):
+        # The former api_agenda body, starting from an empty identity map
+        db.expunge_all()
+        events = []
+        for appt in crud.get_appointments(db, date_from=start, date_to=end, limit=limit):
+            start_datetime = datetime.combine(appt.date, appt.heure)
+            color_map = {"en_attente": "#ffc107", "valide": "#28a745", "annule": "#dc3545"}
+            events.append({
+                "id": appt.id,
+                "title": f"{appt.patient.prenom} {appt.patient.nom} - {appt.service.nom}",
+                "start": start_datetime.isoformat(),
+                "end": (start_datetime + timedelta(minutes=30)).isoformat(),
+                "backgroundColor": color_map.get(appt.etat.value, "#6c757d"),
+                "borderColor": color_map.get(appt.etat.value, "#6c757d"),
+                "extendedProps": {
+                    "patientId": appt.patient_id,
+                    "patientName": f"{appt.patient.prenom} {appt.patient.nom}",
+                    "serviceName": appt.service.nom,
+                    "etat": appt.etat.value,
+                    "prix": float(appt.prix),
+                    "verse": float(appt.verse),
+                    "reste": float(appt.reste)
+                }
+            })
+        return json.dumps(events), len(events)
+
+    def projected():
+        events = [agenda_event(row) for row in crud.get_agenda_events(db, start, end)]
+        return json.dumps(events), len(events)
+
+    db = SessionLocal()
+    results = []
+    for label, fn in [
+        ("legacy ORM (limit 1000)", lambda: legacy(1000)),
+        ("legacy ORM (uncapped)", lambda: legacy(None)),
+        ("projected + streamed", projected),
+    ]:
+        with common.count_queries(engine) as counter:
+            _, count = fn()
+        timing = common.measure(fn, repeat=args.repeat)
+        per_event_us = timing["p50"] * 1000 / max(count, 1)
+        results.append((label, count, counter["queries"], f"{timing['p50']:.1f}", f"{timing['p95']:.1f}", f"{per_event_us:.1f}"))
+    db.close()
+
+    print()
+    common.print_table(["path", "events", "queries", "p50 ms", "p95 ms", "µs/event"], results)
+
+
+if __name__ == "__main__":
+    main()
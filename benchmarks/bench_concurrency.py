@@ -0,0 +1,103 @@
+"""
+Mixed-load latency benchmark for the HTTP routes.
+
+A few clients hammer heavy requests (by default the dashboard statistics
+and 100-row appointment pages) while light probes (patient and appointment detail) are
+sent at a steady pace. The light-request p99 shows whether heavy queries
+stall the event loop for everybody else.
+
+    python benchmarks/bench_concurrency.py --appointments 200000 --heavy-clients 4 --seconds 15
+
+The app runs in-process through httpx's ASGI transport, so no server is
+needed. Run the same script on an older checkout to get "before" figures.
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+
+import common
+
+
+async def run(args):
+    import httpx
+    import main
+
+    results = {"light": [], "heavy": []}
+    deadline = time.perf_counter() + args.seconds
+
+    async with main.lifespan(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            r = await client.post("/login", data={"username": "admin", "password": "admin123"})
+            assert r.status_code in (302, 303), r.text
+            cookies = dict(client.cookies)
+
+            async def worker(kind: str, seed: int):
+                rng = random.Random(seed)
+                async with httpx.AsyncClient(transport=transport, base_url="http://bench", cookies=cookies) as c:
+                    while time.perf_counter() < deadline:
+                        if kind == "heavy":
+                            url = rng.choice(args.heavy_urls)
+                        else:
+                            url = rng.choice([
+                                f"/api/patients/{rng.randrange(1, args.appointments // 10)}",
+                                f"/api/rdv/{rng.randrange(1, args.appointments)}",
+                            ])
+                        start = time.perf_counter()
+                        response = await c.get(url)
+                        results[kind].append((time.perf_counter() - start) * 1000)
+                        assert response.status_code == 200, (url, response.status_code)
+                        if kind == "light":
+                            await asyncio.sleep(args.probe_interval)
+
+            tasks = [worker("heavy", i) for i in range(args.heavy_clients)]
+            tasks += [worker("light", 1000 + i) for i in range(args.light_clients)]
+            await asyncio.gather(*tasks)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Database URL (default: SQLite file in benchmarks/.data)")
+    parser.add_argument("--appointments", type=int, default=200_000)
+    parser.add_argument("--heavy-clients", type=int, default=4, help="Clients sending heavy requests back to back")
+    parser.add_argument("--light-clients", type=int, default=4, help="Clients sending light probes")
+    parser.add_argument("--probe-interval", type=float, default=0.02, help="Pause between two probes of a light client (s)")
+    parser.add_argument("--seconds", type=float, default=15)
+    parser.add_argument("--heavy-urls", nargs="+", default=["/api/stats/overview", "/api/rdv?limit=100"])
+    parser.add_argument("--reuse", action="store_true", help="Reuse the dataset of a previous run")
+    args = parser.parse_args()
+
+    common.configure(args.url, name="concurrency")
+    # Measure the queries themselves, not the statistics cache
+    os.environ["STATS_CACHE_SIZE"] = "0"
+    os.chdir(common.ROOT)
+
+    from database import engine, SessionLocal
+    from models import User
+    from auth import get_password_hash
+
+    if not args.reuse:
+        print(f"Seeding {args.appointments:,} appointments...")
+        common.reset_schema(engine)
+        common.seed(engine, appointments=args.appointments)
+        db = SessionLocal()
+        db.add(User(username="admin", password_hash=get_password_hash("admin123"), role="admin"))
+        db.commit()
+        db.close()
+
+    results = asyncio.run(run(args))
+
+    rows = []
+    for kind, samples in results.items():
+        summary = common.summarize(samples)
+        rows.append((kind, summary["n"], f"{summary['p50']:.1f}", f"{summary['p95']:.1f}", f"{summary['p99']:.1f}"))
+    print()
+    common.print_table(["requests", "count", "p50 ms", "p95 ms", "p99 ms"], rows)
+
+
+if __name__ == "__main__":
+    main()
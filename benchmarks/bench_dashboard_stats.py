@@ -0,0 +1,58 @@
+"""
+Benchmark stats.get_dashboard_stats: statements per call and latency.
+
+    python benchmarks/bench_dashboard_stats.py --sizes 100000 1000000
+    python benchmarks/bench_dashboard_stats.py --url mysql+pymysql://root:@localhost/clinic_bench
+"""
+import argparse
+from datetime import date, timedelta
+
+import common
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Database URL (default: SQLite file in benchmarks/.data)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    common.configure(args.url, name="dashboard_stats")
+
+    from database import engine, SessionLocal
+    from stats import get_dashboard_stats
+    from rollups import rebuild_rollups
+
+    today = date.today()
+    scenarios = [
+        ("all time", None, None),
+        ("last 30 days", today - timedelta(days=30), today),
+    ]
+
+    results = []
+    for size in args.sizes:
+        print(f"Seeding {size:,} appointments...")
+        common.reset_schema(engine)
+        common.seed(engine, appointments=size)
+        db = SessionLocal()
+        try:
+            rebuild_rollups(db)
+        finally:
+            db.close()
+
+        for label, date_from, date_to in scenarios:
+            db = SessionLocal()
+            try:
+                with common.count_queries(engine) as counter:
+                    get_dashboard_stats(db, date_from, date_to)
+                timing = common.measure(lambda: get_dashboard_stats(db, date_from, date_to), repeat=args.repeat)
+            finally:
+                db.close()
+            results.append((f"{size:,}", label, counter["queries"], f"{timing['p50']:.1f}", f"{timing['p95']:.1f}"))
+
+    print()
+    common.print_table(["appointments", "range", "queries", "p50 ms", "p95 ms"], results)
+
+
+if __name__ == "__main__":
+    main()
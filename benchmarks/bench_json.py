@@ -0,0 +1,117 @@
+"""
+Benchmark the fast JSON path of the list endpoints (fast_json.py) against
+the response_model path, for /api/rdv, /api/patients and /api/services.
+
+    python benchmarks/bench_json.py --rows 100 1000
+
+"request" times the whole route through a test client, with
+FAST_JSON_RESPONSES off then on; both answers are checked to be identical.
+The other columns time the encoding alone on the same page: response_model
+validation of the ORM objects plus stdlib json (the former path), a
+prebuilt TypeAdapter validating and dumping the ORM objects, and the row
+objects encoded with orjson (the fast path).
+"""
+import argparse
+import asyncio
+import json
+import os
+from typing import List
+
+import common
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Database URL (default: SQLite file in benchmarks/.data)")
+    parser.add_argument("--appointments", type=int, default=50_000)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000], help="Page sizes (limit=)")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--reuse", action="store_true", help="Reuse the dataset of a previous run")
+    args = parser.parse_args()
+
+    common.configure(args.url, name="json")
+    os.chdir(common.ROOT)
+
+    from fastapi.routing import serialize_response
+    from fastapi.testclient import TestClient
+    from fastapi.utils import create_model_field
+    from pydantic import TypeAdapter
+    from database import engine, SessionLocal
+    from models import User
+    from auth import get_password_hash
+    import crud
+    import fast_json
+    import main as app_main
+    import schemas
+
+    if not args.reuse:
+        print(f"Seeding {args.appointments:,} appointments...")
+        common.reset_schema(engine)
+        common.seed(engine, appointments=args.appointments)
+        db = SessionLocal()
+        db.add(User(username="admin", password_hash=get_password_hash("admin123"), role="admin"))
+        db.commit()
+        db.close()
+
+    db = SessionLocal()
+    endpoints = [
+        ("/api/rdv", schemas.AppointmentResponse,
+         lambda limit: crud.get_appointments(db, limit=limit),
+         lambda limit: crud.get_appointment_rows(db, limit=limit)),
+        ("/api/patients", schemas.PatientResponse,
+         lambda limit: crud.get_patients(db, limit=limit),
+         lambda limit: crud.get_patient_rows(db, limit=limit)),
+        ("/api/services", schemas.ServiceResponse,
+         lambda limit: crud.get_services(db),
+         lambda limit: fast_json.to_rows(schemas.ServiceResponse, crud.get_services(db))),
+    ]
+
+    with TestClient(app_main.app) as client:
+        r = client.post("/login", data={"username": "admin", "password": "admin123"}, follow_redirects=False)
+        assert r.status_code in (302, 303), r.text
+
+        results = []
+        for path, schema, load_orm, load_rows in endpoints:
+            field = create_model_field(name="response", type_=List[schema], mode="serialization")
+            adapter = TypeAdapter(List[schema])
+            for limit in args.rows if path != "/api/services" else [None]:
+                url = path if limit is None else f"{path}?limit={limit}"
+
+                def request(fast):
+                    app_main.settings.FAST_JSON_RESPONSES = fast
+                    response = client.get(url)
+                    assert response.status_code == 200, response.text
+                    return response.content
+
+                assert request(False) == request(True), f"{url}: fast path output differs"
+                before = common.measure(lambda: request(False), repeat=args.repeat)
+                after = common.measure(lambda: request(True), repeat=args.repeat)
+
+                objects, rows = load_orm(limit), load_rows(limit)
+
+                def response_model():
+                    content = asyncio.run(serialize_response(field=field, response_content=objects))
+                    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+
+                encoders = [
+                    response_model,
+                    lambda: adapter.dump_json(adapter.validate_python(objects, from_attributes=True)),
+                    lambda: fast_json.dumps(rows),
+                ]
+                timings = [common.measure(encode, repeat=args.repeat)["p50"] for encode in encoders]
+                results.append((
+                    url, len(rows),
+                    f"{before['p50']:.2f}", f"{after['p50']:.2f}", f"{before['p50'] / after['p50']:.1f}x",
+                    *(f"{t:.2f}" for t in timings),
+                ))
+    db.close()
+
+    print()
+    common.print_table([
+        "endpoint", "rows", "request p50 ms", "fast request p50 ms", "speedup",
+        "response_model ms", "TypeAdapter ms", "rows + orjson ms",
+    ], results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Login throughput benchmark.
+
+`--clients` concurrent clients POST /login back to back (a shift-change
+burst, or credential stuffing when --bad-ratio is raised) while a probe
+fetches a light async page at a steady pace. Reported: successful logins
+per second, login latency, how many attempts were shed with a 429, the
+probe latency and how late the event loop wakes the probe up, which shows
+whether bcrypt stalls the loop.
+
+    python benchmarks/bench_login.py --clients 32 --seconds 10
+    python benchmarks/bench_login.py --clients 64 --bad-ratio 0.9 --rounds 12
+
+The app runs in-process through httpx's ASGI transport, so no server is
+needed. Run the same script on an older checkout to get "before" figures.
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+
+import common
+
+
+async def run(args):
+    import httpx
+    import main
+
+    results = {"login": [], "probe": [], "loop lag": []}
+    counts = {"ok": 0, "refused": 0, "shed": 0}
+    deadline = time.perf_counter() + args.seconds
+
+    async with main.lifespan(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+
+        async def login_client(seed: int):
+            rng = random.Random(seed)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as c:
+                while time.perf_counter() < deadline:
+                    password = "wrong-password" if rng.random() < args.bad_ratio else "staff123"
+                    start = time.perf_counter()
+                    response = await c.post("/login", data={"username": f"staff{rng.randrange(args.users)}", "password": password})
+                    elapsed = (time.perf_counter() - start) * 1000
+                    if response.status_code == 429:
+                        counts["shed"] += 1
+                        await asyncio.sleep(float(response.headers.get("Retry-After", 1)) * rng.random())
+                        continue
+                    results["login"].append(elapsed)
+                    counts["ok" if response.status_code in (302, 303) else "refused"] += 1
+
+        async def probe():
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as c:
+                while time.perf_counter() < deadline:
+                    start = time.perf_counter()
+                    response = await c.get("/login")
+                    results["probe"].append((time.perf_counter() - start) * 1000)
+                    assert response.status_code == 200, response.status_code
+                    # How late the event loop wakes us up is a direct measure of blocking
+                    wake_at = time.perf_counter() + args.probe_interval
+                    await asyncio.sleep(args.probe_interval)
+                    results["loop lag"].append((time.perf_counter() - wake_at) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(probe(), *[login_client(i) for i in range(args.clients)])
+        counts["seconds"] = time.perf_counter() - started
+
+    return results, counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Database URL (default: SQLite file in benchmarks/.data)")
+    parser.add_argument("--clients", type=int, default=32, help="Concurrent login clients")
+    parser.add_argument("--users", type=int, default=20, help="Staff accounts to log in as")
+    parser.add_argument("--bad-ratio", type=float, default=0.0, help="Share of attempts with a wrong password")
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost factor")
+    parser.add_argument("--probe-interval", type=float, default=0.01, help="Pause between two probes (s)")
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    common.configure(args.url, name="login")
+    os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+    os.chdir(common.ROOT)
+
+    from database import engine, SessionLocal
+    from models import User
+    from auth import get_password_hash
+
+    common.reset_schema(engine)
+    password_hash = get_password_hash("staff123")
+    db = SessionLocal()
+    db.add_all([User(username=f"staff{i}", password_hash=password_hash, role="staff") for i in range(args.users)])
+    db.commit()
+    db.close()
+
+    results, counts = asyncio.run(run(args))
+
+    rows = []
+    for kind, samples in results.items():
+        summary = common.summarize(samples)
+        rows.append((kind, summary["n"], f"{summary['p50']:.1f}", f"{summary['p95']:.1f}", f"{summary['p99']:.1f}"))
+    print()
+    common.print_table(["requests", "count", "p50 ms", "p95 ms", "p99 ms"], rows)
+    print()
+    print(f"logins/s: {counts['ok'] / counts['seconds']:.1f}  refused: {counts['refused']}  shed (429): {counts['shed']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Overhead of the request metrics middleware (metrics.py).
+
+    python benchmarks/bench_metrics.py --requests 200000
+
+Calls a minimal ASGI app directly, with and without MetricsMiddleware, so
+the difference is the middleware alone (no HTTP parsing, no database). Also
+times the /metrics exposition with a registry holding every route of the
+application and the status codes they typically return.
+"""
+import argparse
+import asyncio
+import time
+
+import common
+
+
+async def _receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def _send(message):
+    pass
+
+
+class _Route:
+    path = "/api/rdv/{appointment_id}"
+
+
+async def app(scope, receive, send):
+    # What the router does: record the matched route in the scope
+    scope["route"] = _Route
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def run(target, requests: int) -> float:
+    start = time.perf_counter()
+    for _ in range(requests):
+        scope = {"type": "http", "method": "GET", "path": "/api/rdv/1"}
+        await target(scope, _receive, _send)
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200_000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    common.configure(name="metrics")
+    import metrics
+    import main as app_main
+
+    registry = metrics.MetricsRegistry()
+    wrapped = metrics.MetricsMiddleware(app, registry)
+
+    bare, measured = [], []
+    for _ in range(args.rounds):
+        bare.append(asyncio.run(run(app, args.requests)))
+        measured.append(asyncio.run(run(wrapped, args.requests)))
+    bare_us, measured_us = min(bare), min(measured)
+
+    # Exposition cost with every application route and a few statuses
+    paths = [route.path for route in app_main.app.routes if hasattr(route, "methods")]
+    for path in paths:
+        for status in (200, 304, 400, 404, 500):
+            registry.start("GET")
+            registry.finish("GET", path, status, 0.012, 4096)
+    render = common.measure(lambda: metrics.render([registry.snapshot()]), repeat=50)
+
+    print()
+    common.print_table(["path", "µs/request"], [
+        ("bare ASGI app", f"{bare_us:.2f}"),
+        ("with MetricsMiddleware", f"{measured_us:.2f}"),
+        ("middleware overhead", f"{measured_us - bare_us:.2f}"),
+    ])
+    print()
+    common.print_table(["exposition", "routes", "series", "p50 ms"], [
+        ("/metrics render", len(paths), len(registry.requests), f"{render['p50']:.2f}"),
+    ])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Benchmark the in-memory patient prefix index (patient_index.py): build time,
+memory footprint, suggestion latency versus the database typeahead, and the
+cost of patching it after a patient write.
+
+    python benchmarks/bench_patient_index.py --patients 1000000
+
+Memory is measured with tracemalloc: "resident" is what the built index
+keeps, "build peak" includes the temporary sort arrays.
+"""
+import argparse
+import gc
+import itertools
+import time
+import tracemalloc
+
+import common
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Database URL (default: SQLite file in benchmarks/.data)")
+    parser.add_argument("--patients", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=10, help="Suggestions per keystroke, as used by the pickers")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--reuse", action="store_true", help="Reuse the dataset of a previous run")
+    args = parser.parse_args()
+
+    common.configure(args.url, name="patient_index")
+
+    from sqlalchemy import select
+    from database import engine, SessionLocal
+    from models import Patient
+    from search_index import rebuild_search_index, search_terms
+    from patient_index import PrefixIndex
+    import crud
+
+    db = SessionLocal()
+    if not args.reuse:
+        print(f"Seeding {args.patients:,} patients...")
+        common.reset_schema(engine)
+        common.seed(engine, appointments=1000, patients=args.patients)
+        rebuild_search_index(db)
+
+    def load():
+        rows = db.execute(
+            select(Patient.id, Patient.nom, Patient.prenom, Patient.phone).order_by(Patient.id)
+            .execution_options(yield_per=10000)
+        )
+        return PrefixIndex.from_rows(rows)
+
+    start = time.perf_counter()
+    index = load()
+    build_s = time.perf_counter() - start
+    del index
+    gc.collect()
+
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    index = load()
+    gc.collect()
+    resident, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    resident_mb, peak_mb = (resident - base) / 1e6, (peak - base) / 1e6
+
+    print()
+    common.print_table(["patients", "index entries", "build s", "resident MB", "build peak MB", "bytes/patient"], [(
+        f"{index.size:,}", f"{len(index._keys):,}", f"{build_s:.1f}", f"{resident_mb:.0f}", f"{peak_mb:.0f}",
+        f"{(resident - base) // max(index.size, 1)}",
+    )])
+
+    sample = db.query(Patient).filter(Patient.id == args.patients // 2).one()
+    searches = [
+        ("2 letters", "mo"),
+        ("name prefix", "tra"),
+        ("nom + prenom", f"{sample.nom} {sample.prenom[:3]}"),
+        ("phone prefix", sample.phone[:4]),
+        ("full phone", sample.phone),
+    ]
+
+    # The live index is not started in this process, so crud.suggest_patients
+    # takes its database path (the fallback while an index is being built)
+    results = []
+    for label, term in searches:
+        terms = search_terms(term)
+        found = len(index.search(terms, args.limit))
+        memory = common.measure(lambda: index.search(terms, args.limit), repeat=args.repeat)
+        database = common.measure(lambda: crud.suggest_patients(db, term, args.limit), repeat=20)
+        results.append((
+            label, repr(term), found,
+            f"{memory['p50'] * 1000:.0f}", f"{memory['p99'] * 1000:.0f}", f"{database['p50'] * 1000:.0f}",
+        ))
+    print()
+    common.print_table(["search", "term", "hits", "index p50 µs", "index p99 µs", "database p50 µs"], results)
+
+    ids = itertools.count(index._ids[-1] + 1)
+    created = []
+
+    def create():
+        created.append(next(ids))
+        index.put(created[-1], "Nouveau", "Patient", "29999999")
+
+    put = common.measure(create, repeat=20)
+    rename = common.measure(lambda: index.put(created[-1], "Renomme", "Patient", "29999998"), repeat=20)
+    remove = common.measure(lambda: index.remove(created.pop()), repeat=20)
+    print()
+    common.print_table(["write", "p50 ms"], [
+        ("create_patient", f"{put['p50']:.2f}"),
+        ("update_patient", f"{rename['p50']:.2f}"),
+        ("delete_patient", f"{remove['p50']:.2f}"),
+    ])
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
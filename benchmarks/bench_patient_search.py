@@ -0,0 +1,65 @@
+"""
+Benchmark patient search: token index (crud.get_patients) versus the former
+LIKE '%term%' scan over nom/prenom/phone/email.
+
+    python benchmarks/bench_patient_search.py --patients 500000
+"""
+import argparse
+
+import common
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Database URL (default: SQLite file in benchmarks/.data)")
+    parser.add_argument("--patients", type=int, default=500_000)
+    parser.add_argument("--limit", type=int, default=20, help="Page size, as used by the pickers")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--reuse", action="store_true", help="Reuse the dataset of a previous run")
+    args = parser.parse_args()
+
+    common.configure(args.url, name="patient_search")
+
+    from sqlalchemy import or_
+    from database import engine, SessionLocal
+    from models import Patient
+    from search_index import rebuild_search_index
+    import crud
+
+    db = SessionLocal()
+    if not args.reuse:
+        print(f"Seeding {args.patients:,} patients...")
+        common.reset_schema(engine)
+        common.seed(engine, appointments=1000, patients=args.patients)
+        rebuild_search_index(db)
+
+    sample = db.query(Patient).filter(Patient.id == args.patients // 2).one()
+
+    searches = [
+        ("name prefix", "tra"),
+        ("nom + prenom", f"{sample.nom} {sample.prenom}"),
+        ("accent-insensitive", "helene"),
+        ("phone prefix", sample.phone[:5]),
+        ("full phone", f"+216 {sample.phone[:2]} {sample.phone[2:5]} {sample.phone[5:]}"),
+    ]
+
+    def legacy(term):
+        like = f"%{term}%"
+        return db.query(Patient).filter(or_(
+            Patient.nom.like(like), Patient.prenom.like(like), Patient.phone.like(like), Patient.email.like(like)
+        )).order_by(Patient.created_at.desc()).limit(args.limit).all()
+
+    results = []
+    for label, term in searches:
+        found = len(crud.get_patients(db, limit=args.limit, search=term))
+        indexed = common.measure(lambda: crud.get_patients(db, limit=args.limit, search=term), repeat=args.repeat)
+        scan = common.measure(lambda: legacy(term), repeat=3)
+        results.append((label, repr(term), found, f"{indexed['p50']:.2f}", f"{indexed['p99']:.2f}", f"{scan['p50']:.1f}"))
+    db.close()
+
+    print()
+    common.print_table(["search", "term", "rows", "index p50 ms", "index p99 ms", "LIKE scan p50 ms"], results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Every script runs against a throw-away SQLite file by default (or the URL
+given with --url) so it can be launched without touching the clinic database:
+
+    python benchmarks/bench_dashboard_stats.py --sizes 100000 1000000
+"""
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+import time
+import random
+import statistics
+from contextlib import contextmanager
+from datetime import date, datetime, time as dtime, timedelta
+
+# Ensure project root is on sys.path so `import database` works from benchmarks/
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+DATA_DIR = os.path.join(ROOT, "benchmarks", ".data")
+
+NOMS = [
+    "Ben Ali", "Trabelsi", "Gharbi", "Hammami", "Jaziri", "Mansour", "Bouazizi", "Chaabane", "Khelifi", "Sassi",
+    "Ayari", "Baccouche", "Belhaj", "Ben Salah", "Bouzid", "Chebbi", "Dridi", "Ferchichi", "Guesmi", "Hadded",
+    "Jebali", "Kefi", "Laabidi", "Mabrouk", "Mejri", "Nasri", "Ouni", "Rekik", "Saidi", "Slimani",
+    "Tlili", "Zouari", "Abidi", "Baklouti", "Charfi", "Dhouib", "Elloumi", "Fourati", "Karoui", "Masmoudi",
+]
+PRENOMS = [
+    "Mohamed", "Ahmed", "Amira", "Sami", "Leila", "Youssef", "Ines", "Karim", "Nour", "Hela",
+    "Aymen", "Bilel", "Chaima", "Dorra", "Emna", "Farah", "Ghassen", "Hamza", "Islem", "Jihen",
+    "Khalil", "Lina", "Malek", "Nadia", "Oussama", "Rania", "Salma", "Tarek", "Wassim", "Yasmine",
+    "Zied", "Hédi", "Mériem", "Sonia", "Hélène", "Anis", "Asma", "Fatma", "Walid", "Rim",
+]
+SERVICES = [
+    ("Consultation", 50), ("Détartrage", 80), ("Plombage", 120), ("Couronne", 400),
+    ("Implant", 1500), ("Blanchiment", 300), ("Extraction", 90), ("Radiographie", 60),
+]
+ETATS = ["en_attente", "valide", "valide", "valide", "annule"]
+MODES = ["espece", "espece", "carte", "virement", "cheque"]
+
+
+def configure(url: str = None, name: str = "bench"):
+    """
+    Point the application modules at the benchmark database. Must be called
+    before importing `database`, `crud`, `stats` or `main`.
+    """
+    if url is None:
+        os.makedirs(DATA_DIR, exist_ok=True)
+        url = f"sqlite:///{os.path.join(DATA_DIR, name + '.db')}"
+    os.environ["DATABASE_URL"] = url
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+    # Keep the cache generations and metrics snapshots of the benchmark app
+    # away from a server running on the same host
+    if "SHARED_STATE_DIR" not in os.environ:
+        state_dir = tempfile.mkdtemp(prefix="clinic_bench_state_")
+        atexit.register(shutil.rmtree, state_dir, ignore_errors=True)
+        os.environ["SHARED_STATE_DIR"] = state_dir
+    return url
+
+
+@contextmanager
+def count_queries(engine):
+    """Count the statements sent through `engine` inside the block"""
+    from sqlalchemy import event
+
+    counter = {"queries": 0}
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        counter["queries"] += 1
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def measure(fn, repeat: int = 5, warmup: int = 1) -> dict:
+    """Run `fn` and return latency figures in milliseconds"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
+
+
+def summarize(samples_ms) -> dict:
+    ordered = sorted(samples_ms)
+
+    def pct(p):
+        if not ordered:
+            return 0.0
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    return {
+        "n": len(ordered),
+        "mean": statistics.fmean(ordered) if ordered else 0.0,
+        "p50": pct(50),
+        "p95": pct(95),
+        "p99": pct(99),
+    }
+
+
+def reset_schema(engine):
+    from database import Base
+    import models  # noqa: F401 - registers the tables on Base.metadata
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+
+def seed(engine, appointments: int, patients: int = None, payments_ratio: float = 0.6, seed_value: int = 42, batch: int = 20000, span_days: int = 730):
+    """
+    Bulk-load a synthetic dataset with Core inserts. Appointments are spread
+    over the `span_days` days centred on today (two years by default);
+    roughly `payments_ratio` of them get a payment.
+    """
+    from models import Patient, Service, Appointment, Payment
+
+    rng = random.Random(seed_value)
+    patients = patients or max(10, appointments // 10)
+    today = date.today()
+    first_day = today - timedelta(days=span_days // 2)
+
+    with engine.begin() as conn:
+        conn.execute(Service.__table__.insert(), [
+            {"nom": nom, "description": None, "prix_base": prix, "actif": True} for nom, prix in SERVICES
+        ])
+
+        rows = []
+        for i in range(patients):
+            rows.append({
+                "nom": rng.choice(NOMS),
+                "prenom": rng.choice(PRENOMS),
+                "phone": f"2{rng.randrange(10_000_000):07d}",
+                "email": None,
+                "date_naissance": None,
+                "notes": None,
+                "requires_validation": False,
+                "created_at": datetime.utcnow() - timedelta(minutes=i),
+            })
+            if len(rows) >= batch:
+                conn.execute(Patient.__table__.insert(), rows)
+                rows = []
+        if rows:
+            conn.execute(Patient.__table__.insert(), rows)
+
+    appointment_id = 0
+    with engine.begin() as conn:
+        appt_rows, payment_rows = [], []
+        for _ in range(appointments):
+            appointment_id += 1
+            service_index = rng.randrange(len(SERVICES))
+            prix = SERVICES[service_index][1]
+            day = first_day + timedelta(days=rng.randrange(span_days))
+            paid = rng.random() < payments_ratio
+            appt_rows.append({
+                "id": appointment_id,
+                "patient_id": rng.randrange(1, patients + 1),
+                "service_id": service_index + 1,
+                "date": day,
+                "heure": dtime(rng.randrange(8, 18), rng.choice((0, 15, 30, 45))),
+                "prix": prix,
+                "verse": prix if paid else 0,
+                "reste": 0 if paid else prix,
+                "etat": rng.choice(ETATS),
+                "notes": None,
+                "created_at": datetime.combine(day, dtime(8)),
+            })
+            if paid:
+                payment_rows.append({
+                    "appointment_id": appointment_id,
+                    "montant": prix,
+                    "mode": rng.choice(MODES),
+                    "created_at": datetime.combine(min(day, today), dtime(rng.randrange(8, 18))),
+                })
+            if len(appt_rows) >= batch:
+                conn.execute(Appointment.__table__.insert(), appt_rows)
+                if payment_rows:
+                    conn.execute(Payment.__table__.insert(), payment_rows)
+                appt_rows, payment_rows = [], []
+        if appt_rows:
+            conn.execute(Appointment.__table__.insert(), appt_rows)
+        if payment_rows:
+            conn.execute(Payment.__table__.insert(), payment_rows)
+
+
+def print_table(headers, rows):
+    widths = [max(len(str(h)), *(len(str(r[i])) for r in rows)) if rows else len(str(h)) for i, h in enumerate(headers)]
+    line = "  ".join(str(h).ljust(w) for h, w in zip(headers, widths))
+    print(line)
+    print("-" * len(line))
+    for r in rows:
+        print("  ".join(str(v).ljust(w) for v, w in zip(r, widths)))
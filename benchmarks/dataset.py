@@ -0,0 +1,213 @@
+"""
+Generate a realistic clinic dataset at a given scale, for load tests and
+benchmarks (10k to 5M appointments).
+
+    python benchmarks/dataset.py --appointments 1m
+    python benchmarks/dataset.py --appointments 5m --url mysql+pymysql://root:pw@localhost/clinic_bench
+
+Rows are bulk-loaded with Core inserts in batches, then the derived tables
+(daily rollups, cash register days, patient search index) are rebuilt, so
+the application starts on it without any backfill. Compared with
+common.seed, which the micro-benchmarks use, the data looks like a real
+front desk:
+- Patients have accented names, phone numbers, most of them an e-mail and
+  a birth date. A minority of regulars account for most visits.
+- Opening days run Monday to Saturday (Saturday mornings only), on
+  quarter-hour slots.
+- Past appointments are mostly validated, with some cancellations.
+  Upcoming ones are pending.
+- Validated visits are paid in full, in two instalments, or not yet;
+  verse and reste match the payments.
+
+Two accounts are created: admin/admin123 and accueil/accueil123 (staff).
+"""
+import argparse
+import random
+import time
+import unicodedata
+from datetime import date, datetime, time as dtime, timedelta
+
+import common
+
+SERVICE_DESCRIPTIONS = {
+    "Consultation": "Consultation dentaire", "Détartrage": "Nettoyage dentaire", "Plombage": "Traitement carie",
+    "Couronne": "Couronne céramique", "Implant": "Implant dentaire", "Blanchiment": "Blanchiment des dents",
+    "Extraction": "Extraction simple", "Radiographie": "Radio panoramique",
+}
+EMAIL_DOMAINS = ["gmail.com", "yahoo.fr", "topnet.tn", "outlook.com", "planet.tn"]
+PHONE_PREFIXES = ["2", "5", "9", "4"]
+SLOTS = [dtime(hour, minute) for hour in range(8, 18) for minute in (0, 15, 30, 45)]
+SATURDAY_SLOTS = [slot for slot in SLOTS if slot.hour < 13]
+
+
+def parse_count(value: str) -> int:
+    """'250k' -> 250000, '5m' -> 5000000"""
+    value = value.strip().lower().replace("_", "")
+    factor = {"k": 1_000, "m": 1_000_000}.get(value[-1:], 1)
+    return int(float(value.rstrip("km")) * factor)
+
+
+def _ascii(text: str) -> str:
+    return unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode().lower().replace(" ", "")
+
+
+def _patient_rows(rng: random.Random, count: int, first_created: datetime, span: timedelta):
+    """Patients in id order, their created_at spread over `span`"""
+    step = span / max(count, 1)
+    for i in range(count):
+        nom, prenom = rng.choice(common.NOMS), rng.choice(common.PRENOMS)
+        has_email = rng.random() < 0.7
+        yield {
+            "nom": nom,
+            "prenom": prenom,
+            "phone": f"{rng.choice(PHONE_PREFIXES)}{rng.randrange(10_000_000):07d}",
+            "email": f"{_ascii(prenom)}.{_ascii(nom)}{rng.randrange(100)}@{rng.choice(EMAIL_DOMAINS)}" if has_email else None,
+            "date_naissance": date(1940, 1, 1) + timedelta(days=rng.randrange(78 * 365)) if rng.random() < 0.8 else None,
+            "notes": rng.choice([None, None, None, "Allergie pénicilline", "Diabétique", "Anxieux, prévoir du temps"]),
+            "requires_validation": rng.random() < 0.01,
+            "created_at": first_created + step * i,
+        }
+
+
+def _price(rng: random.Random, base: int) -> int:
+    # A fifth of the visits are priced off the catalog (discount, extra work)
+    if rng.random() < 0.2:
+        return max(5, round(base * rng.uniform(0.8, 1.2) / 5) * 5)
+    return base
+
+
+def _payments(rng: random.Random, prix: int, etat: str, day: date, heure: dtime, today: date):
+    """Payments of one appointment; the appointment's verse is their sum"""
+    if day > today or etat == "annule":
+        return []
+    paid_at = datetime.combine(day, heure) + timedelta(minutes=30)
+    roll = rng.random()
+    if etat == "valide" and roll < 0.75:
+        return [(prix, paid_at)]
+    if etat == "valide" and roll < 0.9:
+        first = round(prix * rng.uniform(0.3, 0.6))
+        second_at = min(paid_at + timedelta(days=rng.randrange(1, 30)), datetime.combine(today, dtime(12)))
+        return [(first, paid_at), (prix - first, second_at)]
+    if etat == "en_attente" and roll < 0.2:
+        return [(round(prix * 0.3), paid_at)]
+    return []
+
+
+def generate(engine, appointments: int, patients: int = None, seed_value: int = 42, batch: int = 20_000, span_days: int = 730):
+    """Bulk-load the dataset into an empty schema; returns the row counts"""
+    from sqlalchemy.orm import Session
+    from models import User, Patient, Service, Appointment, Payment
+    from auth import get_password_hash
+    from rollups import rebuild_rollups
+    from search_index import rebuild_search_index
+
+    rng = random.Random(seed_value)
+    patients = patients or max(10, appointments // 5)
+    today = date.today()
+    first_day = today - timedelta(days=span_days * 3 // 4)
+    open_days = [
+        first_day + timedelta(days=i) for i in range(span_days)
+        if (first_day + timedelta(days=i)).weekday() != 6
+    ]
+    counts = {"patients": patients, "appointments": appointments, "payments": 0}
+
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [
+            {"username": "admin", "password_hash": get_password_hash("admin123"), "role": "admin", "is_active": True},
+            {"username": "accueil", "password_hash": get_password_hash("accueil123"), "role": "staff", "is_active": True},
+        ])
+        conn.execute(Service.__table__.insert(), [
+            {"nom": nom, "description": SERVICE_DESCRIPTIONS.get(nom), "prix_base": prix, "actif": True}
+            for nom, prix in common.SERVICES
+        ])
+
+        first_created = datetime.combine(first_day, dtime(9)) - timedelta(days=365 * 3)
+        span = datetime.combine(today, dtime(9)) - first_created
+        rows = []
+        for row in _patient_rows(rng, patients, first_created, span):
+            rows.append(row)
+            if len(rows) >= batch:
+                conn.execute(Patient.__table__.insert(), rows)
+                rows = []
+        if rows:
+            conn.execute(Patient.__table__.insert(), rows)
+
+    with engine.begin() as conn:
+        appointment_rows, payment_rows = [], []
+        for appointment_id in range(1, appointments + 1):
+            day = rng.choice(open_days)
+            heure = rng.choice(SATURDAY_SLOTS if day.weekday() == 5 else SLOTS)
+            service_index = rng.randrange(len(common.SERVICES))
+            prix = _price(rng, common.SERVICES[service_index][1])
+            if day < today:
+                etat = rng.choices(["valide", "annule", "en_attente"], weights=[80, 10, 10])[0]
+            else:
+                etat = rng.choices(["en_attente", "annule"], weights=[93, 7])[0]
+            payments = _payments(rng, prix, etat, day, heure, today)
+            verse = sum(montant for montant, _ in payments)
+            appointment_rows.append({
+                "id": appointment_id,
+                # Squaring skews the draw towards the low ids: the regulars
+                "patient_id": 1 + int(patients * rng.random() ** 2),
+                "service_id": service_index + 1,
+                "date": day,
+                "heure": heure,
+                "prix": prix,
+                "verse": verse,
+                "reste": prix - verse,
+                "etat": etat,
+                "notes": None,
+                "created_at": datetime.combine(day - timedelta(days=rng.randrange(0, 30)), dtime(9)),
+            })
+            payment_rows.extend(
+                {"appointment_id": appointment_id, "montant": montant, "mode": rng.choice(common.MODES), "created_at": paid_at}
+                for montant, paid_at in payments
+            )
+            if len(appointment_rows) >= batch:
+                conn.execute(Appointment.__table__.insert(), appointment_rows)
+                if payment_rows:
+                    conn.execute(Payment.__table__.insert(), payment_rows)
+                counts["payments"] += len(payment_rows)
+                appointment_rows, payment_rows = [], []
+        if appointment_rows:
+            conn.execute(Appointment.__table__.insert(), appointment_rows)
+        if payment_rows:
+            conn.execute(Payment.__table__.insert(), payment_rows)
+        counts["payments"] += len(payment_rows)
+
+    with Session(bind=engine) as db:
+        rebuild_rollups(db)
+        rebuild_search_index(db)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Database URL (default: SQLite file in benchmarks/.data)")
+    parser.add_argument("--name", default="dataset", help="SQLite file name in benchmarks/.data (without --url)")
+    parser.add_argument("--appointments", type=parse_count, default=parse_count("100k"), help="e.g. 10k, 250k, 5m")
+    parser.add_argument("--patients", type=parse_count, help="Default: one patient per 5 appointments")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch", type=int, default=20_000, help="Rows per INSERT batch")
+    args = parser.parse_args()
+
+    url = common.configure(args.url, name=args.name)
+    from database import engine
+
+    print(f"Generating {args.appointments:,} appointments into {engine.url.render_as_string(hide_password=True)}...")
+    start = time.perf_counter()
+    common.reset_schema(engine)
+    counts = generate(engine, args.appointments, args.patients, seed_value=args.seed, batch=args.batch)
+    elapsed = time.perf_counter() - start
+
+    total_rows = sum(counts.values())
+    print()
+    common.print_table(["patients", "appointments", "payments", "seconds", "rows/s"], [(
+        f"{counts['patients']:,}", f"{counts['appointments']:,}", f"{counts['payments']:,}",
+        f"{elapsed:.1f}", f"{total_rows / elapsed:,.0f}",
+    )])
+    print(f"\nDATABASE_URL={url}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Replay a front-desk traffic mix against the application and record the
+latency of every request, per endpoint.
+
+    python benchmarks/dataset.py --appointments 1m
+    python benchmarks/load.py --clients 8 --seconds 60 --output benchmarks/.data/run.json
+    python benchmarks/report.py benchmarks/.data/run.json --baseline benchmarks/.data/baseline.json
+
+By default the app runs in-process (httpx ASGI transport) on the database
+generated by dataset.py. With --base-url the requests go to a running server
+instead (e.g. uvicorn with several workers), which must use that database.
+
+Each client logs in, then loops over the mix: the week of the agenda, the
+dashboard, the day's cash register and appointment list, typeahead patient
+searches (one request per keystroke), patient list searches, new
+appointments and payments on the appointments it created. Only 5xx answers
+and unexpected statuses count as errors (a slot conflict on creation is a
+400 the front desk sees too).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from datetime import date, datetime, timedelta
+
+import common
+import report
+
+# Relative weight of each action in the mix
+MIX = {
+    "agenda": 20,
+    "dashboard": 5,
+    "caisse": 5,
+    "rdv_today": 10,
+    "suggest": 25,
+    "patient_search": 5,
+    "create_rdv": 15,
+    "payment": 15,
+}
+EXPECTED = {"create_rdv": {200, 400}, "payment": {200, 400}}
+
+
+class FrontDesk:
+    """One simulated receptionist"""
+
+    def __init__(self, client, rng: random.Random, catalog: dict, max_patient_id: int, record):
+        self.client = client
+        self.rng = rng
+        self.catalog = catalog
+        self.max_patient_id = max_patient_id
+        self.record = record
+        self.created = []
+
+    async def request(self, endpoint: str, method: str, url: str, **kwargs):
+        start = time.perf_counter()
+        response = await self.client.request(method, url, **kwargs)
+        self.record(endpoint, (time.perf_counter() - start) * 1000, response.status_code)
+        return response
+
+    async def agenda(self):
+        monday = date.today() + timedelta(weeks=self.rng.randint(-2, 2)) - timedelta(days=date.today().weekday())
+        params = {"start": f"{monday.isoformat()}T00:00:00", "end": f"{(monday + timedelta(days=7)).isoformat()}T00:00:00"}
+        await self.request("agenda", "GET", "/api/agenda", params=params)
+
+    async def dashboard(self):
+        await self.request("dashboard", "GET", "/api/stats/overview")
+
+    async def caisse(self):
+        await self.request("caisse", "GET", f"/api/caisse/{date.today().isoformat()}")
+
+    async def rdv_today(self):
+        today = date.today().isoformat()
+        await self.request("rdv_today", "GET", "/api/rdv", params={"date_from": today, "date_to": today, "limit": 100})
+
+    async def suggest(self):
+        name = self.rng.choice(common.NOMS + common.PRENOMS)
+        for length in range(2, min(len(name), 5) + 1):
+            await self.request("suggest", "GET", "/api/patients/suggest", params={"q": name[:length], "limit": 10})
+
+    async def patient_search(self):
+        await self.request("patient_search", "GET", "/api/patients", params={"search": self.rng.choice(common.NOMS), "limit": 50})
+
+    async def create_rdv(self):
+        service_id, prix = self.rng.choice(list(self.catalog.items()))
+        slot = datetime.combine(date.today() + timedelta(days=self.rng.randint(0, 60)), datetime.min.time())
+        slot += timedelta(minutes=self.rng.randrange(8 * 60, 18 * 60, 15))
+        response = await self.request("create_rdv", "POST", "/api/rdv", json={
+            "patient_id": self.rng.randint(1, self.max_patient_id),
+            "service_id": service_id,
+            "date": slot.date().isoformat(),
+            "heure": slot.time().isoformat(),
+            "prix": prix,
+        })
+        if response.status_code == 200:
+            self.created.append((response.json()["id"], float(prix)))
+
+    async def payment(self):
+        if not self.created:
+            await self.create_rdv()
+            return
+        appointment_id, prix = self.created.pop(self.rng.randrange(len(self.created)))
+        await self.request("payment", "POST", f"/api/rdv/{appointment_id}/payments", json={
+            "appointment_id": appointment_id,
+            "montant": str(round(prix * self.rng.choice((0.5, 1.0)), 2)),
+            "mode": self.rng.choice(common.MODES),
+        })
+
+
+async def run(args) -> dict:
+    import httpx
+
+    samples = {endpoint: [] for endpoint in MIX}
+    statuses = {endpoint: {} for endpoint in MIX}
+    errors = {endpoint: 0 for endpoint in MIX}
+
+    def record(endpoint: str, elapsed_ms: float, status: int):
+        samples[endpoint].append(elapsed_ms)
+        statuses[endpoint][status] = statuses[endpoint].get(status, 0) + 1
+        if status >= 500 or status not in EXPECTED.get(endpoint, {200}):
+            errors[endpoint] += 1
+
+    async def session(transport, base_url: str, deadline: float, seed: int):
+        async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=60) as client:
+            r = await client.post("/login", data={"username": args.user, "password": args.password})
+            assert r.status_code in (302, 303), f"login failed: {r.status_code}"
+            catalog = {s["id"]: s["prix_base"] for s in (await client.get("/api/services")).json()}
+            newest = (await client.get("/api/patients", params={"limit": 1})).json()
+            desk = FrontDesk(client, random.Random(seed), catalog, newest[0]["id"] if newest else 1, record)
+            actions, weights = list(MIX), list(MIX.values())
+            while time.perf_counter() < deadline:
+                await getattr(desk, desk.rng.choices(actions, weights)[0])()
+
+    start = time.perf_counter()
+    if args.base_url:
+        deadline = time.perf_counter() + args.seconds
+        await asyncio.gather(*(session(None, args.base_url, deadline, args.seed + i) for i in range(args.clients)))
+    else:
+        import main
+        async with main.lifespan(main.app):
+            transport = httpx.ASGITransport(app=main.app)
+            deadline = time.perf_counter() + args.seconds
+            await asyncio.gather(*(session(transport, "http://load", deadline, args.seed + i) for i in range(args.clients)))
+    elapsed = time.perf_counter() - start
+
+    endpoints = {}
+    for endpoint, values in samples.items():
+        summary = common.summarize(values)
+        endpoints[endpoint] = {
+            "n": summary["n"],
+            "rps": round(summary["n"] / elapsed, 2),
+            "errors": errors[endpoint],
+            "statuses": {str(code): count for code, count in sorted(statuses[endpoint].items())},
+            **{key: round(summary[key], 3) for key in ("mean", "p50", "p95", "p99")},
+        }
+    return {
+        "meta": {
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "target": args.base_url or "in-process",
+            "clients": args.clients,
+            "seconds": round(elapsed, 1),
+            "requests": sum(len(values) for values in samples.values()),
+        },
+        "endpoints": endpoints,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Database URL for the in-process app (default: the dataset.py SQLite file)")
+    parser.add_argument("--name", default="dataset", help="SQLite file name in benchmarks/.data (without --url)")
+    parser.add_argument("--base-url", help="Send the requests to a running server instead, e.g. http://127.0.0.1:8000")
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent front-desk sessions")
+    parser.add_argument("--seconds", type=float, default=30)
+    parser.add_argument("--user", default="admin")
+    parser.add_argument("--password", default="admin123")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write the results as JSON (input of report.py)")
+    parser.add_argument("--baseline", help="Compare with the results of an earlier run")
+    args = parser.parse_args()
+
+    if not args.base_url:
+        common.configure(args.url, name=args.name)
+        os.chdir(common.ROOT)
+
+    results = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    baseline = report.load(args.baseline) if args.baseline else None
+    print()
+    raise SystemExit(report.print_report(results, baseline))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Per-endpoint latency report of a load.py run, optionally compared with a
+baseline run.
+
+    python benchmarks/report.py benchmarks/.data/run.json
+    python benchmarks/report.py benchmarks/.data/run.json --baseline benchmarks/.data/baseline.json
+    python benchmarks/report.py benchmarks/.data/run.json --save-baseline benchmarks/.data/baseline.json
+
+An endpoint regresses when its p95 or p99 grew by more than --threshold
+percent and by more than --min-ms (below that, the difference is noise), or
+when it has errors the baseline did not have. The exit status is 1 if any
+endpoint regressed, so the comparison can gate a CI job.
+"""
+import argparse
+import json
+import shutil
+from typing import Optional
+
+import common
+
+DEFAULT_THRESHOLD = 10.0
+DEFAULT_MIN_MS = 1.0
+
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def _change(current: float, previous: float) -> str:
+    if not previous:
+        return "n/a"
+    return f"{(current - previous) / previous * 100:+.0f}%"
+
+
+def regressions(results: dict, baseline: dict, threshold: float = DEFAULT_THRESHOLD, min_ms: float = DEFAULT_MIN_MS) -> dict:
+    """Endpoint -> reasons, for the endpoints worse than in the baseline"""
+    found = {}
+    for endpoint, current in results["endpoints"].items():
+        previous = baseline["endpoints"].get(endpoint)
+        if previous is None or not current["n"]:
+            continue
+        reasons = []
+        for key in ("p95", "p99"):
+            delta = current[key] - previous[key]
+            if delta > min_ms and delta > previous[key] * threshold / 100:
+                reasons.append(f"{key} {previous[key]:.1f} -> {current[key]:.1f} ms")
+        if current["errors"] and not previous["errors"]:
+            reasons.append(f"{current['errors']} errors")
+        if reasons:
+            found[endpoint] = reasons
+    return found
+
+
+def print_report(results: dict, baseline: Optional[dict] = None, threshold: float = DEFAULT_THRESHOLD, min_ms: float = DEFAULT_MIN_MS) -> int:
+    """Print the tables; returns the exit status (1 if something regressed)"""
+    meta = results["meta"]
+    print(f"{meta['requests']:,} requests in {meta['seconds']} s, {meta['clients']} clients, target {meta['target']}")
+    print()
+
+    headers = ["endpoint", "requests", "req/s", "errors", "p50 ms", "p95 ms", "p99 ms"]
+    rows = []
+    for endpoint, figures in results["endpoints"].items():
+        row = [endpoint, figures["n"], figures["rps"], figures["errors"],
+               f"{figures['p50']:.1f}", f"{figures['p95']:.1f}", f"{figures['p99']:.1f}"]
+        if baseline is not None:
+            previous = baseline["endpoints"].get(endpoint)
+            row += [_change(figures[key], previous[key]) if previous else "new" for key in ("p50", "p95", "p99")]
+        rows.append(row)
+    if baseline is not None:
+        headers += ["Δ p50", "Δ p95", "Δ p99"]
+    common.print_table(headers, rows)
+
+    if baseline is None:
+        return 0
+    found = regressions(results, baseline, threshold, min_ms)
+    print()
+    if not found:
+        print(f"No regression against the baseline of {baseline['meta']['started_at']} (threshold {threshold:.0f}%)")
+        return 0
+    for endpoint, reasons in found.items():
+        print(f"REGRESSION {endpoint}: {', '.join(reasons)}")
+    return 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("results", help="JSON file written by load.py --output")
+    parser.add_argument("--baseline", help="Results of the reference run")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Allowed p95/p99 growth in percent")
+    parser.add_argument("--min-ms", type=float, default=DEFAULT_MIN_MS, help="Ignore growths smaller than this")
+    parser.add_argument("--save-baseline", help="Store these results as the new baseline")
+    args = parser.parse_args()
+
+    results = load(args.results)
+    baseline = load(args.baseline) if args.baseline else None
+    status = print_report(results, baseline, args.threshold, args.min_ms)
+    if args.save_baseline:
+        shutil.copyfile(args.results, args.save_baseline)
+        print(f"Baseline saved to {args.save_baseline}")
+    raise SystemExit(status)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,23 @@
+import os
 import sys
-sys.path.insert(0, r'C:\Users\KIRA\PycharmProjects\care')
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from database import SessionLocal
-from models import User, Patient, Service, Appointment, Payment
+from models import (
+    User, Patient, Service, Appointment, Payment, AuditLog, CashRegisterDay,
+    DailyAppointmentStats, DailyRevenueStats, PatientSearchToken,
+)
 
 print("🗑️ Clearing database...")
 
 db = SessionLocal()
 
 try:
+    # Derived tables first: they reference users and patients, and would
+    # otherwise keep the figures of the deleted data
+    for table in (DailyAppointmentStats, DailyRevenueStats, CashRegisterDay, PatientSearchToken, AuditLog):
+        db.query(table).delete()
+
     # Delete all data in correct order (respecting foreign keys)
     deleted_payments = db.query(Payment).delete()
     deleted_appointments = db.query(Appointment).delete()
@@ -1,5 +1,8 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Optional
+import os
+import tempfile
 
 
 class Settings(BaseSettings):
@@ -8,6 +11,87 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 1440
 
+    # Connection pool and the worker threads that run the sync routes. Keep
+    # DB_THREADPOOL_SIZE <= DB_POOL_SIZE + DB_MAX_OVERFLOW so a thread never
+    # waits for a connection.
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_THREADPOOL_SIZE: int = 20
+
+    # Optional read replica for the read-only routes (dashboard, stats,
+    # agenda, lists) with its own pool; writes always go to DATABASE_URL. A
+    # user's reads stay on the primary for READ_YOUR_WRITES_SECONDS after
+    # each of their writes, which must exceed the replication lag.
+    READ_DATABASE_URL: Optional[str] = None
+    READ_DB_POOL_SIZE: int = 10
+    READ_DB_MAX_OVERFLOW: int = 10
+    READ_DB_POOL_TIMEOUT: float = 30
+    READ_YOUR_WRITES_SECONDS: float = 5
+
+    # Dashboard statistics cache (entries per process, max age in seconds)
+    STATS_CACHE_SIZE: int = 64
+    STATS_CACHE_TTL: float = 30
+
+    # Password hashing: bcrypt cost factor (existing hashes are upgraded at
+    # their next login), dedicated hashing threads and how many logins may
+    # wait for one before new attempts get a 429.
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_QUEUE_SIZE: int = 16
+
+    # Authenticated-principal cache (entries per process, max age in seconds).
+    # Role/activation changes are broadcast to the other workers through a
+    # file in SHARED_STATE_DIR, which must be shared by all workers on the host.
+    AUTH_CACHE_SIZE: int = 1024
+    AUTH_CACHE_TTL: float = 60
+    SHARED_STATE_DIR: str = os.path.join(tempfile.gettempdir(), "clinic_shared_state")
+
+    # In-memory prefix index behind the patient typeahead (one per worker
+    # process, see patient_index.py); when disabled suggestions come from
+    # the database.
+    PATIENT_INDEX_ENABLED: bool = True
+
+    # List endpoints (/api/rdv, /api/patients, /api/services) skip the
+    # response_model validation and encode their rows with orjson (see
+    # fast_json.py). Opt-in; the output is identical.
+    FAST_JSON_RESPONSES: bool = False
+
+    # Request metrics served at /metrics (see metrics.py): each worker writes
+    # its figures to SHARED_STATE_DIR every METRICS_FLUSH_INTERVAL seconds.
+    # With METRICS_TOKEN set, scrapes must send "Authorization: Bearer <token>".
+    METRICS_ENABLED: bool = True
+    METRICS_FLUSH_INTERVAL: float = 5
+    METRICS_TOKEN: Optional[str] = None
+
+    # Per-request SQL statistics (see query_stats.py): Server-Timing and
+    # X-DB-Queries headers plus one log line per request, flagging statements
+    # repeated QUERY_STATS_REPEAT_THRESHOLD times or more (likely N+1).
+    # Meant for development and staging.
+    QUERY_STATS_ENABLED: bool = False
+    QUERY_STATS_REPEAT_THRESHOLD: int = 5
+
+    # Slow-query log (see slow_queries.py): statements slower than the
+    # threshold, with an EXPLAIN of each new shape, in a ring buffer per
+    # worker shown at /api/slow-queries (admin).
+    SLOW_QUERY_LOG_ENABLED: bool = False
+    SLOW_QUERY_THRESHOLD_MS: float = 200
+    SLOW_QUERY_BUFFER_SIZE: int = 200
+
+    # Patient import: rows per transaction and where rejected-row reports go
+    IMPORT_BATCH_SIZE: int = 1000
+    IMPORT_ERRORS_DIR: str = os.path.join(tempfile.gettempdir(), "clinic_import_errors")
+
+    # Rows fetched per round trip (and per Parquet row group) by the exports
+    EXPORT_BATCH_SIZE: int = 5000
+
+    # Audit log writer: records are bulk-inserted every AUDIT_FLUSH_INTERVAL
+    # seconds or once AUDIT_FLUSH_SIZE are queued. When the queue is full the
+    # record is written inline rather than dropped.
+    AUDIT_FLUSH_SIZE: int = 200
+    AUDIT_FLUSH_INTERVAL: float = 1.0
+    AUDIT_QUEUE_SIZE: int = 10000
+
     class Config:
         env_file = ".env"
 
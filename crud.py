@@ -1,24 +1,27 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_
+from sqlalchemy import func, and_, select, update
 from sqlalchemy.orm import joinedload
-from typing import Optional, List
+from typing import Optional, List, Tuple
 from datetime import datetime, date, time
 from decimal import Decimal
-from models import User, Patient, Service, Appointment, Payment, AuditLog, AppointmentState
+from models import User, Patient, Service, Appointment, Payment, AppointmentState, PaymentMode, CashRegisterDay
 import schemas
+from pagination import encode_cursor, decode_cursor, after_desc
+import rollups
+import recurrence
+import search_index
+import fast_json
+from patient_index import patient_index
+from service_catalog import service_catalog, ServiceSnapshot
+import audit
+from stats import invalidate_dashboard_stats
 
 
 # Audit logging
 def create_audit_log(db: Session, user_id: Optional[int], action: str, target_table: str, target_id: Optional[int], metadata: dict = None):
-    log = AuditLog(
-        user_id=user_id,
-        action=action,
-        target_table=target_table,
-        target_id=target_id,
-        meta_data=metadata
-    )
-    db.add(log)
-    db.commit()
+    # Queued and bulk-inserted by the background writer (see audit.py); the
+    # business transaction is already committed and is not touched here.
+    audit.record(user_id, action, target_table, target_id, metadata)
 
 
 # User CRUD
@@ -40,20 +43,75 @@ def create_user(db: Session, user: schemas.UserCreate) -> User:
     return db_user
 
 
+def update_user(db: Session, user_id: int, user: schemas.UserUpdate, current_user_id: Optional[int] = None) -> Optional[User]:
+    from auth import get_password_hash, invalidate_principals
+    db_user = db.query(User).filter(User.id == user_id).first()
+    if not db_user:
+        return None
+
+    update_data = user.model_dump(exclude_unset=True)
+    password = update_data.pop("password", None)
+    for key, value in update_data.items():
+        setattr(db_user, key, value)
+    if password:
+        db_user.password_hash = get_password_hash(password)
+
+    db.commit()
+    db.refresh(db_user)
+    # Role/activation changes must take effect on the next request, in every worker
+    invalidate_principals()
+    create_audit_log(db, current_user_id, "UPDATE", "users", user_id, update_data)
+    return db_user
+
+
 # Patient CRUD
-def get_patients(db: Session, skip: int = 0, limit: int = 100, search: Optional[str] = None) -> List[Patient]:
-    query = db.query(Patient)
+def _patient_page(db: Session, query, skip: int, limit: int, search: Optional[str], cursor: Optional[str]):
+    """Filter, order and slice a patient Query or select() as a list page"""
     if search:
-        search_term = f"%{search}%"
-        query = query.filter(
-            or_(
-                Patient.nom.like(search_term),
-                Patient.prenom.like(search_term),
-                Patient.phone.like(search_term),
-                Patient.email.like(search_term)
-            )
-        )
-    return query.order_by(Patient.created_at.desc()).offset(skip).limit(limit).all()
+        query = query.filter(search_index.search_filter(db, Patient.id, search))
+
+    query = query.order_by(Patient.created_at.desc(), Patient.id.desc())
+    if cursor:
+        # Keyset mode: skip is ignored, the page starts right after the cursor
+        created_at, patient_id = decode_cursor(cursor, [datetime, int])
+        return query.filter(after_desc([Patient.created_at, Patient.id], [created_at, patient_id])).limit(limit)
+    return query.offset(skip).limit(limit)
+
+
+def get_patients(db: Session, skip: int = 0, limit: int = 100, search: Optional[str] = None, cursor: Optional[str] = None) -> List[Patient]:
+    return _patient_page(db, db.query(Patient), skip, limit, search, cursor).all()
+
+
+def get_patient_rows(db: Session, skip: int = 0, limit: int = 100, search: Optional[str] = None, cursor: Optional[str] = None) -> list:
+    """get_patients as PatientResponse row objects, for the fast JSON path"""
+    row = fast_json.row_type(schemas.PatientResponse)
+    columns = [getattr(Patient, name) for name in fast_json.field_names(schemas.PatientResponse)]
+    query = _patient_page(db, select(*columns), skip, limit, search, cursor)
+    return [row(*values) for values in db.execute(query)]
+
+
+def suggest_patients(db: Session, search: str, limit: int = 10) -> List[dict]:
+    """
+    Typeahead: the first `limit` patients matching `search` (id, nom, prenom,
+    phone), from the in-memory index, or from the database while it is not ready
+    """
+    terms = search_index.search_terms(search)
+    if not terms:
+        return []
+    suggestions = patient_index.search(terms, limit)
+    if suggestions is not None:
+        return suggestions
+    rows = db.execute(
+        select(Patient.id, Patient.nom, Patient.prenom, Patient.phone)
+        .where(search_index.search_filter(db, Patient.id, search))
+        .order_by(Patient.created_at.desc(), Patient.id.desc())
+        .limit(limit)
+    ).all()
+    return [row._asdict() for row in rows]
+
+
+def patient_cursor(patient: Patient) -> str:
+    return encode_cursor([patient.created_at, patient.id])
 
 
 def get_patient(db: Session, patient_id: int) -> Optional[Patient]:
@@ -63,8 +121,12 @@ def get_patient(db: Session, patient_id: int) -> Optional[Patient]:
 def create_patient(db: Session, patient: schemas.PatientCreate, user_id: Optional[int] = None) -> Patient:
     db_patient = Patient(**patient.model_dump())
     db.add(db_patient)
+    db.flush()
+    search_index.index_patient(db, db_patient)
     db.commit()
+    invalidate_dashboard_stats()
     db.refresh(db_patient)
+    patient_index.put(db_patient.id, db_patient.nom, db_patient.prenom, db_patient.phone)
     create_audit_log(db, user_id, "CREATE", "patients", db_patient.id)
     return db_patient
 
@@ -78,8 +140,14 @@ def update_patient(db: Session, patient_id: int, patient: schemas.PatientUpdate,
     for field, value in update_data.items():
         setattr(db_patient, field, value)
 
+    if update_data.keys() & {"nom", "prenom", "phone", "email"}:
+        search_index.index_patient(db, db_patient)
+
     db.commit()
+    invalidate_dashboard_stats()
     db.refresh(db_patient)
+    if update_data.keys() & {"nom", "prenom", "phone"}:
+        patient_index.put(db_patient.id, db_patient.nom, db_patient.prenom, db_patient.phone)
     create_audit_log(db, user_id, "UPDATE", "patients", patient_id, update_data)
     return db_patient
 
@@ -88,8 +156,11 @@ def delete_patient(db: Session, patient_id: int, user_id: Optional[int] = None)
     db_patient = get_patient(db, patient_id)
     if not db_patient:
         return False
+    search_index.unindex_patient(db, patient_id)
     db.delete(db_patient)
     db.commit()
+    invalidate_dashboard_stats()
+    patient_index.remove(patient_id)
     create_audit_log(db, user_id, "DELETE", "patients", patient_id)
     return True
 
@@ -99,28 +170,29 @@ def get_patients_requiring_validation(db: Session) -> List[Patient]:
 
 
 # Service CRUD
-def get_services(db: Session, active_only: bool = True) -> List[Service]:
-    query = db.query(Service)
-    if active_only:
-        query = query.filter(Service.actif == True)
-    return query.all()
+def get_services(db: Session, active_only: bool = True) -> Tuple[ServiceSnapshot, ...]:
+    """Services from the cached catalog (see service_catalog.py)"""
+    catalog = service_catalog.get(db)
+    return catalog.active if active_only else catalog.services
 
 
-def get_service(db: Session, service_id: int) -> Optional[Service]:
-    return db.query(Service).filter(Service.id == service_id).first()
+def get_service(db: Session, service_id: int) -> Optional[ServiceSnapshot]:
+    return service_catalog.get(db).by_id.get(service_id)
 
 
 def create_service(db: Session, service: schemas.ServiceCreate, user_id: Optional[int] = None) -> Service:
     db_service = Service(**service.model_dump())
     db.add(db_service)
     db.commit()
+    service_catalog.invalidate()
+    invalidate_dashboard_stats()
     db.refresh(db_service)
     create_audit_log(db, user_id, "CREATE", "services", db_service.id)
     return db_service
 
 
 def update_service(db: Session, service_id: int, service: schemas.ServiceUpdate, user_id: Optional[int] = None) -> Optional[Service]:
-    db_service = get_service(db, service_id)
+    db_service = db.get(Service, service_id)
     if not db_service:
         return None
 
@@ -129,63 +201,186 @@ def update_service(db: Session, service_id: int, service: schemas.ServiceUpdate,
         setattr(db_service, field, value)
 
     db.commit()
+    service_catalog.invalidate()
+    invalidate_dashboard_stats()
     db.refresh(db_service)
     create_audit_log(db, user_id, "UPDATE", "services", service_id, update_data)
     return db_service
 
 
 def delete_service(db: Session, service_id: int, user_id: Optional[int] = None) -> bool:
-    db_service = get_service(db, service_id)
+    db_service = db.get(Service, service_id)
     if not db_service:
         return False
     db.delete(db_service)
     db.commit()
+    service_catalog.invalidate()
+    invalidate_dashboard_stats()
     create_audit_log(db, user_id, "DELETE", "services", service_id)
     return True
 
 
 # Appointment CRUD
-def get_appointments(
+def appointment_filters(
     db: Session,
-    skip: int = 0,
-    limit: int = 100,
     search: Optional[str] = None,
     etat: Optional[AppointmentState] = None,
     date_from: Optional[date] = None,
     date_to: Optional[date] = None,
     patient_id: Optional[int] = None
-) -> List[Appointment]:
-    # Eagerly load patient and service relationships to avoid DetachedInstanceError
-    query = db.query(Appointment).options(joinedload(Appointment.patient), joinedload(Appointment.service))
+) -> list:
+    """WHERE criteria shared by the appointment list and the exports"""
+    criteria = []
 
     if search:
-        search_term = f"%{search}%"
-        query = query.join(Patient).filter(
-            or_(
-                Patient.nom.like(search_term),
-                Patient.prenom.like(search_term)
-            )
-        )
+        criteria.append(search_index.search_filter(db, Appointment.patient_id, search))
 
     if etat:
-        query = query.filter(Appointment.etat == etat)
+        criteria.append(Appointment.etat == etat)
 
     if date_from:
-        query = query.filter(Appointment.date >= date_from)
+        criteria.append(Appointment.date >= date_from)
 
     if date_to:
-        query = query.filter(Appointment.date <= date_to)
+        criteria.append(Appointment.date <= date_to)
 
     if patient_id:
-        query = query.filter(Appointment.patient_id == patient_id)
+        criteria.append(Appointment.patient_id == patient_id)
+
+    return criteria
 
-    return query.order_by(Appointment.date.desc(), Appointment.heure.desc()).offset(skip).limit(limit).all()
+
+def _appointment_page(db: Session, query, skip, limit, search, etat, date_from, date_to, patient_id, cursor):
+    """Filter, order and slice an appointment Query or select() as a list page"""
+    query = query.filter(*appointment_filters(db, search, etat, date_from, date_to, patient_id))
+
+    query = query.order_by(Appointment.date.desc(), Appointment.heure.desc(), Appointment.id.desc())
+    if cursor:
+        # Keyset mode: skip is ignored, the page starts right after the cursor
+        key = decode_cursor(cursor, [date, time, int])
+        return query.filter(after_desc([Appointment.date, Appointment.heure, Appointment.id], key)).limit(limit)
+    return query.offset(skip).limit(limit)
+
+
+def get_appointments(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    search: Optional[str] = None,
+    etat: Optional[AppointmentState] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    patient_id: Optional[int] = None,
+    cursor: Optional[str] = None
+) -> List[Appointment]:
+    # Eagerly load patient and service relationships to avoid DetachedInstanceError
+    query = db.query(Appointment).options(joinedload(Appointment.patient), joinedload(Appointment.service))
+    return _appointment_page(
+        db, query, skip, limit, search, etat, date_from, date_to, patient_id, cursor
+    ).all()
+
+
+def get_appointment_rows(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    search: Optional[str] = None,
+    etat: Optional[AppointmentState] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    patient_id: Optional[int] = None,
+    cursor: Optional[str] = None
+) -> list:
+    """
+    get_appointments as AppointmentResponse row objects, for the fast JSON
+    path: one joined select of the response columns, services from the catalog
+    """
+    row = fast_json.row_type(schemas.AppointmentResponse)
+    patient_row = fast_json.row_type(schemas.PatientResponse)
+    names = [name for name in fast_json.field_names(schemas.AppointmentResponse) if name not in ("patient", "service")]
+    patient_names = fast_json.field_names(schemas.PatientResponse)
+    services = {
+        service.id: service
+        for service in fast_json.to_rows(schemas.ServiceResponse, service_catalog.get(db).services)
+    }
+
+    query = select(
+        *(getattr(Appointment, name) for name in names),
+        *(getattr(Patient, name) for name in patient_names)
+    ).join(Patient, Patient.id == Appointment.patient_id)
+    query = _appointment_page(db, query, skip, limit, search, etat, date_from, date_to, patient_id, cursor)
+
+    split = len(names)
+    rows = []
+    for values in db.execute(query):
+        fields = dict(zip(names, values[:split]))
+        rows.append(row(
+            **fields,
+            patient=patient_row(*values[split:]),
+            service=services[fields["service_id"]],
+        ))
+    return rows
+
+
+def appointment_cursor(appointment: Appointment) -> str:
+    return encode_cursor([appointment.date, appointment.heure, appointment.id])
 
 
 def get_appointment(db: Session, appointment_id: int) -> Optional[Appointment]:
     return db.query(Appointment).options(joinedload(Appointment.patient), joinedload(Appointment.service)).filter(Appointment.id == appointment_id).first()
 
 
+def get_agenda_version(db: Session, date_from: date, date_to: date) -> tuple:
+    """
+    Cheap validator of the agenda events in a date range: row count, id sum
+    and latest modification stamps of the appointments and of the patients
+    and services they show. Any create, edit, move or delete changes it.
+    """
+    return tuple(db.query(
+        func.count(Appointment.id),
+        func.sum(Appointment.id),
+        func.max(Appointment.updated_at),
+        func.max(Patient.updated_at),
+        func.max(Service.updated_at)
+    ).join(Patient, Patient.id == Appointment.patient_id).join(
+        Service, Service.id == Appointment.service_id
+    ).filter(
+        Appointment.date >= date_from,
+        Appointment.date <= date_to
+    ).one())
+
+
+# Rows fetched per round trip when streaming the agenda
+AGENDA_BATCH_SIZE = 2000
+
+
+def get_agenda_events(db: Session, date_from: date, date_to: date):
+    """
+    Rows behind the agenda feed: only the columns an event shows, streamed
+    in batches, with no cap on the number of appointments in the range.
+    main.agenda_event unpacks the rows positionally.
+    """
+    stmt = select(
+        Appointment.id,
+        Appointment.date,
+        Appointment.heure,
+        Appointment.etat,
+        Appointment.prix,
+        Appointment.verse,
+        Appointment.reste,
+        Appointment.patient_id,
+        Patient.prenom.label("patient_prenom"),
+        Patient.nom.label("patient_nom"),
+        Service.nom.label("service_nom")
+    ).join(Patient, Patient.id == Appointment.patient_id).join(
+        Service, Service.id == Appointment.service_id
+    ).where(
+        Appointment.date >= date_from,
+        Appointment.date <= date_to
+    ).order_by(Appointment.date, Appointment.heure, Appointment.id).execution_options(yield_per=AGENDA_BATCH_SIZE)
+    return db.execute(stmt)
+
+
 def check_appointment_overlap(db: Session, patient_id: int, date_val: date, heure_val: time, exclude_id: Optional[int] = None) -> bool:
     """Check if patient has overlapping appointment"""
     query = db.query(Appointment).filter(
@@ -210,12 +405,67 @@ def create_appointment(db: Session, appointment: schemas.AppointmentCreate, user
     reste_val = appointment.prix - appointment.verse
     db_appointment = Appointment(**appointment.model_dump(), reste=reste_val)
     db.add(db_appointment)
+    rollups.record_appointment(db, appointment.date, appointment.service_id, appointment.etat)
     db.commit()
+    invalidate_dashboard_stats()
     db.refresh(db_appointment)
     create_audit_log(db, user_id, "CREATE", "appointments", db_appointment.id)
     return db_appointment
 
 
+def create_appointment_series(db: Session, series: schemas.AppointmentSeriesCreate, user_id: Optional[int] = None) -> dict:
+    """
+    Create a treatment-plan series in one transaction: expand the slots,
+    check them all against existing appointments with a single query, insert
+    the free ones together and commit once. Returns the created appointments
+    and the conflicting slots.
+    """
+    if series.recurrence is not None:
+        rule = series.recurrence
+        dates = recurrence.expand(series.start_date, rule.freq, rule.interval, rule.count, rule.until, rule.byweekday)
+    else:
+        dates = sorted(set(series.dates))
+
+    taken = dict(db.query(Appointment.date, Appointment.id).filter(
+        Appointment.patient_id == series.patient_id,
+        Appointment.heure == series.heure,
+        Appointment.date.in_(dates),
+        Appointment.etat != AppointmentState.annule
+    ).all()) if dates else {}
+    conflicts = [
+        schemas.AppointmentSlotConflict(
+            date=day, heure=series.heure, existing_id=taken[day],
+            detail="Ce patient a déjà un rendez-vous à cette date et heure"
+        )
+        for day in dates if day in taken
+    ]
+    free_dates = [day for day in dates if day not in taken]
+    if not free_dates or (conflicts and not series.skip_conflicts):
+        return {"created": [], "conflicts": conflicts}
+
+    fields = series.model_dump(include={"patient_id", "service_id", "heure", "prix", "verse", "etat", "notes"})
+    stamp = datetime.utcnow()
+    appointments = [
+        Appointment(**fields, date=day, reste=series.prix - series.verse, created_at=stamp, updated_at=stamp)
+        for day in free_dates
+    ]
+    # The flush batches the INSERTs (with RETURNING where the dialect has it,
+    # lastrowid on MySQL) and gives every row its primary key
+    db.add_all(appointments)
+    db.flush()
+    ids = [appt.id for appt in appointments]
+    rollups.record_appointments(db, [(day, series.service_id, series.etat) for day in free_dates])
+    db.commit()
+    invalidate_dashboard_stats()
+
+    created = db.query(Appointment).options(
+        joinedload(Appointment.patient), joinedload(Appointment.service)
+    ).filter(Appointment.id.in_(ids)).order_by(Appointment.date).all()
+    for appt in created:
+        create_audit_log(db, user_id, "CREATE", "appointments", appt.id, {"series_size": len(created)})
+    return {"created": created, "conflicts": conflicts}
+
+
 def update_appointment(db: Session, appointment_id: int, appointment: schemas.AppointmentUpdate, user_id: Optional[int] = None) -> Optional[Appointment]:
     db_appointment = get_appointment(db, appointment_id)
     if not db_appointment:
@@ -232,13 +482,24 @@ def update_appointment(db: Session, appointment_id: int, appointment: schemas.Ap
         if check_appointment_overlap(db, patient_id, new_date, new_heure, appointment_id):
             raise ValueError("Ce patient a déjà un rendez-vous à cette date et heure")
 
+    old_key = (db_appointment.date, db_appointment.service_id, db_appointment.etat)
+
     for field, value in update_data.items():
         setattr(db_appointment, field, value)
 
     # Recalculate reste
     db_appointment.reste = db_appointment.prix - db_appointment.verse
 
+    # Keep the daily rollups in step
+    new_key = (db_appointment.date, db_appointment.service_id, db_appointment.etat)
+    if new_key != old_key:
+        rollups.record_appointment(db, *old_key, sign=-1)
+        rollups.record_appointment(db, *new_key)
+    if db_appointment.date != old_key[0]:
+        rollups.move_appointment_payments(db, appointment_id, old_key[0], db_appointment.date)
+
     db.commit()
+    invalidate_dashboard_stats()
     db.refresh(db_appointment)
     create_audit_log(db, user_id, "UPDATE", "appointments", appointment_id, update_data)
     return db_appointment
@@ -248,8 +509,13 @@ def delete_appointment(db: Session, appointment_id: int, user_id: Optional[int]
     db_appointment = get_appointment(db, appointment_id)
     if not db_appointment:
         return False
+    # Received cash stays in the register (and in closed days): cancel instead
+    if db.query(Payment.id).filter(Payment.appointment_id == appointment_id).first() is not None:
+        raise ValueError("Ce rendez-vous a des paiements : l'annuler au lieu de le supprimer")
+    rollups.record_appointment(db, db_appointment.date, db_appointment.service_id, db_appointment.etat, sign=-1)
     db.delete(db_appointment)
     db.commit()
+    invalidate_dashboard_stats()
     create_audit_log(db, user_id, "DELETE", "appointments", appointment_id)
     return True
 
@@ -265,39 +531,94 @@ def get_payments_for_appointment(db: Session, appointment_id: int) -> List[Payme
 
 
 def create_payment(db: Session, payment: schemas.PaymentCreate, user_id: Optional[int] = None) -> Payment:
-    db_appointment = get_appointment(db, payment.appointment_id)
-    if not db_appointment:
+    """
+    Record a payment and add it to the appointment's verse/reste. The
+    appointment row is locked (SELECT ... FOR UPDATE) and updated with
+    verse = verse + montant, so concurrent payments on the same appointment
+    queue up instead of overwriting each other's totals. SQLite has no row
+    locks: there the UPDATE itself takes the database write lock.
+    """
+    locked = db.execute(
+        select(Appointment.date, Appointment.etat)
+        .where(Appointment.id == payment.appointment_id)
+        .with_for_update()
+    ).first()
+    if not locked:
         raise ValueError("Rendez-vous introuvable")
 
-    if db_appointment.etat == AppointmentState.annule:
+    if locked.etat == AppointmentState.annule:
+        raise ValueError("Impossible d'ajouter un paiement à un rendez-vous annulé")
+
+    # MySQL evaluates SET assignments left to right: reste must be computed
+    # from the old verse, before verse is incremented
+    result = db.execute(
+        update(Appointment)
+        .where(Appointment.id == payment.appointment_id, Appointment.etat != AppointmentState.annule)
+        .ordered_values(
+            (Appointment.reste, Appointment.prix - Appointment.verse - payment.montant),
+            (Appointment.verse, Appointment.verse + payment.montant),
+            (Appointment.updated_at, datetime.utcnow()),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        # Cancelled in between (only possible without row locks)
+        db.rollback()
         raise ValueError("Impossible d'ajouter un paiement à un rendez-vous annulé")
 
-    db_payment = Payment(**payment.model_dump())
+    paid_at = datetime.utcnow()
+    db_payment = Payment(**payment.model_dump(), created_at=paid_at)
     db.add(db_payment)
+    db.flush()
+    payment_id = db_payment.id
 
-    # Update appointment verse
-    total_verse = db.query(func.sum(Payment.montant)).filter(Payment.appointment_id == payment.appointment_id).scalar() or Decimal("0")
-    total_verse += payment.montant
-    db_appointment.verse = total_verse
-    db_appointment.reste = db_appointment.prix - total_verse
+    rollups.record_payment(db, locked.date, payment.mode, payment.montant)
+    rollups.record_cash(db, paid_at.date(), payment.mode, payment.montant)
 
     db.commit()
-    db.refresh(db_payment)
-    create_audit_log(db, user_id, "CREATE", "payments", db_payment.id, {"appointment_id": payment.appointment_id, "montant": float(payment.montant)})
+    invalidate_dashboard_stats()
+    create_audit_log(db, user_id, "CREATE", "payments", payment_id, {"appointment_id": payment.appointment_id, "montant": float(payment.montant)})
     return db_payment
 
 
-def get_caisse_du_jour(db: Session) -> Decimal:
-    """Get today's total cash box"""
-    today = date.today()
-    today_start = datetime.combine(today, datetime.min.time())
-    today_end = datetime.combine(today, datetime.max.time())
+def get_caisse_du_jour(db: Session, day: Optional[date] = None) -> Decimal:
+    """Cash received on `day` (default: today), read from cash_register_days"""
+    total = db.scalar(select(CashRegisterDay.total).where(CashRegisterDay.date == (day or date.today())))
+    return total or Decimal("0")
 
-    total = db.query(func.sum(Payment.montant)).filter(
-        and_(
-            Payment.created_at >= today_start,
-            Payment.created_at <= today_end
-        )
-    ).scalar()
 
-    return total or Decimal("0")
+def get_cash_register_days(db: Session, date_from: Optional[date] = None, date_to: Optional[date] = None) -> List[CashRegisterDay]:
+    """Per-day cash totals, most recent first (days without payments are absent)"""
+    query = db.query(CashRegisterDay)
+    if date_from:
+        query = query.filter(CashRegisterDay.date >= date_from)
+    if date_to:
+        query = query.filter(CashRegisterDay.date <= date_to)
+    return query.order_by(CashRegisterDay.date.desc()).all()
+
+
+def get_cash_register_day(db: Session, day: date) -> CashRegisterDay:
+    """Cash register of one day; an empty, unsaved row if nothing was received"""
+    register = db.get(CashRegisterDay, day)
+    if register is None:
+        register = CashRegisterDay(date=day, total=Decimal("0.00"), nb_paiements=0, **{mode.value: Decimal("0.00") for mode in PaymentMode})
+    return register
+
+
+def close_cash_register_day(db: Session, day: date, user_id: Optional[int] = None) -> CashRegisterDay:
+    """End-of-day close: record who closed the register, when, and the total at that time"""
+    rollups.open_cash_day(db, day)
+    register = db.execute(
+        select(CashRegisterDay).where(CashRegisterDay.date == day).with_for_update().execution_options(populate_existing=True)
+    ).scalar_one()
+    if register.closed_at is not None:
+        db.rollback()
+        raise ValueError("La caisse de ce jour est déjà clôturée")
+
+    register.closed_at = datetime.utcnow()
+    register.closed_by = user_id
+    register.closed_total = register.total
+    db.commit()
+    db.refresh(register)
+    create_audit_log(db, user_id, "CLOSE", "cash_register_days", None, {"date": day, "total": float(register.total)})
+    return register
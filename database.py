@@ -1,18 +1,52 @@
+import time
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.requests import Request
 from config import get_settings
 
 settings = get_settings()
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    pool_pre_ping=True,
-    pool_recycle=3600,
-    echo=False
-)
+# Set by ReadYourWritesMiddleware after a write: the writer's reads go to the
+# primary until it expires, so they never miss their own changes on a lagging
+# replica.
+RECENT_WRITE_COOKIE = "recent_write"
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+def pool_options(url: str, pool_size: int, max_overflow: int, pool_timeout: float) -> dict:
+    """QueuePool sizing, except for in-memory SQLite which uses a single shared connection"""
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return {}
+    return {"pool_size": pool_size, "max_overflow": max_overflow, "pool_timeout": pool_timeout}
+
+
+def make_engine(url: str, pool_size: int, max_overflow: int, pool_timeout: float):
+    return create_engine(
+        url,
+        pool_pre_ping=True,
+        pool_recycle=3600,
+        echo=False,
+        **pool_options(url, pool_size, max_overflow, pool_timeout)
+    )
+
+
+engine = make_engine(settings.DATABASE_URL, settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW, settings.DB_POOL_TIMEOUT)
+
+# Replica behind the read-only routes (get_read_db); the primary itself when
+# READ_DATABASE_URL is not set
+if settings.READ_DATABASE_URL:
+    read_engine = make_engine(
+        settings.READ_DATABASE_URL, settings.READ_DB_POOL_SIZE, settings.READ_DB_MAX_OVERFLOW, settings.READ_DB_POOL_TIMEOUT
+    )
+else:
+    read_engine = engine
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
 
 Base = declarative_base()
 
@@ -24,3 +58,44 @@ def get_db():
     finally:
         db.close()
 
+
+def is_replica(db: Session) -> bool:
+    return db.get_bind() is not engine
+
+
+def wrote_recently(request: Request) -> bool:
+    try:
+        written_at = float(request.cookies.get(RECENT_WRITE_COOKIE, ""))
+    except ValueError:
+        return False
+    return time.time() - written_at < settings.READ_YOUR_WRITES_SECONDS
+
+
+def get_read_db(request: Request):
+    """Session of the read-only routes: the replica, or the primary for a user who just wrote"""
+    db = SessionLocal() if wrote_recently(request) else ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+class ReadYourWritesMiddleware:
+    """Marks the client of every successful write with RECENT_WRITE_COOKIE"""
+
+    def __init__(self, app, window: float):
+        self.app = app
+        self.window = window
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                cookie = f"{RECENT_WRITE_COOKIE}={time.time():.3f}; Max-Age={int(self.window) + 1}; Path=/; HttpOnly; SameSite=Lax"
+                message = {**message, "headers": [*message.get("headers", []), (b"set-cookie", cookie.encode())]}
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,169 @@
+"""
+Streaming exports of appointments and payments for accounting (CSV and
+Apache Parquet).
+
+Rows come from a server-side cursor (yield_per) in batches of
+EXPORT_BATCH_SIZE and are written out batch by batch: one chunk of the
+CSV response, or one Parquet row group. Memory use depends on the batch
+size, not on the number of exported rows. Parquet needs the optional
+`pyarrow` package.
+"""
+import csv
+import enum
+import io
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from models import Appointment, Patient, Service, Payment
+from config import get_settings
+
+settings = get_settings()
+
+# (column name, SQL expression, Parquet type name) per exported column
+APPOINTMENT_COLUMNS = [
+    ("id", Appointment.id, "int64"),
+    ("date", Appointment.date, "date"),
+    ("heure", Appointment.heure, "time"),
+    ("patient_id", Appointment.patient_id, "int64"),
+    ("patient_nom", Patient.nom, "string"),
+    ("patient_prenom", Patient.prenom, "string"),
+    ("service", Service.nom, "string"),
+    ("prix", Appointment.prix, "decimal"),
+    ("verse", Appointment.verse, "decimal"),
+    ("reste", Appointment.reste, "decimal"),
+    ("etat", Appointment.etat, "string"),
+    ("notes", Appointment.notes, "string"),
+    ("created_at", Appointment.created_at, "timestamp"),
+]
+
+PAYMENT_COLUMNS = [
+    ("id", Payment.id, "int64"),
+    ("created_at", Payment.created_at, "timestamp"),
+    ("appointment_id", Payment.appointment_id, "int64"),
+    ("rdv_date", Appointment.date, "date"),
+    ("patient_id", Appointment.patient_id, "int64"),
+    ("patient_nom", Patient.nom, "string"),
+    ("patient_prenom", Patient.prenom, "string"),
+    ("service", Service.nom, "string"),
+    ("montant", Payment.montant, "decimal"),
+    ("mode", Payment.mode, "string"),
+]
+
+EXPORTS = {
+    "appointments": APPOINTMENT_COLUMNS,
+    "payments": PAYMENT_COLUMNS,
+}
+
+
+def export_query(kind: str, criteria: list):
+    """SELECT of the export columns, filtered like crud.get_appointments"""
+    columns = EXPORTS[kind]
+    stmt = select(*[expr for _, expr, _ in columns])
+    if kind == "payments":
+        stmt = stmt.select_from(Payment).join(Appointment, Appointment.id == Payment.appointment_id)
+    else:
+        stmt = stmt.select_from(Appointment)
+    stmt = stmt.join(Patient, Patient.id == Appointment.patient_id).join(Service, Service.id == Appointment.service_id)
+    order = [Payment.id] if kind == "payments" else [Appointment.date, Appointment.heure, Appointment.id]
+    return stmt.where(*criteria).order_by(*order)
+
+
+def iter_batches(db: Session, stmt, batch_size: int = None):
+    """Lists of row tuples from a server-side cursor"""
+    batch_size = batch_size or settings.EXPORT_BATCH_SIZE
+    result = db.execute(stmt.execution_options(yield_per=batch_size))
+    for partition in result.partitions():
+        yield partition
+
+
+# A text cell starting with one of these runs as a formula in Excel/LibreOffice
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _plain(value):
+    return value.value if isinstance(value, enum.Enum) else value
+
+
+def _csv_cell(value):
+    """Plain value, with text that a spreadsheet would evaluate prefixed by a quote"""
+    value = _plain(value)
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def iter_csv(db: Session, kind: str, stmt):
+    """
+    CSV bytes, one chunk per batch (UTF-8 with BOM so Excel reads the
+    accents). Names and notes may come from imported files: text starting
+    like a formula is escaped.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _, _ in EXPORTS[kind]])
+    yield ("﻿" + buffer.getvalue()).encode("utf-8")
+
+    for rows in iter_batches(db, stmt):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([[_csv_cell(value) for value in row] for row in rows])
+        yield buffer.getvalue().encode("utf-8")
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands what was written so far to the HTTP response"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_parquet(db: Session, kind: str, stmt):
+    """Parquet bytes, one row group per batch; the footer comes last"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {
+        "int64": pa.int64(),
+        "string": pa.string(),
+        "date": pa.date32(),
+        "time": pa.time64("us"),
+        "timestamp": pa.timestamp("us"),
+        "decimal": pa.decimal128(12, 2),
+    }
+    columns = EXPORTS[kind]
+    schema = pa.schema([(name, types[type_name]) for name, _, type_name in columns])
+
+    sink = _ChunkSink()
+    with pq.ParquetWriter(sink, schema, compression="snappy") as writer:
+        for rows in iter_batches(db, stmt):
+            arrays = [
+                pa.array([_plain(row[i]) for row in rows], type=schema.field(i).type)
+                for i in range(len(columns))
+            ]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            yield sink.drain()
+    yield sink.drain()
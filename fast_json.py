@@ -0,0 +1,83 @@
+"""
+Fast JSON path for the list endpoints (FAST_JSON_RESPONSES).
+
+By default FastAPI validates every ORM object of a list against the route's
+response_model, then encodes the result with the stdlib json module; for a
+page of a few hundred appointments that costs more than the query. On the
+fast path crud fetches only the response columns into row objects shaped
+like the response schema (row_type), and FastJSONResponse encodes them with
+orjson. Values come out exactly as with response_model: Decimal as its
+string, dates and times in ISO format, enums as their value.
+
+    python benchmarks/bench_json.py --rows 1000
+"""
+import dataclasses
+import json
+from datetime import date, time
+from decimal import Decimal
+from enum import Enum
+from functools import lru_cache
+from typing import Any, Iterable
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+
+def _default(value: Any):
+    # Pydantic's JSON form of a Decimal is its string, not a float
+    if isinstance(value, Decimal):
+        return str(value)
+    # orjson encodes the types below itself; the stdlib fallback needs them
+    if dataclasses.is_dataclass(value):
+        return {field.name: getattr(value, field.name) for field in dataclasses.fields(value)}
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response encoded with orjson; content may hold row_type objects, Decimal, dates and enums"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+@lru_cache(maxsize=None)
+def row_type(model: type):
+    """
+    Dataclass with the fields of a response schema, in the same order (nested
+    schemas become nested row types). orjson serializes dataclasses natively,
+    without the per-object validation of response_model; it walks __dict__
+    much faster than __slots__, hence no slots.
+    """
+    fields = []
+    for name, field in model.model_fields.items():
+        annotation = field.annotation
+        if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+            annotation = row_type(annotation)
+        fields.append((name, annotation))
+    return dataclasses.make_dataclass(f"{model.__name__}Row", fields)
+
+
+def field_names(model: type) -> tuple:
+    return tuple(model.model_fields)
+
+
+def to_rows(model: type, objects: Iterable) -> list:
+    """Row objects of `model` from any objects carrying its fields as attributes (flat schemas)"""
+    row = row_type(model)
+    names = field_names(model)
+    return [row(*(getattr(obj, name) for name in names)) for obj in objects]
@@ -1,21 +1,39 @@
-from fastapi import FastAPI, Request, Depends, HTTPException, status, Form
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
+from fastapi import FastAPI, Request, Response, Depends, HTTPException, status, Form, Query
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, StreamingResponse, FileResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from starlette.datastructures import UploadFile
 from sqlalchemy.orm import Session
 from datetime import datetime, date, time, timedelta
 from typing import Optional, List
 from decimal import Decimal
 from contextlib import asynccontextmanager
+import os
+import re
 import json
+import hashlib
+import hmac
 
 import uvicorn
-from database import get_db, engine
+import anyio.to_thread
+from database import get_db, get_read_db, engine, read_engine, SessionLocal, ReadSessionLocal, ReadYourWritesMiddleware
 from models import Base, AppointmentState, PaymentMode, UserRole
 import schemas
 import crud
 import auth
-from stats import get_dashboard_stats
+import patient_import
+import exports
+import fast_json
+import metrics
+import query_stats
+from slow_queries import slow_query_log, SlowQueryMiddleware
+from stats import get_dashboard_stats, get_dashboard_cache_info
+from rollups import ensure_rollups
+from search_index import ensure_search_index
+from audit import audit_writer
+from patient_index import patient_index
+from service_catalog import service_catalog
+from config import get_settings
 
 
 @asynccontextmanager
@@ -23,21 +41,58 @@ async def lifespan(app: FastAPI):
     """Lifespan event handler for startup and shutdown"""
     # Startup
     print("Starting up application...")
+
+    # Routes that touch the database are plain `def`: FastAPI runs them in
+    # this bounded thread pool so a slow query never blocks the event loop.
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.DB_THREADPOOL_SIZE
+
     try:
         Base.metadata.create_all(bind=engine)
         print("✓ Database tables created successfully")
+        db = SessionLocal()
+        try:
+            if ensure_rollups(db):
+                print("✓ Daily statistics rollups backfilled")
+            if ensure_search_index(db):
+                print("✓ Patient search index backfilled")
+        finally:
+            db.close()
     except Exception as e:
         print(f"⚠ Warning: Could not create database tables: {e}")
         print("Make sure MySQL is running and database 'clinic_db' exists")
         print("Check your .env file for correct database credentials")
 
+    audit_writer.start()
+    # Built in the background; suggestions come from the database until it is ready
+    patient_index.start()
+    if settings.METRICS_ENABLED:
+        metrics.exporter.start()
+
     yield
 
     # Shutdown
     print("Shutting down application...")
+    audit_writer.stop()
+    print("✓ Audit log flushed")
+    if settings.METRICS_ENABLED:
+        metrics.exporter.stop()
+
 
+settings = get_settings()
 
 app = FastAPI(title="Clinic Management System", lifespan=lifespan)
+if settings.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware, registry=metrics.registry)
+if read_engine is not engine:
+    app.add_middleware(ReadYourWritesMiddleware, window=settings.READ_YOUR_WRITES_SECONDS)
+if settings.QUERY_STATS_ENABLED:
+    query_stats.install(engine)
+    query_stats.install(read_engine)
+    app.add_middleware(query_stats.QueryStatsMiddleware, repeat_threshold=settings.QUERY_STATS_REPEAT_THRESHOLD)
+if settings.SLOW_QUERY_LOG_ENABLED:
+    slow_query_log.install(engine)
+    slow_query_log.install(read_engine)
+    app.add_middleware(SlowQueryMiddleware)
 
 # Exception handler for authentication errors
 @app.exception_handler(HTTPException)
@@ -94,7 +149,15 @@ async def login(
     password: str = Form(...),
     db: Session = Depends(get_db)
 ):
-    user = auth.authenticate_user(db, username, password)
+    try:
+        user = await auth.authenticate_user_async(db, username, password)
+    except auth.HashingOverloaded:
+        return templates.TemplateResponse(
+            "login.html",
+            {"request": request, "error": "Trop de connexions simultanées, veuillez réessayer dans un instant"},
+            status_code=429,
+            headers={"Retry-After": "1"}
+        )
     if not user:
         return templates.TemplateResponse(
             "login.html",
@@ -118,7 +181,7 @@ async def logout():
 # ============ Dashboard ============
 
 @app.get("/", response_class=HTMLResponse)
-async def root(request: Request, db: Session = Depends(get_db)):
+def root(request: Request, db: Session = Depends(get_db)):
     # Check if user is logged in
     user = auth.get_current_user_from_cookie(request, db)
     if user:
@@ -128,9 +191,9 @@ async def root(request: Request, db: Session = Depends(get_db)):
 
 
 @app.get("/dashboard", response_class=HTMLResponse)
-async def dashboard(
+def dashboard(
     request: Request,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user = Depends(auth.require_login)
 ):
     stats = get_dashboard_stats(db)
@@ -143,10 +206,10 @@ async def dashboard(
 # ============ Clients (Patients) ============
 
 @app.get("/clients", response_class=HTMLResponse)
-async def clients_page(
+def clients_page(
     request: Request,
     search: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user = Depends(auth.require_login)
 ):
     patients = crud.get_patients(db, search=search)
@@ -168,9 +231,9 @@ async def clients_page(
 # ============ RDV Aujourd'hui ============
 
 @app.get("/today", response_class=HTMLResponse)
-async def today_page(
+def today_page(
     request: Request,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user = Depends(auth.require_login)
 ):
     appointments = crud.get_today_appointments(db)
@@ -183,23 +246,20 @@ async def today_page(
 # ============ Rendez-vous ============
 
 @app.get("/rdv", response_class=HTMLResponse)
-async def rdv_page(
+def rdv_page(
     request: Request,
     search: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user = Depends(auth.require_login)
 ):
+    # The patient and service pickers load their options from the API
     appointments = crud.get_appointments(db, search=search)
-    patients = crud.get_patients(db, limit=1000)
-    services = crud.get_services(db)
     return templates.TemplateResponse(
         "rdv.html",
         {
             "request": request,
             "user": current_user,
             "appointments": appointments,
-            "patients": patients,
-            "services": services,
             "search": search or ""
         }
     )
@@ -208,7 +268,7 @@ async def rdv_page(
 # ============ Agenda ============
 
 @app.get("/agenda", response_class=HTMLResponse)
-async def agenda_page(
+def agenda_page(
     request: Request,
     db: Session = Depends(get_db),
     current_user = Depends(auth.require_login)
@@ -222,9 +282,9 @@ async def agenda_page(
 # ============ Valider Clients ============
 
 @app.get("/clients/valider", response_class=HTMLResponse)
-async def valider_clients_page(
+def valider_clients_page(
     request: Request,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user = Depends(auth.require_login)
 ):
     patients = crud.get_patients_requiring_validation(db)
@@ -237,9 +297,9 @@ async def valider_clients_page(
 # ============ En Attente ============
 
 @app.get("/rdv/en-attente", response_class=HTMLResponse)
-async def en_attente_page(
+def en_attente_page(
     request: Request,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user = Depends(auth.require_login)
 ):
     appointments = crud.get_appointments(db, etat=AppointmentState.en_attente)
@@ -252,9 +312,9 @@ async def en_attente_page(
 # ============ Paiements ============
 
 @app.get("/paiements", response_class=HTMLResponse)
-async def paiements_page(
+def paiements_page(
     request: Request,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user = Depends(auth.require_login)
 ):
     # Get all appointments with outstanding balances or payments
@@ -275,7 +335,7 @@ async def paiements_page(
 # ============ Contact ============
 
 @app.get("/contact", response_class=HTMLResponse)
-async def contact_page(
+def contact_page(
     request: Request,
     db: Session = Depends(get_db),
     current_user = Depends(auth.require_login)
@@ -295,9 +355,9 @@ async def test_services_direct(request: Request):
 
 
 @app.get("/services", response_class=HTMLResponse)
-async def services_page(
+def services_page(
     request: Request,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user = Depends(auth.require_login)
 ):
     services = crud.get_services(db, active_only=False)
@@ -309,33 +369,116 @@ async def services_page(
 
 # ============ API Routes ============
 
+# User API
+@app.patch("/api/users/{user_id}", response_model=schemas.UserResponse)
+def api_update_user(
+    user_id: int,
+    user: schemas.UserUpdate,
+    db: Session = Depends(get_db),
+    current_user = Depends(auth.require_admin)
+):
+    updated_user = crud.update_user(db, user_id, user, current_user.id)
+    if not updated_user:
+        raise HTTPException(status_code=404, detail="Utilisateur introuvable")
+    return updated_user
+
+
 # Stats API
 @app.get("/api/stats/overview")
-async def api_stats_overview(
+def api_stats_overview(
     date_from: Optional[date] = None,
     date_to: Optional[date] = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user = Depends(auth.require_login)
 ):
     stats = get_dashboard_stats(db, date_from, date_to)
     return stats
 
 
+@app.get("/api/stats/cache")
+async def api_stats_cache(
+    current_user = Depends(auth.require_admin)
+):
+    """Hit/miss counters of the dashboard statistics cache"""
+    return get_dashboard_cache_info()
+
+
+@app.get("/api/slow-queries")
+def api_slow_queries(
+    current_user = Depends(auth.require_admin)
+):
+    """Statements slower than SLOW_QUERY_THRESHOLD_MS seen by this worker, newest first"""
+    if not settings.SLOW_QUERY_LOG_ENABLED:
+        raise HTTPException(status_code=404, detail="Journal des requêtes lentes désactivé (SLOW_QUERY_LOG_ENABLED)")
+    return {
+        "pid": os.getpid(),
+        "threshold_ms": settings.SLOW_QUERY_THRESHOLD_MS,
+        "records": slow_query_log.entries(),
+    }
+
+
+@app.delete("/api/slow-queries")
+def api_clear_slow_queries(
+    current_user = Depends(auth.require_admin)
+):
+    slow_query_log.clear()
+    return {"message": "Journal des requêtes lentes vidé"}
+
+
+# Prometheus metrics (per-route latency, status codes, response sizes)
+@app.get("/metrics", include_in_schema=False)
+def metrics_endpoint(request: Request):
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if settings.METRICS_TOKEN:
+        expected = f"Bearer {settings.METRICS_TOKEN}".encode()
+        if not hmac.compare_digest(request.headers.get("authorization", "").encode(), expected):
+            raise HTTPException(status_code=401, detail="Jeton de métriques invalide")
+    return Response(metrics.exporter.collect(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 # Patient API
 @app.get("/api/patients", response_model=List[schemas.PatientResponse])
-async def api_get_patients(
+def api_get_patients(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     search: Optional[str] = None,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db),
     current_user = Depends(auth.require_login)
 ):
-    patients = crud.get_patients(db, skip=skip, limit=limit, search=search)
+    get_page = crud.get_patient_rows if settings.FAST_JSON_RESPONSES else crud.get_patients
+    try:
+        patients = get_page(db, skip=skip, limit=limit, search=search, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    headers = {}
+    if patients and len(patients) == limit:
+        headers["X-Next-Cursor"] = crud.patient_cursor(patients[-1])
+    if settings.FAST_JSON_RESPONSES:
+        return fast_json.FastJSONResponse(patients, headers=headers)
+    response.headers.update(headers)
     return patients
 
 
+# Longest suggestion list a picker can ask for
+PATIENT_SUGGEST_MAX = 20
+
+
+@app.get("/api/patients/suggest", response_model=List[schemas.PatientSuggestion])
+def api_suggest_patients(
+    q: str = "",
+    limit: int = Query(10, ge=1, le=PATIENT_SUGGEST_MAX),
+    db: Session = Depends(get_read_db),
+    current_user = Depends(auth.require_login)
+):
+    """Typeahead of the patient pickers (prefix search on nom, prénom, email, téléphone)"""
+    return crud.suggest_patients(db, q, limit)
+
+
 @app.post("/api/patients", response_model=schemas.PatientResponse)
-async def api_create_patient(
+def api_create_patient(
     patient: schemas.PatientCreate,
     db: Session = Depends(get_db),
     current_user = Depends(auth.require_login)
@@ -343,8 +486,55 @@ async def api_create_patient(
     return crud.create_patient(db, patient, current_user.id)
 
 
+IMPORT_ERRORS_NAME = re.compile(r"^import-[0-9a-f]{32}\.csv$")
+
+
+def _import_progress(upload: UploadFile, fmt: str, user_id: int):
+    """NDJSON progress lines of a patient import (runs in the threadpool, with its own session)"""
+    db = SessionLocal()
+    try:
+        for report in patient_import.iter_import(db, upload.file, fmt=fmt, user_id=user_id):
+            if report["errors_file"]:
+                report["errors_file"] = f"/api/patients/import/errors/{os.path.basename(report['errors_file'])}"
+            yield json.dumps(report) + "\n"
+    finally:
+        db.close()
+        upload.file.close()
+
+
+@app.post("/api/patients/import")
+async def api_import_patients(
+    request: Request,
+    current_user = Depends(auth.require_admin)
+):
+    """
+    Bulk import from a CSV or JSONL upload (multipart field "file").
+    Streams one JSON progress line per committed batch, then the summary.
+    """
+    # Parsed by hand rather than as an UploadFile parameter: FastAPI closes
+    # (and deletes) those uploads before a streamed body is sent
+    form = await request.form()
+    upload = form.get("file")
+    if not isinstance(upload, UploadFile):
+        await form.close()
+        raise HTTPException(status_code=400, detail="Fichier manquant (champ 'file')")
+    fmt = patient_import.detect_format(upload.filename or "")
+    return StreamingResponse(_import_progress(upload, fmt, current_user.id), media_type="application/x-ndjson")
+
+
+@app.get("/api/patients/import/errors/{name}")
+def api_import_errors(
+    name: str,
+    current_user = Depends(auth.require_admin)
+):
+    path = os.path.join(settings.IMPORT_ERRORS_DIR, name)
+    if not IMPORT_ERRORS_NAME.match(name) or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Rapport d'erreurs introuvable")
+    return FileResponse(path, media_type="text/csv", filename=name)
+
+
 @app.get("/api/patients/{patient_id}", response_model=schemas.PatientResponse)
-async def api_get_patient(
+def api_get_patient(
     patient_id: int,
     db: Session = Depends(get_db),
     current_user = Depends(auth.require_login)
@@ -356,7 +546,7 @@ async def api_get_patient(
 
 
 @app.patch("/api/patients/{patient_id}", response_model=schemas.PatientResponse)
-async def api_update_patient(
+def api_update_patient(
     patient_id: int,
     patient: schemas.PatientUpdate,
     db: Session = Depends(get_db),
@@ -369,7 +559,7 @@ async def api_update_patient(
 
 
 @app.delete("/api/patients/{patient_id}")
-async def api_delete_patient(
+def api_delete_patient(
     patient_id: int,
     db: Session = Depends(get_db),
     current_user = Depends(auth.require_admin)
@@ -381,37 +571,49 @@ async def api_delete_patient(
 
 
 # Service API
+def service_cache_headers(version: str) -> dict:
+    """The catalog version as ETag: the pickers revalidate instead of refetching"""
+    return {"ETag": f'"services-{version}"', "Cache-Control": "private, no-cache"}
+
+
 @app.get("/api/services", response_model=List[schemas.ServiceResponse])
-async def api_get_services(
-    db: Session = Depends(get_db),
+def api_get_services(
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_db),
     current_user = Depends(auth.require_login)
 ):
-    try:
-        print(f"[DEBUG] Getting services for user: {current_user.username}")
-        services = crud.get_services(db, active_only=True)
-        print(f"[DEBUG] Found {len(services)} services")
-        return services
-    except Exception as e:
-        print(f"[ERROR] Failed to get services: {e}")
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Erreur serveur: {str(e)}")
+    catalog = service_catalog.get(db)
+    cache_headers = service_cache_headers(catalog.version)
+    if etag_matches(request.headers.get("if-none-match"), cache_headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers)
+    if settings.FAST_JSON_RESPONSES:
+        return fast_json.FastJSONResponse(fast_json.to_rows(schemas.ServiceResponse, catalog.active), headers=cache_headers)
+    response.headers.update(cache_headers)
+    return catalog.active
 
 
 @app.get("/api/services/{service_id}", response_model=schemas.ServiceResponse)
-async def api_get_service(
+def api_get_service(
     service_id: int,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user = Depends(auth.require_login)
 ):
-    service = crud.get_service(db, service_id)
+    catalog = service_catalog.get(db)
+    service = catalog.by_id.get(service_id)
     if not service:
         raise HTTPException(status_code=404, detail="Service introuvable")
+    cache_headers = service_cache_headers(catalog.version)
+    if etag_matches(request.headers.get("if-none-match"), cache_headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers)
+    response.headers.update(cache_headers)
     return service
 
 
 @app.post("/api/services", response_model=schemas.ServiceResponse)
-async def api_create_service(
+def api_create_service(
     service: schemas.ServiceCreate,
     db: Session = Depends(get_db),
     current_user = Depends(auth.require_login)
@@ -420,7 +622,7 @@ async def api_create_service(
 
 
 @app.patch("/api/services/{service_id}", response_model=schemas.ServiceResponse)
-async def api_update_service(
+def api_update_service(
     service_id: int,
     service: schemas.ServiceUpdate,
     db: Session = Depends(get_db),
@@ -433,7 +635,7 @@ async def api_update_service(
 
 
 @app.delete("/api/services/{service_id}")
-async def api_delete_service(
+def api_delete_service(
     service_id: int,
     db: Session = Depends(get_db),
     current_user = Depends(auth.require_admin)
@@ -453,7 +655,8 @@ async def api_delete_service(
 
 # Appointment API
 @app.get("/api/rdv", response_model=List[schemas.AppointmentResponse])
-async def api_get_appointments(
+def api_get_appointments(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     search: Optional[str] = None,
@@ -461,18 +664,30 @@ async def api_get_appointments(
     date_from: Optional[date] = None,
     date_to: Optional[date] = None,
     patient_id: Optional[int] = None,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db),
     current_user = Depends(auth.require_login)
 ):
-    appointments = crud.get_appointments(
-        db, skip=skip, limit=limit, search=search,
-        etat=etat, date_from=date_from, date_to=date_to, patient_id=patient_id
-    )
+    get_page = crud.get_appointment_rows if settings.FAST_JSON_RESPONSES else crud.get_appointments
+    try:
+        appointments = get_page(
+            db, skip=skip, limit=limit, search=search,
+            etat=etat, date_from=date_from, date_to=date_to, patient_id=patient_id,
+            cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    headers = {}
+    if appointments and len(appointments) == limit:
+        headers["X-Next-Cursor"] = crud.appointment_cursor(appointments[-1])
+    if settings.FAST_JSON_RESPONSES:
+        return fast_json.FastJSONResponse(appointments, headers=headers)
+    response.headers.update(headers)
     return appointments
 
 
 @app.post("/api/rdv", response_model=schemas.AppointmentResponse)
-async def api_create_appointment(
+def api_create_appointment(
     appointment: schemas.AppointmentCreate,
     db: Session = Depends(get_db),
     current_user = Depends(auth.require_login)
@@ -483,8 +698,20 @@ async def api_create_appointment(
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@app.post("/api/rdv/series", response_model=schemas.AppointmentSeriesResult)
+def api_create_appointment_series(
+    series: schemas.AppointmentSeriesCreate,
+    db: Session = Depends(get_db),
+    current_user = Depends(auth.require_login)
+):
+    try:
+        return crud.create_appointment_series(db, series, current_user.id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @app.get("/api/rdv/{appointment_id}", response_model=schemas.AppointmentResponse)
-async def api_get_appointment(
+def api_get_appointment(
     appointment_id: int,
     db: Session = Depends(get_db),
     current_user = Depends(auth.require_login)
@@ -496,7 +723,7 @@ async def api_get_appointment(
 
 
 @app.patch("/api/rdv/{appointment_id}", response_model=schemas.AppointmentResponse)
-async def api_update_appointment(
+def api_update_appointment(
     appointment_id: int,
     appointment: schemas.AppointmentUpdate,
     db: Session = Depends(get_db),
@@ -512,12 +739,15 @@ async def api_update_appointment(
 
 
 @app.delete("/api/rdv/{appointment_id}")
-async def api_delete_appointment(
+def api_delete_appointment(
     appointment_id: int,
     db: Session = Depends(get_db),
     current_user = Depends(auth.require_admin)
 ):
-    success = crud.delete_appointment(db, appointment_id, current_user.id)
+    try:
+        success = crud.delete_appointment(db, appointment_id, current_user.id)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     if not success:
         raise HTTPException(status_code=404, detail="Rendez-vous introuvable")
     return {"message": "Rendez-vous supprimé"}
@@ -525,7 +755,7 @@ async def api_delete_appointment(
 
 # Payment API
 @app.get("/api/rdv/{appointment_id}/payments", response_model=List[schemas.PaymentResponse])
-async def api_get_payments(
+def api_get_payments(
     appointment_id: int,
     db: Session = Depends(get_db),
     current_user = Depends(auth.require_login)
@@ -534,7 +764,7 @@ async def api_get_payments(
 
 
 @app.post("/api/rdv/{appointment_id}/payments", response_model=schemas.PaymentResponse)
-async def api_create_payment(
+def api_create_payment(
     appointment_id: int,
     payment: schemas.PaymentCreate,
     db: Session = Depends(get_db),
@@ -548,82 +778,172 @@ async def api_create_payment(
         raise HTTPException(status_code=400, detail=str(e))
 
 
-# Agenda API (FullCalendar format)
-@app.get("/api/agenda")
-async def api_agenda(
-    start: str,
-    end: str,
-    db: Session = Depends(get_db),
+# Cash register API
+@app.get("/api/caisse", response_model=List[schemas.CashRegisterDayResponse])
+def api_get_cash_register_days(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: Session = Depends(get_read_db),
+    current_user = Depends(auth.require_login)
+):
+    """Cash received per day and payment mode"""
+    return crud.get_cash_register_days(db, date_from, date_to)
+
+
+@app.get("/api/caisse/{day}", response_model=schemas.CashRegisterDayResponse)
+def api_get_cash_register_day(
+    day: date,
+    db: Session = Depends(get_read_db),
     current_user = Depends(auth.require_login)
 ):
+    return crud.get_cash_register_day(db, day)
+
+
+@app.post("/api/caisse/{day}/cloture", response_model=schemas.CashRegisterDayResponse)
+def api_close_cash_register_day(
+    day: date,
+    db: Session = Depends(get_db),
+    current_user = Depends(auth.require_admin)
+):
+    """End-of-day close report"""
+    try:
+        return crud.close_cash_register_day(db, day, current_user.id)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+# Export API (accounting extracts)
+EXPORT_FORMATS = {
+    "csv": ("text/csv; charset=utf-8", exports.iter_csv),
+    "parquet": ("application/vnd.apache.parquet", exports.iter_parquet),
+}
+
+
+def _export_stream(kind: str, writer, filters: dict):
+    """Export bytes (runs in the threadpool, with its own replica session for the whole stream)"""
+    db = ReadSessionLocal()
     try:
-        # More flexible date parsing
-        # Remove 'Z' and handle various formats
-        start_clean = start.replace('Z', '').replace('+00:00', '')
-        end_clean = end.replace('Z', '').replace('+00:00', '')
+        stmt = exports.export_query(kind, crud.appointment_filters(db, **filters))
+        yield from writer(db, kind, stmt)
+    finally:
+        db.close()
 
-        # Try to parse with time, if that fails, just use the date part
-        try:
-            start_date = datetime.fromisoformat(start_clean).date()
-        except ValueError:
-            # If full datetime parsing fails, try just the date part
-            start_date = datetime.strptime(start_clean.split('T')[0], '%Y-%m-%d').date()
 
-        try:
-            end_date = datetime.fromisoformat(end_clean).date()
-        except ValueError:
-            end_date = datetime.strptime(end_clean.split('T')[0], '%Y-%m-%d').date()
-
-        print(f"[API AGENDA] Loading appointments from {start_date} to {end_date}")
-
-        appointments = crud.get_appointments(db, date_from=start_date, date_to=end_date, limit=1000)
-
-        print(f"[API AGENDA] Found {len(appointments)} appointments")
-
-        events = []
-        for appt in appointments:
-            try:
-                # Combine date and time for start
-                start_datetime = datetime.combine(appt.date, appt.heure)
-                # Assume 30min duration
-                end_datetime = start_datetime + timedelta(minutes=30)
-
-                # Color based on state
-                color_map = {
-                    "en_attente": "#ffc107",  # warning/yellow
-                    "valide": "#28a745",      # success/green
-                    "annule": "#dc3545"       # danger/red
-                }
-
-                events.append({
-                    "id": appt.id,
-                    "title": f"{appt.patient.prenom} {appt.patient.nom} - {appt.service.nom}",
-                    "start": start_datetime.isoformat(),
-                    "end": end_datetime.isoformat(),
-                    "backgroundColor": color_map.get(appt.etat.value, "#6c757d"),
-                    "borderColor": color_map.get(appt.etat.value, "#6c757d"),
-                    "extendedProps": {
-                        "patientId": appt.patient_id,
-                        "patientName": f"{appt.patient.prenom} {appt.patient.nom}",
-                        "serviceName": appt.service.nom,
-                        "etat": appt.etat.value,
-                        "prix": float(appt.prix),
-                        "verse": float(appt.verse),
-                        "reste": float(appt.reste)
-                    }
-                })
-            except Exception as e:
-                print(f"[API AGENDA] Error processing appointment {appt.id}: {e}")
-                continue
-
-        print(f"[API AGENDA] Returning {len(events)} events")
-        return events
+@app.get("/api/export/{kind}")
+def api_export(
+    kind: str,
+    format: str = "csv",
+    search: Optional[str] = None,
+    etat: Optional[AppointmentState] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    patient_id: Optional[int] = None,
+    current_user = Depends(auth.require_admin)
+):
+    """
+    Full extract of appointments or payments, streamed batch by batch.
+    Same filters as /api/rdv (for payments they apply to the appointment).
+    """
+    if kind not in exports.EXPORTS:
+        raise HTTPException(status_code=404, detail="Export inconnu")
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Format non supporté (csv ou parquet)")
+    if format == "parquet" and not exports.parquet_available():
+        raise HTTPException(status_code=501, detail="Export Parquet indisponible: installer pyarrow")
+
+    media_type, writer = EXPORT_FORMATS[format]
+    filters = {"search": search, "etat": etat, "date_from": date_from, "date_to": date_to, "patient_id": patient_id}
+    filename = f"{kind}-{date.today().isoformat()}.{format}"
+    return StreamingResponse(
+        _export_stream(kind, writer, filters),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
-    except Exception as e:
-        print(f"[API AGENDA] Error: {e}")
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Erreur lors du chargement des rendez-vous: {str(e)}")
+
+# Agenda API (FullCalendar format)
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match comparison (weak, as RFC 9110 requires for GET)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+
+# Event color per appointment state
+AGENDA_COLORS = {
+    AppointmentState.en_attente: "#ffc107",  # warning/yellow
+    AppointmentState.valide: "#28a745",      # success/green
+    AppointmentState.annule: "#dc3545"       # danger/red
+}
+AGENDA_DEFAULT_COLOR = "#6c757d"
+AGENDA_EVENT_DURATION = timedelta(minutes=30)
+
+
+def agenda_event(row) -> dict:
+    """FullCalendar event for one crud.get_agenda_events row"""
+    # Positional unpacking is several times faster than Row attribute access
+    appointment_id, day, heure, etat, prix, verse, reste, patient_id, prenom, nom, service_nom = row
+    start_datetime = datetime.combine(day, heure)
+    color = AGENDA_COLORS.get(etat, AGENDA_DEFAULT_COLOR)
+    patient_name = f"{prenom} {nom}"
+    return {
+        "id": appointment_id,
+        "title": f"{patient_name} - {service_nom}",
+        "start": start_datetime.isoformat(),
+        "end": (start_datetime + AGENDA_EVENT_DURATION).isoformat(),
+        "backgroundColor": color,
+        "borderColor": color,
+        "extendedProps": {
+            "patientId": patient_id,
+            "patientName": patient_name,
+            "serviceName": service_nom,
+            "etat": etat.value,
+            "prix": float(prix),
+            "verse": float(verse),
+            "reste": float(reste)
+        }
+    }
+
+
+def agenda_bound(value: str) -> date:
+    """Day of a FullCalendar start/end parameter (ISO date or datetime, with or without offset)"""
+    cleaned = value.replace('Z', '').replace('+00:00', '')
+    try:
+        return datetime.fromisoformat(cleaned).date()
+    except ValueError:
+        pass
+    # Other offsets or formats: keep the date part
+    try:
+        return datetime.strptime(cleaned.split('T')[0], '%Y-%m-%d').date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Date invalide: {value}")
+
+
+@app.get("/api/agenda")
+def api_agenda(
+    start: str,
+    end: str,
+    request: Request,
+    db: Session = Depends(get_read_db),
+    current_user = Depends(auth.require_login)
+):
+    start_date = agenda_bound(start)
+    end_date = agenda_bound(end)
+
+    # Revalidation: FullCalendar refetches on every view change, so skip
+    # building the events when nothing in the window changed
+    version = crud.get_agenda_version(db, start_date, end_date)
+    etag = '"' + hashlib.sha1(repr((start_date, end_date, version)).encode()).hexdigest() + '"'
+    cache_headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers)
+
+    events = [agenda_event(row) for row in crud.get_agenda_events(db, start_date, end_date)]
+    # Plain dicts of JSON types: skip the jsonable_encoder pass
+    return JSONResponse(content=events, headers=cache_headers)
 
 
 if __name__ == "__main__":
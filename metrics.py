@@ -0,0 +1,361 @@
+"""
+Per-route HTTP metrics in Prometheus text format (GET /metrics).
+
+MetricsMiddleware is a plain ASGI middleware (no BaseHTTPMiddleware, whose
+per-request task and queue cost more than the measurement itself). For
+every request it records, labelled by method and route template:
+
+    http_requests_total{method,route,status}     counter
+    http_request_duration_seconds{method,route}  histogram
+    http_response_size_bytes{method,route}       histogram
+    http_requests_in_progress{method}            gauge
+
+Each uvicorn worker counts its own requests and writes a snapshot to
+SHARED_STATE_DIR/metrics/<pid>-<instance>.json every METRICS_FLUSH_INTERVAL
+seconds and at shutdown. The worker answering /metrics merges every snapshot
+with its own live figures, so a scrape sees the sum over all workers (the
+other workers lag by at most one flush interval). The snapshots of exited
+workers are folded into retired.json and deleted, at startup and on every
+scrape: their counters and histograms stay in the totals, which never go
+backwards, and their in-progress gauges are dropped. The directory only ever
+holds the live workers and retired.json, so it must not be shared with other
+deployments or with test runs.
+
+Overhead per request:
+
+    python benchmarks/bench_metrics.py
+"""
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from config import get_settings
+
+settings = get_settings()
+
+# Upper bounds in seconds; the last bucket (+Inf) is implicit
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+# Requests that matched no route (404s, static files) share one label
+UNMATCHED_ROUTE = "<unmatched>"
+
+# Sum of the snapshots of exited workers, and how long a worker waits for the
+# lock guarding it (a lock older than STALE_LOCK_SECONDS is from a killed process)
+RETIRED_FILE = "retired.json"
+LOCK_TIMEOUT = 5
+STALE_LOCK_SECONDS = 30
+
+
+class Histogram:
+    __slots__ = ("counts", "sum")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.sum = 0.0
+
+
+class MetricsRegistry:
+    """The figures of one worker process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests: Dict[tuple, int] = {}
+        self.durations: Dict[tuple, Histogram] = {}
+        self.sizes: Dict[tuple, Histogram] = {}
+        self.in_progress: Dict[str, int] = {}
+
+    def start(self, method: str):
+        with self._lock:
+            self.in_progress[method] = self.in_progress.get(method, 0) + 1
+
+    def finish(self, method: str, route: str, status: int, duration: float, size: int):
+        key = (method, route)
+        with self._lock:
+            self.in_progress[method] -= 1
+            counter_key = (method, route, status)
+            self.requests[counter_key] = self.requests.get(counter_key, 0) + 1
+
+            histogram = self.durations.get(key)
+            if histogram is None:
+                histogram = self.durations[key] = Histogram(len(DURATION_BUCKETS) + 1)
+            histogram.counts[bisect_left(DURATION_BUCKETS, duration)] += 1
+            histogram.sum += duration
+
+            histogram = self.sizes.get(key)
+            if histogram is None:
+                histogram = self.sizes[key] = Histogram(len(SIZE_BUCKETS) + 1)
+            histogram.counts[bisect_left(SIZE_BUCKETS, size)] += 1
+            histogram.sum += size
+
+    def snapshot(self) -> dict:
+        """JSON-ready copy of the figures, as written to the shared directory"""
+        with self._lock:
+            return {
+                "pid": os.getpid(),
+                "requests": [[*key, count] for key, count in self.requests.items()],
+                "durations": [[*key, h.counts[:], h.sum] for key, h in self.durations.items()],
+                "sizes": [[*key, h.counts[:], h.sum] for key, h in self.sizes.items()],
+                "in_progress": dict(self.in_progress),
+            }
+
+
+class MetricsMiddleware:
+    def __init__(self, app, registry: "MetricsRegistry"):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        response = {"status": 500, "size": 0}
+        registry = self.registry
+        registry.start(method)
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                response["size"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router stores the matched route in the (shared) scope
+            route = scope.get("route")
+            registry.finish(
+                method,
+                route.path if route is not None else UNMATCHED_ROUTE,
+                response["status"],
+                time.perf_counter() - start,
+                response["size"],
+            )
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _histogram_lines(name: str, label_names: tuple, entries: dict, buckets: tuple, lines: list):
+    lines.append(f"# TYPE {name} histogram")
+    for key, (counts, total) in sorted(entries.items()):
+        labels = ",".join(f'{label}="{_escape(value)}"' for label, value in zip(label_names, key))
+        cumulative = 0
+        for bound, count in zip(buckets, counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        cumulative += counts[-1]
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {total}")
+        lines.append(f"{name}_count{{{labels}}} {cumulative}")
+
+
+def _merge(snapshots: list):
+    """Summed requests, durations, sizes and in-progress gauges of several snapshots"""
+    requests, durations, sizes, in_progress = {}, {}, {}, {}
+    for snapshot in snapshots:
+        for *key, count in snapshot["requests"]:
+            key = tuple(key)
+            requests[key] = requests.get(key, 0) + count
+        for target, entries in ((durations, snapshot["durations"]), (sizes, snapshot["sizes"])):
+            for method, route, counts, total in entries:
+                merged = target.get((method, route))
+                if merged is None:
+                    target[(method, route)] = (list(counts), total)
+                else:
+                    target[(method, route)] = ([a + b for a, b in zip(merged[0], counts)], merged[1] + total)
+        if snapshot.get("alive", True):
+            for method, count in snapshot["in_progress"].items():
+                in_progress[method] = in_progress.get(method, 0) + count
+    return requests, durations, sizes, in_progress
+
+
+def retired_snapshot(snapshots: list) -> dict:
+    """The counters and histograms of exited workers, summed into one snapshot"""
+    requests, durations, sizes, _ = _merge(snapshots)
+    return {
+        "pid": None,
+        "requests": [[*key, count] for key, count in requests.items()],
+        "durations": [[*key, counts, total] for key, (counts, total) in durations.items()],
+        "sizes": [[*key, counts, total] for key, (counts, total) in sizes.items()],
+        "in_progress": {},
+    }
+
+
+def render(snapshots: list) -> str:
+    """Prometheus text exposition of the sum of several worker snapshots"""
+    requests, durations, sizes, in_progress = _merge(snapshots)
+
+    lines = ["# TYPE http_requests_total counter"]
+    for (method, route, status), count in sorted(requests.items()):
+        lines.append(f'http_requests_total{{method="{method}",route="{_escape(route)}",status="{status}"}} {count}')
+    _histogram_lines("http_request_duration_seconds", ("method", "route"), durations, DURATION_BUCKETS, lines)
+    _histogram_lines("http_response_size_bytes", ("method", "route"), sizes, SIZE_BUCKETS, lines)
+    lines.append("# TYPE http_requests_in_progress gauge")
+    for method, count in sorted(in_progress.items()):
+        lines.append(f'http_requests_in_progress{{method="{method}"}} {count}')
+    return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def _directory_lock(path: str):
+    """Inter-process lock: mkdir is atomic on every platform"""
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while True:
+        try:
+            os.mkdir(path)
+            break
+        except FileExistsError:
+            try:
+                # Left behind by a process killed while holding it
+                if time.time() - os.stat(path).st_mtime > STALE_LOCK_SECONDS:
+                    os.rmdir(path)
+                    continue
+            except OSError:
+                pass
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"{path} is held by another process")
+            time.sleep(0.01)
+    try:
+        yield
+    finally:
+        os.rmdir(path)
+
+
+def _read_snapshot(path: str) -> Optional[dict]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_snapshot(path: str, snapshot: dict):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(snapshot, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+class MetricsExporter:
+    """Writes this worker's snapshot to the shared directory and merges everyone's"""
+
+    def __init__(self, registry: MetricsRegistry, directory: str, flush_interval: float):
+        self.registry = registry
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Tells this process's file from one left by an exited process that had the same pid
+        self._instance = uuid.uuid4().hex[:12]
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.directory, f"{os.getpid()}-{self._instance}.json")
+
+    @property
+    def retired_path(self) -> str:
+        return os.path.join(self.directory, RETIRED_FILE)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self.retire_dead()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="metrics-exporter", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            _write_snapshot(self.path, self.registry.snapshot())
+        except OSError as e:
+            print(f"[METRICS] Could not write {self.path}: {e}")
+
+    def _worker_files(self) -> list:
+        skip = {os.path.basename(self.path), RETIRED_FILE}
+        return [
+            path for path in glob.glob(os.path.join(self.directory, "*.json"))
+            if os.path.basename(path) not in skip
+        ]
+
+    def _is_dead(self, path: str) -> bool:
+        try:
+            pid = int(os.path.basename(path)[:-len(".json")].split("-", 1)[0])
+        except ValueError:
+            return False
+        # Our own pid on another file: that process has exited and the pid was reused
+        return pid == os.getpid() or not _pid_alive(pid)
+
+    def retire_dead(self) -> int:
+        """Fold the snapshots of exited workers into retired.json and delete them"""
+        dead = [path for path in self._worker_files() if self._is_dead(path)]
+        if not dead:
+            return 0
+        try:
+            with _directory_lock(os.path.join(self.directory, RETIRED_FILE + ".lock")):
+                retired = _read_snapshot(self.retired_path)
+                snapshots = [retired] if retired is not None else []
+                # Another worker may have retired some of them in the meantime
+                dead = [path for path in dead if os.path.exists(path)]
+                snapshots += [snapshot for snapshot in map(_read_snapshot, dead) if snapshot is not None]
+                if not dead:
+                    return 0
+                _write_snapshot(self.retired_path, retired_snapshot(snapshots))
+                for path in dead:
+                    os.remove(path)
+        except (OSError, TimeoutError) as e:
+            print(f"[METRICS] Could not retire the snapshots of exited workers: {e}")
+            return 0
+        return len(dead)
+
+    def collect(self) -> str:
+        """The merged exposition: live figures of this worker, last snapshot of the others"""
+        self.retire_dead()
+        snapshots = [self.registry.snapshot()]
+        retired = _read_snapshot(self.retired_path)
+        if retired is not None:
+            snapshots.append(retired)
+        for path in self._worker_files():
+            snapshot = _read_snapshot(path)
+            if snapshot is not None:
+                # Not retired yet if the lock timed out: keep its counters, not its gauges
+                snapshot["alive"] = not self._is_dead(path)
+                snapshots.append(snapshot)
+        return render(snapshots)
+
+
+registry = MetricsRegistry()
+exporter = MetricsExporter(registry, os.path.join(settings.SHARED_STATE_DIR, "metrics"), settings.METRICS_FLUSH_INTERVAL)
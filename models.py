@@ -1,10 +1,16 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Date, Time, Enum, DECIMAL, ForeignKey, Text, JSON, text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Date, Time, Enum, DECIMAL, ForeignKey, Text, JSON, Index, text
 from sqlalchemy.orm import relationship
+from sqlalchemy.dialects import mysql
 from datetime import datetime
 from database import Base
 import enum
 
 
+# Modification stamps need sub-second precision: MySQL DATETIME truncates
+# to the second, which would let two edits in the same second share a stamp.
+PreciseDateTime = DateTime().with_variant(mysql.DATETIME(fsp=6), "mysql")
+
+
 class UserRole(str, enum.Enum):
     admin = "admin"
     staff = "staff"
@@ -48,9 +54,17 @@ class Patient(Base):
     notes = Column(Text, nullable=True)
     requires_validation = Column(Boolean, default=False, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(PreciseDateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
     appointments = relationship("Appointment", back_populates="patient")
 
+    __table_args__ = (
+        # Keyset pagination of /api/patients
+        Index("ix_patients_created_at_id", "created_at", "id"),
+        # Patients changed since a point in time (catch-up of patient_index.py)
+        Index("ix_patients_updated_at", "updated_at"),
+    )
+
 
 class Service(Base):
     __tablename__ = "services"
@@ -60,6 +74,7 @@ class Service(Base):
     description = Column(Text, nullable=True)
     prix_base = Column(DECIMAL(12, 2), nullable=False)
     actif = Column(Boolean, default=True, nullable=False)
+    updated_at = Column(PreciseDateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
     appointments = relationship("Appointment", back_populates="service")
 
@@ -78,11 +93,17 @@ class Appointment(Base):
     etat = Column(Enum(AppointmentState), default=AppointmentState.en_attente, nullable=False, index=True)
     notes = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(PreciseDateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
     patient = relationship("Patient", back_populates="appointments")
     service = relationship("Service", back_populates="appointments")
     payments = relationship("Payment", back_populates="appointment")
 
+    __table_args__ = (
+        # Keyset pagination of /api/rdv
+        Index("ix_appointments_date_heure_id", "date", "heure", "id"),
+    )
+
 
 class Payment(Base):
     __tablename__ = "payments"
@@ -108,3 +129,57 @@ class AuditLog(Base):
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
 
     user = relationship("User", back_populates="audit_logs")
+
+
+class DailyAppointmentStats(Base):
+    """Appointment counts per day and service, maintained by crud (see rollups.py)"""
+    __tablename__ = "daily_appointment_stats"
+
+    date = Column(Date, primary_key=True)
+    service_id = Column(Integer, primary_key=True)
+    total = Column(Integer, default=0, nullable=False)
+    en_attente = Column(Integer, default=0, nullable=False)
+    valide = Column(Integer, default=0, nullable=False)
+    annule = Column(Integer, default=0, nullable=False)
+
+
+class DailyRevenueStats(Base):
+    """Payment totals per appointment day and payment mode, maintained by crud (see rollups.py)"""
+    __tablename__ = "daily_revenue_stats"
+
+    date = Column(Date, primary_key=True)
+    total = Column(DECIMAL(12, 2), default=0, nullable=False)
+    espece = Column(DECIMAL(12, 2), default=0, nullable=False)
+    carte = Column(DECIMAL(12, 2), default=0, nullable=False)
+    virement = Column(DECIMAL(12, 2), default=0, nullable=False)
+    cheque = Column(DECIMAL(12, 2), default=0, nullable=False)
+
+
+class CashRegisterDay(Base):
+    """Cash received per calendar day and payment mode, maintained by crud (see rollups.py)"""
+    __tablename__ = "cash_register_days"
+
+    date = Column(Date, primary_key=True)
+    total = Column(DECIMAL(12, 2), default=0, nullable=False)
+    espece = Column(DECIMAL(12, 2), default=0, nullable=False)
+    carte = Column(DECIMAL(12, 2), default=0, nullable=False)
+    virement = Column(DECIMAL(12, 2), default=0, nullable=False)
+    cheque = Column(DECIMAL(12, 2), default=0, nullable=False)
+    nb_paiements = Column(Integer, default=0, nullable=False)
+    # End-of-day close: who closed the register, when, and the total at that time
+    closed_at = Column(DateTime, nullable=True)
+    closed_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+    closed_total = Column(DECIMAL(12, 2), nullable=True)
+
+
+class PatientSearchToken(Base):
+    """Normalized name/email/phone tokens of each patient, maintained by crud (see search_index.py)"""
+    __tablename__ = "patient_search_tokens"
+
+    token = Column(String(64), primary_key=True)
+    patient_id = Column(Integer, primary_key=True)
+
+    __table_args__ = (
+        # Per-patient lookups: reindexing and the EXISTS probes of search
+        Index("ix_patient_search_tokens_patient_id_token", "patient_id", "token"),
+    )
@@ -0,0 +1,49 @@
+"""
+Opaque cursors for keyset pagination.
+
+A cursor encodes the sort key of the last row of a page; the next page
+starts strictly after it, so deep pages cost the same as the first one and
+rows inserted meanwhile do not shift the pages.
+"""
+import base64
+import json
+from datetime import date, datetime, time
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(values: list) -> str:
+    payload = [v.isoformat() if isinstance(v, (date, datetime, time)) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, types: list) -> list:
+    """Decode a cursor into values of the given types (date, time, datetime or int)"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, list) or len(payload) != len(types):
+            raise ValueError
+        return [_parse(value, kind) for value, kind in zip(payload, types)]
+    except (ValueError, TypeError):
+        raise ValueError("Curseur de pagination invalide")
+
+
+def _parse(value, kind):
+    if kind is int:
+        if not isinstance(value, int):
+            raise ValueError
+        return value
+    return kind.fromisoformat(value)
+
+
+def after_desc(columns: list, values: list):
+    """
+    Rows strictly after `values` in (col1 DESC, col2 DESC, ...) order, written
+    as an OR of prefixes so MySQL can range-scan the composite index.
+    """
+    clauses = []
+    for i, column in enumerate(columns):
+        equal_prefix = [columns[j] == values[j] for j in range(i)]
+        clauses.append(and_(*equal_prefix, column < values[i]))
+    return or_(*clauses)
@@ -0,0 +1,281 @@
+"""
+Streaming bulk import of patients from CSV or JSONL.
+
+The file is read row by row and validated with schemas.PatientCreate; valid
+rows are inserted IMPORT_BATCH_SIZE at a time, one transaction per batch
+(patients + search tokens + one audit record), so memory use does not
+depend on the file size. Rows that look wrong but are not invalid (unusual
+phone number, implausible birth date, phone already known...) are imported
+with requires_validation=True and show up on the validation page. Rejected
+rows are written to an error CSV with their line number and the reason.
+
+CSV files need a header line; recognized columns are nom, prenom, phone
+(or telephone), email, date_naissance (YYYY-MM-DD) and notes.
+
+    python patient_import.py patients.csv
+    python patient_import.py patients.jsonl --errors rejets.csv
+"""
+import csv
+import io
+import json
+import os
+import re
+import uuid
+from datetime import date, datetime
+from typing import Iterator, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+import audit
+import schemas
+import search_index
+from patient_index import patient_index
+from models import Patient, PatientSearchToken
+from stats import invalidate_dashboard_stats
+from config import get_settings
+
+settings = get_settings()
+
+# Header aliases found in exports from other practice software
+COLUMN_ALIASES = {
+    "telephone": "phone",
+    "téléphone": "phone",
+    "tel": "phone",
+    "mail": "email",
+    "date de naissance": "date_naissance",
+    "naissance": "date_naissance",
+}
+IMPORTED_FIELDS = ("nom", "prenom", "phone", "email", "date_naissance", "notes")
+_NAME_PATTERN = re.compile(r"^[^\W\d_]+(?:[ '\-.][^\W\d_]+)*$")
+# Tunisian national numbers have 8 digits
+NATIONAL_PHONE_DIGITS = 8
+
+
+def detect_format(filename: str) -> str:
+    return "jsonl" if filename.lower().endswith((".jsonl", ".ndjson")) else "csv"
+
+
+def _clean(record: dict) -> dict:
+    cleaned = {}
+    for key, value in record.items():
+        if key is None:
+            continue
+        key = COLUMN_ALIASES.get(key.strip().lower(), key.strip().lower())
+        if key not in IMPORTED_FIELDS:
+            continue
+        if isinstance(value, str):
+            value = value.strip() or None
+        cleaned[key] = value
+    return cleaned
+
+
+def iter_records(stream, fmt: str) -> Iterator[Tuple[int, object]]:
+    """Yield (line number, raw record) from a binary stream without loading it"""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "jsonl":
+        for line_no, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield line_no, json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_no, ValueError(f"JSON invalide: {e.msg}")
+    else:
+        # Spreadsheets export with ',' or ';' depending on the locale
+        sample = text.read(4096)
+        text.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        reader = csv.DictReader(text, dialect=dialect)
+        for record in reader:
+            yield reader.line_num, record
+
+
+def suspicion_reasons(patient: schemas.PatientCreate) -> list:
+    """Why a valid row should still be checked by a human (empty if it looks fine)"""
+    reasons = []
+    for label, value in (("nom", patient.nom), ("prénom", patient.prenom)):
+        if len(value) < 2 or not _NAME_PATTERN.match(value):
+            reasons.append(f"{label} inhabituel")
+    if patient.phone:
+        tokens = search_index.phone_tokens(patient.phone)
+        if not tokens or len(tokens[-1]) != NATIONAL_PHONE_DIGITS:
+            reasons.append("numéro de téléphone inhabituel")
+    if patient.date_naissance and not date(1900, 1, 1) <= patient.date_naissance <= date.today():
+        reasons.append("date de naissance improbable")
+    return reasons
+
+
+class ImportErrors:
+    """Row-level error file, created on the first rejected row"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+        self._writer = None
+
+    def add(self, line_no: int, error: str, record):
+        if self._writer is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._file = open(self.path, "w", newline="", encoding="utf-8")
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(["ligne", "erreur", "donnees"])
+        data = record if isinstance(record, str) else json.dumps(record, ensure_ascii=False, default=str)
+        self._writer.writerow([line_no, error, data])
+
+    def close(self) -> Optional[str]:
+        if self._file is None:
+            return None
+        self._file.close()
+        return self.path
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in e['loc']) or 'ligne'}: {e['msg']}" for e in error.errors()
+    )
+
+
+def _known_phones(db: Session, phones: set) -> set:
+    """National numbers already used by a patient (looked up in the search token index)"""
+    if not phones:
+        return set()
+    return set(db.scalars(select(PatientSearchToken.token).where(PatientSearchToken.token.in_(phones)).distinct()))
+
+
+def _flush_batch(db: Session, batch: list, user_id: Optional[int]) -> int:
+    """Insert one batch with its search tokens and audit record; returns how many were flagged"""
+    phones = {}
+    for values in batch:
+        tokens = search_index.phone_tokens(values["phone"])
+        if tokens:
+            phones.setdefault(tokens[-1], []).append(values)
+    known = _known_phones(db, set(phones))
+    for phone, rows in phones.items():
+        if phone in known or len(rows) > 1:
+            for values in rows:
+                values["requires_validation"] = True
+
+    stamp = datetime.utcnow()
+    patients = [Patient(**values, created_at=stamp, updated_at=stamp) for values in batch]
+    # The flush batches the INSERTs (with RETURNING where the dialect has it,
+    # lastrowid on MySQL) and gives every row its primary key
+    db.add_all(patients)
+    db.flush()
+    search_index.index_rows(db, patients)
+    ids = [patient.id for patient in patients]
+    db.commit()
+
+    audit.record(user_id, "IMPORT", "patients", None, {
+        "rows": len(ids), "first_id": min(ids, default=None), "last_id": max(ids, default=None)
+    })
+    return sum(1 for values in batch if values["requires_validation"])
+
+
+def iter_import(
+    db: Session,
+    stream,
+    fmt: str = "csv",
+    errors_path: Optional[str] = None,
+    batch_size: Optional[int] = None,
+    user_id: Optional[int] = None,
+) -> Iterator[dict]:
+    """
+    Import patients from a binary stream, yielding the running counters
+    after every committed batch. The last report has "done": True and the
+    path of the error file in "errors_file" (None when no row was rejected).
+    """
+    batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+    errors = ImportErrors(errors_path or os.path.join(settings.IMPORT_ERRORS_DIR, f"import-{uuid.uuid4().hex}.csv"))
+    report = {"rows": 0, "imported": 0, "flagged": 0, "rejected": 0, "done": False, "errors_file": None}
+    batch = []
+
+    def flush():
+        report["flagged"] += _flush_batch(db, batch, user_id)
+        report["imported"] += len(batch)
+        batch.clear()
+        invalidate_dashboard_stats()
+
+    try:
+        for line_no, record in iter_records(stream, fmt):
+            report["rows"] += 1
+            if isinstance(record, Exception):
+                report["rejected"] += 1
+                errors.add(line_no, str(record), "")
+                continue
+            if not isinstance(record, dict):
+                report["rejected"] += 1
+                errors.add(line_no, "Objet JSON attendu", record)
+                continue
+            try:
+                patient = schemas.PatientCreate.model_validate(_clean(record))
+            except ValidationError as e:
+                report["rejected"] += 1
+                errors.add(line_no, _validation_message(e), record)
+                continue
+
+            values = patient.model_dump()
+            values["requires_validation"] = values["requires_validation"] or bool(suspicion_reasons(patient))
+            batch.append(values)
+            if len(batch) >= batch_size:
+                flush()
+                yield dict(report)
+        if batch:
+            flush()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        report["errors_file"] = errors.close()
+        if report["imported"]:
+            # Cheaper than patching the typeahead index row by row
+            patient_index.invalidate()
+
+    report["done"] = True
+    yield dict(report)
+
+
+def import_patients(db: Session, stream, **options) -> dict:
+    """iter_import run to completion; returns the final report"""
+    report = None
+    for report in iter_import(db, stream, **options):
+        pass
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("file", help="CSV or JSONL file")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="Default: from the file extension")
+    parser.add_argument("--errors", help="Error file (default: next to the input, <file>.errors.csv)")
+    parser.add_argument("--batch-size", type=int, default=settings.IMPORT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    print(f"📥 Importing patients from {args.file}...")
+    db = SessionLocal()
+    try:
+        with open(args.file, "rb") as f:
+            for result in iter_import(
+                db, f,
+                fmt=args.format or detect_format(args.file),
+                errors_path=args.errors or f"{args.file}.errors.csv",
+                batch_size=args.batch_size,
+            ):
+                print(f"  … {result['rows']} lignes lues, {result['imported']} importées", flush=True)
+        print(f"✓ {result['imported']} patients importés ({result['flagged']} à valider)")
+        if result["rejected"]:
+            print(f"⚠ {result['rejected']} lignes rejetées, voir {result['errors_file']}")
+        print("\n✅ Import terminé!")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+    finally:
+        db.close()
@@ -0,0 +1,452 @@
+"""
+In-memory prefix index of patient names and phone numbers, behind the
+typeahead of the appointment forms (GET /api/patients/suggest).
+
+Each worker process keeps a sorted array of (token, slot) pairs over the
+tokens of search_index.py for nom, prenom and phone (no email), searched
+with bisect, plus one compact "prenom\\x1fnom\\x1fphone" label per patient.
+The index is built by a background thread at startup and kept up to date
+by crud after every patient write. Writes made by another worker are
+noticed through a shared generation file: the index then reads the
+patients whose updated_at passed its watermark, and the ids of the
+deleted ones from a shared log. Until a build is complete, crud answers
+suggestions from the database.
+
+Memory footprint and lookup latency at a given size:
+
+    python benchmarks/bench_patient_index.py --patients 1000000
+"""
+import os
+import sys
+import threading
+from array import array
+from datetime import datetime, timedelta
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from typing import Iterable, List, Optional
+
+from sqlalchemy import and_, or_, select
+
+import search_index
+from cache import SharedGeneration
+from models import Patient
+from config import get_settings
+
+settings = get_settings()
+
+_SEPARATOR = "\x1f"
+# Candidates of the most selective term checked against the other terms
+MAX_CANDIDATES = 5000
+# Beyond this many changed patients (a bulk import), rebuilding is faster
+# than patching them in one by one; changed rows are read by batches
+CATCH_UP_LIMIT = 500
+CATCH_UP_BATCH = 1000
+# Re-read window before the watermark: a row is stamped at flush and
+# visible only once committed. Patching a row in twice is harmless.
+CATCH_UP_OVERLAP = timedelta(seconds=5)
+
+
+def _tokens(nom: Optional[str], prenom: Optional[str], phone: Optional[str]) -> List[str]:
+    tokens = set(search_index.tokenize(nom)) | set(search_index.tokenize(prenom))
+    tokens.update(search_index.phone_tokens(phone))
+    # Names repeat a lot: share one string object per distinct token
+    return [sys.intern(token[:search_index.TOKEN_MAX_LENGTH]) for token in tokens]
+
+
+@lru_cache(maxsize=65536)
+def _name_matches(full_name: str, terms: tuple) -> bool:
+    """Whether every term prefixes a word of the name (names repeat a lot, hence the cache)"""
+    words = search_index.tokenize(full_name)
+    return all(any(word.startswith(term) for word in words) for term in terms)
+
+
+def _phone_matches(full_name: str, phone: str, terms: tuple) -> bool:
+    tokens = search_index.phone_tokens(phone) + search_index.tokenize(full_name)
+    return all(any(token.startswith(term) for token in tokens) for term in terms)
+
+
+def _upper_bound(prefix: str) -> str:
+    """Smallest string above every string starting with `prefix` (tokens are [0-9a-z])"""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class PrefixIndex:
+    """
+    Patients indexed by token prefix. Slots are positions in the label array,
+    in increasing patient id order; entries of the same token are kept in
+    slot order, so the newest patients of a token come last.
+    """
+
+    def __init__(self):
+        self._keys: List[str] = []
+        self._key_slots = array("i")
+        self._ids = array("q")
+        self._labels: List[Optional[str]] = []
+        self.size = 0
+
+    @classmethod
+    def from_rows(cls, rows: Iterable) -> "PrefixIndex":
+        """Bulk build from (id, nom, prenom, phone) rows sorted by id"""
+        index = cls()
+        keys, slots = [], array("i")
+        for patient_id, nom, prenom, phone in rows:
+            slot = len(index._ids)
+            index._ids.append(patient_id)
+            index._labels.append(_SEPARATOR.join((prenom or "", nom or "", phone or "")))
+            for token in _tokens(nom, prenom, phone):
+                keys.append(token)
+                slots.append(slot)
+        # Stable sort by token keeps the slots of a token in increasing order
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        index._keys = [keys[i] for i in order]
+        index._key_slots = array("i", (slots[i] for i in order))
+        index.size = len(index._ids)
+        return index
+
+    def _slot(self, patient_id: int) -> Optional[int]:
+        slot = bisect_left(self._ids, patient_id)
+        if slot < len(self._ids) and self._ids[slot] == patient_id:
+            return slot
+        return None
+
+    def _unlink(self, slot: int):
+        prenom, nom, phone = self._labels[slot].split(_SEPARATOR)
+        for token in _tokens(nom, prenom, phone):
+            lo, hi = bisect_left(self._keys, token), bisect_right(self._keys, token)
+            position = bisect_left(self._key_slots, slot, lo, hi)
+            del self._keys[position]
+            del self._key_slots[position]
+
+    def _link(self, slot: int, nom: Optional[str], prenom: Optional[str], phone: Optional[str]):
+        for token in _tokens(nom, prenom, phone):
+            lo, hi = bisect_left(self._keys, token), bisect_right(self._keys, token)
+            position = bisect_left(self._key_slots, slot, lo, hi)
+            self._keys.insert(position, token)
+            self._key_slots.insert(position, slot)
+
+    def holds(self, patient_id: int, nom: Optional[str], prenom: Optional[str], phone: Optional[str]) -> bool:
+        """Whether the patient is indexed with these values"""
+        slot = self._slot(patient_id)
+        return slot is not None and self._labels[slot] == _SEPARATOR.join((prenom or "", nom or "", phone or ""))
+
+    def put(self, patient_id: int, nom: Optional[str], prenom: Optional[str], phone: Optional[str]) -> bool:
+        """
+        Add or re-index one patient. Returns False when the id is older than
+        the newest indexed one without being indexed itself (the index must
+        then be rebuilt, slots only grow with the ids).
+        """
+        slot = self._slot(patient_id)
+        if slot is None:
+            if self._ids and patient_id < self._ids[-1]:
+                return False
+            slot = len(self._ids)
+            self._ids.append(patient_id)
+            self._labels.append(None)
+        if self._labels[slot] is not None:
+            self._unlink(slot)
+        else:
+            self.size += 1
+        self._labels[slot] = _SEPARATOR.join((prenom or "", nom or "", phone or ""))
+        self._link(slot, nom, prenom, phone)
+        return True
+
+    def remove(self, patient_id: int):
+        slot = self._slot(patient_id)
+        if slot is None or self._labels[slot] is None:
+            return
+        self._unlink(slot)
+        self._labels[slot] = None
+        self.size -= 1
+
+    def _range(self, term: str):
+        return bisect_left(self._keys, term), bisect_left(self._keys, _upper_bound(term))
+
+    def _candidates(self, lo: int, hi: int):
+        """Slots in [lo, hi), token by token, newest patient first within a token"""
+        keys, key_slots = self._keys, self._key_slots
+        seen = set()
+        while lo < hi:
+            group_end = bisect_right(keys, keys[lo], lo, hi)
+            for position in range(group_end - 1, lo - 1, -1):
+                slot = key_slots[position]
+                if slot not in seen:
+                    seen.add(slot)
+                    yield slot
+            lo = group_end
+
+    def search(self, terms: List[str], limit: int) -> List[dict]:
+        """Patients whose tokens are prefixed by every term, as suggestion dicts"""
+        if not terms:
+            return []
+        ranges = sorted((self._range(term) + (term,) for term in terms), key=lambda r: r[1] - r[0])
+        lo, hi, _ = ranges[0]
+        # The other terms are checked on each candidate of the narrowest one
+        name_terms = tuple(term for _, _, term in ranges[1:] if not term[0].isdigit())
+        digit_terms = tuple(term for _, _, term in ranges[1:] if term[0].isdigit())
+
+        results = []
+        for checked, slot in enumerate(self._candidates(lo, hi)):
+            if checked == MAX_CANDIDATES or len(results) == limit:
+                break
+            prenom, nom, phone = self._labels[slot].split(_SEPARATOR)
+            if name_terms and not _name_matches(f"{prenom} {nom}", name_terms):
+                continue
+            if digit_terms and not _phone_matches(f"{prenom} {nom}", phone, digit_terms):
+                continue
+            results.append({"id": self._ids[slot], "nom": nom, "prenom": prenom, "phone": phone or None})
+        return results
+
+
+class DeletionLog:
+    """
+    Ids of deleted patients, appended to a file shared by the workers. The
+    table keeps no trace of a deleted row, so the catch-up reads them here.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def append(self, patient_id: int):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        # One short write in append mode: lines of concurrent writers do not mix
+        with open(self.path, "a") as f:
+            f.write(f"{patient_id}\n")
+
+    def end(self) -> int:
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def read(self, offset: int):
+        """Ids appended since `offset`, and the offset to read from next time"""
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                data = f.read()
+        except OSError:
+            return [], offset
+        # A line still being written is read next time
+        complete = data[:data.rfind(b"\n") + 1]
+        return [int(line) for line in complete.split()], offset + len(complete)
+
+
+class LivePatientIndex:
+    """
+    The process-wide index: built in the background, patched by crud after
+    each write. When another worker changed the patients, it catches up on
+    the rows whose updated_at passed its watermark and on the deletion log;
+    it is rebuilt from the table only after invalidate() (bulk imports) or
+    when the backlog is too large to patch in.
+    """
+
+    def __init__(self, generation_path: str, enabled: bool = True):
+        self.enabled = enabled
+        # Only the application builds an index; scripts just notify it
+        self._active = False
+        self._lock = threading.Lock()
+        self._catch_up_lock = threading.Lock()
+        self._catch_up_requested = False
+        self._index: Optional[PrefixIndex] = None
+        self._building = False
+        # Writes seen while a build reads the table, replayed on the new index
+        self._pending: Optional[list] = None
+        # Rows updated at or after it (models stamp updated_at with utcnow),
+        # and deletions after this log offset, may be missing from the index
+        self._watermark: Optional[datetime] = None
+        self._deletions_offset = 0
+        self._generation = SharedGeneration(generation_path)
+        self._deletions = DeletionLog(os.path.splitext(generation_path)[0] + ".deleted")
+
+    def start(self):
+        """Serve suggestions from this process; the first build runs in the background"""
+        if self.enabled:
+            self._active = True
+            self._spawn_build()
+
+    def _spawn_build(self):
+        with self._lock:
+            if self._building:
+                return
+            self._building = True
+            self._pending = []
+        threading.Thread(target=self._build, name="patient-index", daemon=True).start()
+
+    def _build(self):
+        deletions_offset = self._deletions.end()
+        index, watermark = self._load()
+        with self._lock:
+            for operation in self._pending:
+                if index is not None and not self._apply(index, operation):
+                    index = None
+            self._index = index
+            self._watermark = watermark
+            self._deletions_offset = deletions_offset
+            self._pending = None
+            self._building = False
+        # Writes of the other workers made while the table was read
+        if index is not None:
+            self._catch_up()
+
+    @staticmethod
+    def _load():
+        """The index of the whole table, and the watermark it is complete up to"""
+        from database import SessionLocal
+
+        # Taken first: rows changed while the table is read are caught up on
+        watermark = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            rows = db.execute(
+                select(Patient.id, Patient.nom, Patient.prenom, Patient.phone)
+                .order_by(Patient.id)
+                .execution_options(yield_per=10000)
+            )
+            return PrefixIndex.from_rows(rows), watermark
+        except Exception as e:
+            print(f"⚠ Patient index build failed: {e}")
+            return None, None
+        finally:
+            db.close()
+
+    @staticmethod
+    def _changed_since(watermark: Optional[datetime], after: Optional[tuple]):
+        """Next CATCH_UP_BATCH patients changed since `watermark`, in (updated_at, id) order after `after`"""
+        from database import SessionLocal
+
+        stmt = select(Patient.id, Patient.nom, Patient.prenom, Patient.phone, Patient.updated_at)
+        if watermark is not None:
+            # The overlap covers rows stamped before, but committed after, the watermark
+            stmt = stmt.where(Patient.updated_at >= watermark - CATCH_UP_OVERLAP)
+        if after is not None:
+            updated_at, patient_id = after
+            stmt = stmt.where(or_(
+                Patient.updated_at > updated_at,
+                and_(Patient.updated_at == updated_at, Patient.id > patient_id),
+            ))
+        db = SessionLocal()
+        try:
+            return db.execute(stmt.order_by(Patient.updated_at, Patient.id).limit(CATCH_UP_BATCH)).all()
+        finally:
+            db.close()
+
+    def _catch_up(self):
+        """Patch in the patient writes made by the other workers"""
+        with self._lock:
+            self._catch_up_requested = True
+        # One thread at a time: the running one loops again for this request,
+        # and meanwhile the others answer from the current index
+        if not self._catch_up_lock.acquire(blocking=False):
+            return
+        rebuild = False
+        try:
+            while not rebuild:
+                with self._lock:
+                    if not self._catch_up_requested or self._index is None:
+                        # The build in progress catches up when it is done
+                        return
+                    self._catch_up_requested = False
+                    index, watermark, offset = self._index, self._watermark, self._deletions_offset
+                rebuild = not self._catch_up_pass(index, watermark, offset)
+        except Exception as e:
+            print(f"⚠ Patient index catch-up failed: {e}")
+            rebuild = True
+        finally:
+            self._catch_up_lock.release()
+        if rebuild:
+            self._drop()
+
+    def _catch_up_pass(self, index: PrefixIndex, watermark: Optional[datetime], offset: int) -> bool:
+        """Apply the changes since `watermark`; False if the index must be rebuilt instead"""
+        started = datetime.utcnow()
+        deleted, offset = self._deletions.read(offset)
+        changes, after = 0, None
+        while True:
+            rows = self._changed_since(watermark, after)
+            with self._lock:
+                if self._index is not index:
+                    return True
+                for patient_id, nom, prenom, phone, _ in rows:
+                    # The overlap and this worker's own writes are already in
+                    if index.holds(patient_id, nom, prenom, phone):
+                        continue
+                    changes += 1
+                    if changes > CATCH_UP_LIMIT or not index.put(patient_id, nom, prenom, phone):
+                        return False
+            if len(rows) < CATCH_UP_BATCH:
+                break
+            after = (rows[-1].updated_at, rows[-1].id)
+        with self._lock:
+            if self._index is index:
+                for patient_id in deleted:
+                    index.remove(patient_id)
+                self._watermark = started
+                self._deletions_offset = offset
+        return True
+
+    @staticmethod
+    def _apply(index: PrefixIndex, operation: tuple) -> bool:
+        if operation[0] == "put":
+            return index.put(*operation[1:])
+        index.remove(operation[1])
+        return True
+
+    def _notify(self):
+        """Tell the other workers; our own bump must not look like their write"""
+        self._generation.bump()
+        self._generation.changed()
+
+    def _drop(self):
+        with self._lock:
+            self._index = None
+        self._spawn_build()
+
+    def _record(self, operation: tuple):
+        if not self.enabled:
+            return
+        if operation[0] == "remove":
+            self._deletions.append(operation[1])
+        self._notify()
+        if not self._active:
+            return
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(operation)
+            if self._index is not None and not self._apply(self._index, operation):
+                self._index = None
+            rebuild = self._index is None and not self._building
+        if rebuild:
+            self._spawn_build()
+
+    def put(self, patient_id: int, nom: Optional[str], prenom: Optional[str], phone: Optional[str]):
+        self._record(("put", patient_id, nom, prenom, phone))
+
+    def remove(self, patient_id: int):
+        self._record(("remove", patient_id))
+
+    def invalidate(self):
+        """Rebuild from the table here (after bulk writes); the other workers catch up or rebuild"""
+        if not self.enabled:
+            return
+        self._notify()
+        if self._active:
+            self._drop()
+
+    def search(self, terms: List[str], limit: int) -> Optional[List[dict]]:
+        """Suggestions, or None while the index is not usable (the caller asks the database)"""
+        if not self._active:
+            return None
+        if self._generation.changed():
+            self._catch_up()
+        with self._lock:
+            if self._index is None:
+                return None
+            return self._index.search(terms, limit)
+
+    def info(self) -> dict:
+        with self._lock:
+            return {"ready": self._index is not None, "building": self._building,
+                    "patients": self._index.size if self._index is not None else None}
+
+
+patient_index = LivePatientIndex(os.path.join(settings.SHARED_STATE_DIR, "patients.gen"), settings.PATIENT_INDEX_ENABLED)
@@ -0,0 +1,132 @@
+"""
+Per-request SQL statistics (QUERY_STATS_ENABLED): number of queries, time
+spent in the database and statements repeated often enough to look like an
+N+1 pattern (a lazy load in a loop, one query per row...).
+
+Engine event hooks add every statement to the QueryStats of the current
+request, found through a context variable: it follows the request into the
+thread pool that runs the sync routes, and background threads (audit writer,
+patient index) have none, so their queries are not counted. QueryStatsMiddleware
+sends the figures in the response headers,
+
+    Server-Timing: db;dur=12.41;desc="9 queries"
+    X-DB-Queries: 9
+
+(queries made while a streamed body is produced come after the headers) and
+prints one JSON line per request once the response is complete:
+
+    [DB] {"method": "GET", "path": "/", "status": 200, "queries": 9, "db_ms": 12.41, "repeated": []}
+"""
+import json
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Optional
+
+from sqlalchemy import event
+
+from config import get_settings
+
+settings = get_settings()
+
+_current: ContextVar[Optional["QueryStats"]] = ContextVar("query_stats", default=None)
+
+_WHITESPACE = re.compile(r"\s+")
+_PLACEHOLDER = r"(?:\?|%s|%\(\w+\)s|:\w+)"
+# IN (?, ?, ?) and multi-row VALUES (?, ?), (?, ?) differ only by their length
+_PLACEHOLDER_LIST = re.compile(rf"\(\s*{_PLACEHOLDER}(?:\s*,\s*{_PLACEHOLDER})*\s*\)")
+_REPEATED_GROUPS = re.compile(r"\(\?\)(?:\s*,\s*\(\?\))+")
+_NUMBER = re.compile(r"(?<![\w.])\d+(?:\.\d+)?(?![\w.])")
+
+
+@lru_cache(maxsize=2048)
+def normalize_statement(statement: str) -> str:
+    """The shape of a statement: parameters, literal numbers and list lengths removed"""
+    shape = _WHITESPACE.sub(" ", statement).strip()
+    shape = _NUMBER.sub("?", shape)
+    shape = _PLACEHOLDER_LIST.sub("(?)", shape)
+    return _REPEATED_GROUPS.sub("(?)", shape)
+
+
+class QueryStats:
+    __slots__ = ("count", "duration", "shapes")
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def record(self, statement: str, duration: float):
+        self.count += 1
+        self.duration += duration
+        self.shapes[normalize_statement(statement)] += 1
+
+    def repeated(self, threshold: int) -> list:
+        """Statement shapes run at least `threshold` times, most frequent first"""
+        return [
+            {"count": count, "statement": shape}
+            for shape, count in self.shapes.most_common()
+            if count >= threshold
+        ]
+
+
+def current() -> Optional[QueryStats]:
+    return _current.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        context._query_stats_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    start = getattr(context, "_query_stats_start", None)
+    if stats is not None and start is not None:
+        stats.record(statement, time.perf_counter() - start)
+
+
+def install(engine):
+    """Count the statements of `engine` in the current request's QueryStats"""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class QueryStatsMiddleware:
+    def __init__(self, app, repeat_threshold: int):
+        self.app = app
+        self.repeat_threshold = repeat_threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _current.set(stats)
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", f'db;dur={stats.duration * 1000:.2f};desc="{stats.count} queries"'.encode()))
+                headers.append((b"x-db-queries", str(stats.count).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            print("[DB] " + json.dumps({
+                "method": scope["method"],
+                "path": scope["path"],
+                "status": status["code"],
+                "queries": stats.count,
+                "db_ms": round(stats.duration * 1000, 2),
+                "repeated": stats.repeated(self.repeat_threshold),
+            }, ensure_ascii=False))
@@ -1,8 +1,11 @@
+import os
 import sys
-sys.path.insert(0, r'C:\Users\KIRA\PycharmProjects\care')
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from database import SessionLocal
-from models import User, Patient, Service, Appointment, Payment, AppointmentState
+from models import User, AppointmentState, PaymentMode
+import crud
+import schemas
 from auth import get_password_hash
 from datetime import date, time
 from decimal import Decimal
@@ -20,55 +23,58 @@ try:
     db.commit()
     print(f"✓ Created 2 users")
     
-    # Create services
+    # Services, patients, appointments and payments go through crud, which
+    # keeps the rollups, the cash register, the search index and the caches
+    # in step with the rows
     print("Creating services...")
     services = [
-        Service(nom="Consultation", description="Consultation dentaire", prix_base=Decimal("50.00"), actif=True),
-        Service(nom="Détartrage", description="Nettoyage dentaire", prix_base=Decimal("80.00"), actif=True),
-        Service(nom="Plombage", description="Traitement carie", prix_base=Decimal("120.00"), actif=True),
-        Service(nom="Couronne", description="Couronne dentaire", prix_base=Decimal("400.00"), actif=True),
-        Service(nom="Implant", description="Implant dentaire", prix_base=Decimal("1500.00"), actif=True),
+        crud.create_service(db, schemas.ServiceCreate(nom=nom, description=description, prix_base=Decimal(prix)))
+        for nom, description, prix in [
+            ("Consultation", "Consultation dentaire", "50.00"),
+            ("Détartrage", "Nettoyage dentaire", "80.00"),
+            ("Plombage", "Traitement carie", "120.00"),
+            ("Couronne", "Couronne dentaire", "400.00"),
+            ("Implant", "Implant dentaire", "1500.00"),
+        ]
     ]
-    db.add_all(services)
-    db.commit()
-    db.refresh(services[0])
-    db.refresh(services[1])
-    db.refresh(services[2])
-    db.refresh(services[3])
-    db.refresh(services[4])
     print(f"✓ Created {len(services)} services")
     
     # Create patients
     print("Creating patients...")
     patients = [
-        Patient(nom="Ben Salah", prenom="Ahmed", phone="21612345678", email="ahmed.bensalah@email.tn", date_naissance=date(1980, 5, 15)),
-        Patient(nom="Trabelsi", prenom="Fatima", phone="21698765432", email="fatima.t@email.tn", date_naissance=date(1992, 8, 22)),
-        Patient(nom="Nasri", prenom="Mohamed", phone="21654321098", email="mohamed.n@email.tn", date_naissance=date(1975, 3, 10)),
-        Patient(nom="Karoui", prenom="Amina", phone="21687654321", email="amina.k@email.tn", date_naissance=date(1988, 11, 5)),
-        Patient(nom="Hamdi", prenom="Karim", phone="21623456789", email="karim.h@email.tn", date_naissance=date(1995, 7, 18)),
-        # Patients requiring validation
-        Patient(nom="Gharbi", prenom="Sami", phone="21655667788", email="sami.g@email.tn", date_naissance=date(1990, 4, 12), requires_validation=True),
-        Patient(nom="Mejri", prenom="Leila", phone="21644556677", email="leila.m@email.tn", date_naissance=date(1985, 9, 25), requires_validation=True),
-        Patient(nom="Bouazizi", prenom="Riadh", phone="21633445566", email="riadh.b@email.tn", date_naissance=date(1978, 6, 8), requires_validation=True),
+        crud.create_patient(db, schemas.PatientCreate(**fields))
+        for fields in [
+            dict(nom="Ben Salah", prenom="Ahmed", phone="21612345678", email="ahmed.bensalah@email.tn", date_naissance=date(1980, 5, 15)),
+            dict(nom="Trabelsi", prenom="Fatima", phone="21698765432", email="fatima.t@email.tn", date_naissance=date(1992, 8, 22)),
+            dict(nom="Nasri", prenom="Mohamed", phone="21654321098", email="mohamed.n@email.tn", date_naissance=date(1975, 3, 10)),
+            dict(nom="Karoui", prenom="Amina", phone="21687654321", email="amina.k@email.tn", date_naissance=date(1988, 11, 5)),
+            dict(nom="Hamdi", prenom="Karim", phone="21623456789", email="karim.h@email.tn", date_naissance=date(1995, 7, 18)),
+            # Patients requiring validation
+            dict(nom="Gharbi", prenom="Sami", phone="21655667788", email="sami.g@email.tn", date_naissance=date(1990, 4, 12), requires_validation=True),
+            dict(nom="Mejri", prenom="Leila", phone="21644556677", email="leila.m@email.tn", date_naissance=date(1985, 9, 25), requires_validation=True),
+            dict(nom="Bouazizi", prenom="Riadh", phone="21633445566", email="riadh.b@email.tn", date_naissance=date(1978, 6, 8), requires_validation=True),
+        ]
     ]
-    db.add_all(patients)
-    db.commit()
-    # Refresh to get IDs
-    for patient in patients:
-        db.refresh(patient)
     print(f"✓ Created {len(patients)} patients (including 3 requiring validation)")
 
-    # Create appointments with proper enum values
+    # Create appointments, then record what was paid as payments
     print("Creating appointments...")
     appointments = [
-        Appointment(patient_id=patients[0].id, service_id=services[0].id, date=date(2025, 10, 28), heure=time(9, 0), prix=Decimal("50"), verse=Decimal("50"), reste=Decimal("0"), etat=AppointmentState.valide),
-        Appointment(patient_id=patients[1].id, service_id=services[1].id, date=date(2025, 10, 28), heure=time(10, 30), prix=Decimal("80"), verse=Decimal("40"), reste=Decimal("40"), etat=AppointmentState.en_attente),
-        Appointment(patient_id=patients[2].id, service_id=services[2].id, date=date(2025, 10, 29), heure=time(14, 0), prix=Decimal("120"), verse=Decimal("0"), reste=Decimal("120"), etat=AppointmentState.en_attente),
-        Appointment(patient_id=patients[3].id, service_id=services[3].id, date=date(2025, 11, 5), heure=time(11, 0), prix=Decimal("400"), verse=Decimal("200"), reste=Decimal("200"), etat=AppointmentState.valide),
-        Appointment(patient_id=patients[4].id, service_id=services[0].id, date=date(2025, 11, 10), heure=time(15, 30), prix=Decimal("50"), verse=Decimal("0"), reste=Decimal("50"), etat=AppointmentState.en_attente),
+        # (patient, service, date, heure, prix, verse, etat)
+        (patients[0], services[0], date(2025, 10, 28), time(9, 0), "50", "50", AppointmentState.valide),
+        (patients[1], services[1], date(2025, 10, 28), time(10, 30), "80", "40", AppointmentState.en_attente),
+        (patients[2], services[2], date(2025, 10, 29), time(14, 0), "120", "0", AppointmentState.en_attente),
+        (patients[3], services[3], date(2025, 11, 5), time(11, 0), "400", "200", AppointmentState.valide),
+        (patients[4], services[0], date(2025, 11, 10), time(15, 30), "50", "0", AppointmentState.en_attente),
     ]
-    db.add_all(appointments)
-    db.commit()
+    for patient, service, day, heure, prix, verse, etat in appointments:
+        appointment = crud.create_appointment(db, schemas.AppointmentCreate(
+            patient_id=patient.id, service_id=service.id, date=day, heure=heure, prix=Decimal(prix), etat=etat
+        ))
+        if Decimal(verse):
+            crud.create_payment(db, schemas.PaymentCreate(
+                appointment_id=appointment.id, montant=Decimal(verse), mode=PaymentMode.espece
+            ))
     print(f"✓ Created {len(appointments)} appointments")
     
     print("\n" + "="*50)
@@ -0,0 +1,74 @@
+"""
+Expansion of appointment recurrence patterns, a subset of iCalendar RRULE:
+FREQ (daily/weekly/monthly), INTERVAL, COUNT, UNTIL and, for weekly series,
+BYDAY. Used by POST /api/rdv/series for treatment plans.
+"""
+import calendar
+import enum
+from datetime import date, timedelta
+from typing import List, Optional, Sequence
+
+# Longest series accepted in one request
+MAX_OCCURRENCES = 100
+
+
+class RecurrenceFrequency(str, enum.Enum):
+    daily = "daily"
+    weekly = "weekly"
+    monthly = "monthly"
+
+
+def _add_months(day: date, months: int) -> Optional[date]:
+    """Same day-of-month `months` later, or None if that month is too short (as RRULE does)"""
+    month_index = day.month - 1 + months
+    year, month = day.year + month_index // 12, month_index % 12 + 1
+    if day.day > calendar.monthrange(year, month)[1]:
+        return None
+    return day.replace(year=year, month=month)
+
+
+def _candidates(start: date, freq: RecurrenceFrequency, interval: int, byweekday: Sequence[int]):
+    step = 0
+    while True:
+        if freq == RecurrenceFrequency.daily:
+            yield start + timedelta(days=step * interval)
+        elif freq == RecurrenceFrequency.weekly:
+            week_start = start - timedelta(days=start.weekday()) + timedelta(weeks=step * interval)
+            for weekday in byweekday:
+                day = week_start + timedelta(days=weekday)
+                if day >= start:
+                    yield day
+        else:
+            day = _add_months(start, step * interval)
+            if day is not None:
+                yield day
+        step += 1
+
+
+def expand(
+    start: date,
+    freq: RecurrenceFrequency,
+    interval: int = 1,
+    count: Optional[int] = None,
+    until: Optional[date] = None,
+    byweekday: Optional[Sequence[int]] = None,
+) -> List[date]:
+    """
+    Dates of the series starting at `start` (weekdays: 0 = Monday). Stops
+    after `count` occurrences or past `until`; a series longer than
+    MAX_OCCURRENCES is refused rather than truncated.
+    """
+    if count is None and until is None:
+        raise ValueError("La récurrence doit préciser un nombre d'occurrences ou une date de fin")
+    byweekday = sorted(set(byweekday)) if byweekday else [start.weekday()]
+
+    dates = []
+    for day in _candidates(start, RecurrenceFrequency(freq), interval, byweekday):
+        if until is not None and day > until:
+            break
+        if len(dates) == MAX_OCCURRENCES:
+            raise ValueError(f"Une série ne peut pas dépasser {MAX_OCCURRENCES} rendez-vous")
+        dates.append(day)
+        if count is not None and len(dates) == count:
+            break
+    return dates
@@ -0,0 +1,238 @@
+"""
+Daily rollup tables behind the dashboard statistics.
+
+`daily_appointment_stats` holds appointment counts per (date, service) and per
+état; `daily_revenue_stats` holds payment totals per appointment date and
+payment mode; `cash_register_days` holds the cash received per calendar day
+(payment date) and mode. crud keeps them up to date inside the same
+transaction as the appointment/payment write, so stats and the cash box
+never have to scan the raw tables.
+
+Backfill (or repair) the tables from the raw data with:
+
+    python rollups.py
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import func, case, select, insert, update, delete, bindparam
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from datetime import date
+from decimal import Decimal
+from models import (
+    Appointment, Payment, AppointmentState, PaymentMode, DailyAppointmentStats, DailyRevenueStats, CashRegisterDay
+)
+
+
+def _upsert_add(db: Session, table, keys: dict, increments: dict):
+    """INSERT the row or add `increments` to the existing one, atomically"""
+    _upsert_add_many(db, table, list(keys), [{**keys, **increments}])
+
+
+def _upsert_add_many(db: Session, table, key_columns: list, rows: list):
+    """Multi-row _upsert_add: one statement for all `rows` (dicts of keys + increments, distinct keys)"""
+    increment_columns = [col for col in rows[0] if col not in key_columns]
+    dialect = db.get_bind().dialect.name
+
+    if dialect == "mysql":
+        stmt = mysql.insert(table).values(rows)
+        stmt = stmt.on_duplicate_key_update({col: table.c[col] + stmt.inserted[col] for col in increment_columns})
+    elif dialect in ("sqlite", "postgresql"):
+        insert_ = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        stmt = insert_(table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=key_columns,
+            set_={col: table.c[col] + stmt.excluded[col] for col in increment_columns}
+        )
+    else:
+        _update_then_insert(db, table, key_columns, increment_columns, rows)
+        return
+
+    db.execute(stmt)
+
+
+def _update_then_insert(db: Session, table, key_columns: list, increment_columns: list, rows: list):
+    """Portable upsert for the other dialects: one UPDATE, then an INSERT if no row matched"""
+    for row in rows:
+        where = [table.c[col] == row[col] for col in key_columns]
+        increments = {col: table.c[col] + row[col] for col in increment_columns}
+        if db.execute(update(table).where(*where).values(increments)).rowcount:
+            continue
+        try:
+            # A savepoint, so losing the race to a concurrent INSERT keeps the transaction
+            with db.begin_nested():
+                db.execute(insert(table).values(row))
+        except IntegrityError:
+            db.execute(update(table).where(*where).values(increments))
+
+
+def record_appointment(db: Session, appt_date: date, service_id: int, etat: AppointmentState, sign: int = 1):
+    """Count (sign=1) or uncount (sign=-1) one appointment in daily_appointment_stats"""
+    etat = AppointmentState(etat)
+    _upsert_add(
+        db, DailyAppointmentStats.__table__,
+        {"date": appt_date, "service_id": service_id},
+        {"total": sign, etat.value: sign}
+    )
+
+
+def record_appointments(db: Session, appointments):
+    """Count many new appointments, given as (date, service_id, etat), in one statement"""
+    counts = {}
+    for appt_date, service_id, etat in appointments:
+        row = counts.setdefault((appt_date, service_id), {
+            "date": appt_date, "service_id": service_id, "total": 0,
+            **{state.value: 0 for state in AppointmentState}
+        })
+        row["total"] += 1
+        row[AppointmentState(etat).value] += 1
+    if counts:
+        _upsert_add_many(db, DailyAppointmentStats.__table__, ["date", "service_id"], list(counts.values()))
+
+
+def record_payment(db: Session, appt_date: date, mode: PaymentMode, montant: Decimal, sign: int = 1):
+    """Add (sign=1) or remove (sign=-1) a payment amount in daily_revenue_stats"""
+    mode = PaymentMode(mode)
+    amount = Decimal(montant) * sign
+    _upsert_add(
+        db, DailyRevenueStats.__table__,
+        {"date": appt_date},
+        {"total": amount, mode.value: amount}
+    )
+
+
+def record_cash(db: Session, day: date, mode: PaymentMode, montant: Decimal, sign: int = 1):
+    """Add (sign=1) or remove (sign=-1) a payment received on `day` in cash_register_days"""
+    mode = PaymentMode(mode)
+    amount = Decimal(montant) * sign
+    _upsert_add(
+        db, CashRegisterDay.__table__,
+        {"date": day},
+        {"total": amount, mode.value: amount, "nb_paiements": sign}
+    )
+
+
+def open_cash_day(db: Session, day: date):
+    """Create the (empty) cash_register_days row of `day` if it does not exist yet"""
+    _upsert_add(db, CashRegisterDay.__table__, {"date": day}, {"total": 0})
+
+
+def move_appointment_payments(db: Session, appointment_id: int, old_date: date, new_date: date):
+    """Re-attribute an appointment's payments when its date changes"""
+    totals = db.query(Payment.mode, func.sum(Payment.montant)).filter(
+        Payment.appointment_id == appointment_id
+    ).group_by(Payment.mode).all()
+
+    for mode, montant in totals:
+        if not montant:
+            continue
+        record_payment(db, old_date, mode, montant, sign=-1)
+        record_payment(db, new_date, mode, montant, sign=1)
+
+
+def rebuild_cash_register(db: Session):
+    """Recompute cash_register_days from payments, keeping the end-of-day closes"""
+    closes = db.execute(
+        select(CashRegisterDay.date, CashRegisterDay.closed_at, CashRegisterDay.closed_by, CashRegisterDay.closed_total)
+        .where(CashRegisterDay.closed_at.is_not(None))
+    ).all()
+    db.execute(delete(CashRegisterDay))
+
+    day = func.date(Payment.created_at)
+    cash = select(
+        day,
+        func.sum(Payment.montant),
+        *[func.sum(case((Payment.mode == mode, Payment.montant), else_=0)) for mode in PaymentMode],
+        func.count(Payment.id)
+    ).group_by(day)
+
+    db.execute(insert(CashRegisterDay).from_select(
+        ["date", "total"] + [mode.value for mode in PaymentMode] + ["nb_paiements"],
+        cash
+    ))
+
+    if closes:
+        # Closed days without payments get their (empty) row back
+        for row in closes:
+            open_cash_day(db, row.date)
+        table = CashRegisterDay.__table__
+        db.execute(
+            update(table).where(table.c.date == bindparam("day")).values(
+                closed_at=bindparam("at"), closed_by=bindparam("by"), closed_total=bindparam("at_total")
+            ),
+            [{"day": row.date, "at": row.closed_at, "by": row.closed_by, "at_total": row.closed_total} for row in closes]
+        )
+
+
+def rebuild_rollups(db: Session):
+    """Recompute the rollup tables from appointments and payments"""
+    db.execute(delete(DailyAppointmentStats))
+    db.execute(delete(DailyRevenueStats))
+
+    appointment_counts = select(
+        Appointment.date,
+        Appointment.service_id,
+        func.count(Appointment.id),
+        *[func.sum(case((Appointment.etat == state, 1), else_=0)) for state in AppointmentState]
+    ).group_by(Appointment.date, Appointment.service_id)
+
+    db.execute(insert(DailyAppointmentStats).from_select(
+        ["date", "service_id", "total"] + [state.value for state in AppointmentState],
+        appointment_counts
+    ))
+
+    revenue = select(
+        Appointment.date,
+        func.sum(Payment.montant),
+        *[func.sum(case((Payment.mode == mode, Payment.montant), else_=0)) for mode in PaymentMode]
+    ).join(Appointment, Appointment.id == Payment.appointment_id).group_by(Appointment.date)
+
+    db.execute(insert(DailyRevenueStats).from_select(
+        ["date", "total"] + [mode.value for mode in PaymentMode],
+        revenue
+    ))
+
+    rebuild_cash_register(db)
+    db.commit()
+
+
+def ensure_rollups(db: Session) -> bool:
+    """Backfill the rollups if they are empty while appointments exist. Returns True if rebuilt."""
+    has_rollups = db.query(DailyAppointmentStats.date).first() is not None
+    if not has_rollups:
+        has_appointments = db.query(Appointment.id).first() is not None
+        if not has_appointments:
+            return False
+        rebuild_rollups(db)
+        return True
+
+    # Databases upgraded from before cash_register_days
+    if db.query(CashRegisterDay.date).first() is None and db.query(Payment.id).first() is not None:
+        rebuild_cash_register(db)
+        db.commit()
+        return True
+    return False
+
+
+if __name__ == "__main__":
+    from database import SessionLocal, engine, Base
+
+    print("🔄 Rebuilding daily rollup tables...")
+    Base.metadata.create_all(bind=engine, tables=[
+        DailyAppointmentStats.__table__, DailyRevenueStats.__table__, CashRegisterDay.__table__
+    ])
+
+    db = SessionLocal()
+    try:
+        rebuild_rollups(db)
+        days = db.query(func.count(func.distinct(DailyAppointmentStats.date))).scalar()
+        print(f"✓ daily_appointment_stats: {days} jours")
+        print(f"✓ daily_revenue_stats: {db.query(func.count(DailyRevenueStats.date)).scalar()} jours")
+        print(f"✓ cash_register_days: {db.query(func.count(CashRegisterDay.date)).scalar()} jours")
+        print("\n✅ Rollups rebuilt successfully!")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        db.rollback()
+        import traceback
+        traceback.print_exc()
+    finally:
+        db.close()
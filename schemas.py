@@ -1,8 +1,10 @@
-from pydantic import BaseModel, EmailStr, field_validator
-from typing import Optional
+from pydantic import BaseModel, EmailStr, Field, field_validator, model_validator
+from typing import Optional, List
+import datetime as dt
 from datetime import datetime, date, time
 from decimal import Decimal
 from models import UserRole, AppointmentState, PaymentMode
+from recurrence import RecurrenceFrequency, MAX_OCCURRENCES
 
 
 # User schemas
@@ -16,6 +18,12 @@ class UserCreate(UserBase):
     password: str
 
 
+class UserUpdate(BaseModel):
+    role: Optional[UserRole] = None
+    is_active: Optional[bool] = None
+    password: Optional[str] = None
+
+
 class UserResponse(UserBase):
     id: int
     created_at: datetime
@@ -40,6 +48,13 @@ class PatientCreate(PatientBase):
     pass
 
 
+class PatientSuggestion(BaseModel):
+    id: int
+    nom: str
+    prenom: str
+    phone: Optional[str] = None
+
+
 class PatientUpdate(BaseModel):
     nom: Optional[str] = None
     prenom: Optional[str] = None
@@ -104,7 +119,8 @@ class AppointmentCreate(AppointmentBase):
 class AppointmentUpdate(BaseModel):
     patient_id: Optional[int] = None
     service_id: Optional[int] = None
-    date: Optional[date] = None
+    # Qualified: the field name shadows the date type in the class body
+    date: Optional[dt.date] = None
     heure: Optional[time] = None
     prix: Optional[Decimal] = None
     verse: Optional[Decimal] = None
@@ -124,6 +140,64 @@ class AppointmentResponse(AppointmentBase):
         use_enum_values = True
 
 
+class AppointmentRecurrence(BaseModel):
+    """RRULE subset: FREQ, INTERVAL, COUNT, UNTIL, BYDAY (0 = lundi)"""
+    freq: RecurrenceFrequency = RecurrenceFrequency.weekly
+    interval: int = Field(1, ge=1, le=52)
+    count: Optional[int] = Field(None, ge=1, le=MAX_OCCURRENCES)
+    until: Optional[date] = None
+    byweekday: Optional[List[int]] = None
+
+    @field_validator("byweekday")
+    @classmethod
+    def validate_byweekday(cls, v):
+        if v is not None and any(day < 0 or day > 6 for day in v):
+            raise ValueError("Les jours de la semaine vont de 0 (lundi) à 6 (dimanche)")
+        return v
+
+    @model_validator(mode="after")
+    def validate_end(self):
+        if self.count is None and self.until is None:
+            raise ValueError("La récurrence doit préciser count ou until")
+        return self
+
+
+class AppointmentSeriesCreate(BaseModel):
+    """Several appointments of one patient at the same time: either a recurrence from start_date or explicit dates"""
+    patient_id: int
+    service_id: int
+    heure: time
+    prix: Decimal
+    verse: Decimal = Decimal("0")
+    etat: AppointmentState = AppointmentState.en_attente
+    notes: Optional[str] = None
+    start_date: Optional[date] = None
+    recurrence: Optional[AppointmentRecurrence] = None
+    dates: Optional[List[date]] = Field(None, max_length=MAX_OCCURRENCES)
+    # False: create nothing if any slot conflicts
+    skip_conflicts: bool = True
+
+    @model_validator(mode="after")
+    def validate_slots(self):
+        if (self.recurrence is None) == (self.dates is None):
+            raise ValueError("Préciser soit une récurrence, soit une liste de dates")
+        if self.recurrence is not None and self.start_date is None:
+            raise ValueError("start_date est requis avec une récurrence")
+        return self
+
+
+class AppointmentSlotConflict(BaseModel):
+    date: date
+    heure: time
+    existing_id: int
+    detail: str
+
+
+class AppointmentSeriesResult(BaseModel):
+    created: List[AppointmentResponse]
+    conflicts: List[AppointmentSlotConflict]
+
+
 # Payment schemas
 class PaymentBase(BaseModel):
     appointment_id: int
@@ -144,6 +218,23 @@ class PaymentResponse(PaymentBase):
         use_enum_values = True
 
 
+# Cash register schemas
+class CashRegisterDayResponse(BaseModel):
+    date: date
+    total: Decimal
+    espece: Decimal
+    carte: Decimal
+    virement: Decimal
+    cheque: Decimal
+    nb_paiements: int
+    closed_at: Optional[datetime] = None
+    closed_by: Optional[int] = None
+    closed_total: Optional[Decimal] = None
+
+    class Config:
+        from_attributes = True
+
+
 # Stats schemas
 class StatsOverview(BaseModel):
     total_patients: int
@@ -0,0 +1,205 @@
+"""
+Token index behind patient search.
+
+Each patient is split into normalized tokens (lowercase, accents removed)
+from nom, prenom and email, plus the digits of the phone number. A search
+term matches when it is a prefix of one of the patient's tokens, so lookups
+are prefix range scans on the token primary key instead of
+`LIKE '%term%'` scans of the patients table. Works the same on MySQL and
+SQLite.
+
+Backfill (or repair) the index from the patients table with:
+
+    python search_index.py
+"""
+import re
+import unicodedata
+from sqlalchemy.orm import Session
+from sqlalchemy import select, delete, and_, false
+from typing import List, Optional
+from models import Patient, PatientSearchToken
+
+TOKEN_MAX_LENGTH = 64
+# Terms matching at most this many patients are resolved to an id list
+# (kept under SQLite's historical 999 bound parameters limit)
+CANDIDATE_LIMIT = 500
+_SPLIT = re.compile(r"[^0-9a-z]+")
+_NON_DIGITS = re.compile(r"\D+")
+# Tunisian numbers are often typed with or without the country code
+_COUNTRY_PREFIXES = ("00216", "216")
+
+
+def normalize(text: str) -> str:
+    """Lowercase and strip accents: 'Hélène' -> 'helene'"""
+    if text.isascii():
+        return text.lower()
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    return [token[:TOKEN_MAX_LENGTH] for token in _SPLIT.split(normalize(text)) if token]
+
+
+def phone_tokens(phone: Optional[str]) -> List[str]:
+    digits = _NON_DIGITS.sub("", phone or "")
+    if not digits:
+        return []
+    tokens = [digits]
+    for prefix in _COUNTRY_PREFIXES:
+        if digits.startswith(prefix) and len(digits) > len(prefix):
+            tokens.append(digits[len(prefix):])
+            break
+    return tokens
+
+
+def patient_tokens(nom: Optional[str], prenom: Optional[str], phone: Optional[str], email: Optional[str]) -> set:
+    tokens = set(tokenize(nom)) | set(tokenize(prenom)) | set(tokenize(email))
+    tokens.update(token[:TOKEN_MAX_LENGTH] for token in phone_tokens(phone))
+    return tokens
+
+
+def search_terms(search: str) -> List[str]:
+    """
+    Terms a search string is split into. A search made only of digits and
+    separators ('22 123 456', '+216 22...') is one phone term.
+    """
+    if not re.search(r"[^\W\d_]", search):
+        tokens = phone_tokens(search)
+        return [tokens[-1][:TOKEN_MAX_LENGTH]] if tokens else []
+    return tokenize(search)
+
+
+def _prefix_range(column, prefix: str):
+    """
+    `column LIKE 'prefix%'` written as a range so both MySQL and SQLite use
+    the primary key (SQLite only optimizes LIKE on NOCASE columns). Tokens
+    only contain [0-9a-z], so bumping the last character gives the upper bound.
+    """
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return and_(column >= prefix, column < upper)
+
+
+def index_patient(db: Session, patient: Patient):
+    """(Re)index one patient inside the caller's transaction"""
+    db.execute(delete(PatientSearchToken).where(PatientSearchToken.patient_id == patient.id))
+    tokens = patient_tokens(patient.nom, patient.prenom, patient.phone, patient.email)
+    if tokens:
+        db.execute(PatientSearchToken.__table__.insert(), [
+            {"token": token, "patient_id": patient.id} for token in tokens
+        ])
+
+
+def index_rows(db: Session, rows):
+    """Index new patients in bulk; rows have id, nom, prenom, phone and email"""
+    values = [
+        {"token": token, "patient_id": row.id}
+        for row in rows
+        for token in patient_tokens(row.nom, row.prenom, row.phone, row.email)
+    ]
+    if values:
+        db.execute(PatientSearchToken.__table__.insert(), values)
+
+
+def unindex_patient(db: Session, patient_id: int):
+    db.execute(delete(PatientSearchToken).where(PatientSearchToken.patient_id == patient_id))
+
+
+def _matching_ids(db: Session, term: str, limit: int) -> set:
+    """Ids of up to `limit` + 1 patients having a token starting with `term`"""
+    return set(db.execute(
+        select(PatientSearchToken.patient_id).where(
+            _prefix_range(PatientSearchToken.token, term)
+        ).limit(limit + 1)
+    ).scalars().all())
+
+
+def search_filter(db: Session, column, search: str):
+    """
+    SQL filter restricting `column` (a patient id column) to the patients
+    matching `search`: every term must prefix-match one of their tokens.
+
+    Terms are first probed with bounded range scans of the token index. The
+    selective ones (at most CANDIDATE_LIMIT patients) are intersected into an
+    explicit id list. Broad terms ('moh') become correlated EXISTS checks, so
+    when nothing is selective the caller's ORDER BY ... LIMIT walks its own
+    index and stops at the first matches instead of collecting every match.
+    """
+    terms = list(dict.fromkeys(search_terms(search)))
+    if not terms:
+        return false()
+
+    resolved = {}
+    for term in terms:
+        ids = _matching_ids(db, term, CANDIDATE_LIMIT)
+        if not ids:
+            return false()
+        if len(ids) <= CANDIDATE_LIMIT:
+            resolved[term] = ids
+
+    conditions = []
+    if resolved:
+        candidates = set.intersection(*resolved.values())
+        if not candidates:
+            return false()
+        conditions.append(column.in_(sorted(candidates)))
+    for term in terms:
+        if term in resolved:
+            continue
+        conditions.append(
+            select(PatientSearchToken.patient_id).where(
+                PatientSearchToken.patient_id == column,
+                _prefix_range(PatientSearchToken.token, term)
+            ).exists()
+        )
+    return and_(*conditions)
+
+
+def rebuild_search_index(db: Session, batch_size: int = 5000):
+    """Recompute the whole token table from the patients table"""
+    db.execute(delete(PatientSearchToken))
+
+    last_id = 0
+    while True:
+        rows = db.query(Patient.id, Patient.nom, Patient.prenom, Patient.phone, Patient.email).filter(
+            Patient.id > last_id
+        ).order_by(Patient.id).limit(batch_size).all()
+        if not rows:
+            break
+        index_rows(db, rows)
+        last_id = rows[-1].id
+
+    db.commit()
+
+
+def ensure_search_index(db: Session) -> bool:
+    """Backfill the index if it is empty while patients exist. Returns True if rebuilt."""
+    if db.query(PatientSearchToken.patient_id).first() is not None:
+        return False
+    if db.query(Patient.id).first() is None:
+        return False
+    rebuild_search_index(db)
+    return True
+
+
+if __name__ == "__main__":
+    from sqlalchemy import func
+    from database import SessionLocal, engine, Base
+
+    print("🔄 Rebuilding patient search index...")
+    Base.metadata.create_all(bind=engine, tables=[PatientSearchToken.__table__])
+
+    db = SessionLocal()
+    try:
+        rebuild_search_index(db)
+        print(f"✓ {db.query(func.count(PatientSearchToken.token)).scalar()} tokens indexed")
+        print("\n✅ Search index rebuilt successfully!")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        db.rollback()
+        import traceback
+        traceback.print_exc()
+    finally:
+        db.close()
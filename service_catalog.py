@@ -0,0 +1,100 @@
+"""
+Read-through cache of the service catalog.
+
+Services are read on every page and form that offers them (/services, the
+appointment modals through /api/services) but change a few times a year.
+Each worker keeps the whole catalog as an immutable snapshot, loaded on the
+first read after a change. crud invalidates it after every service write;
+the other workers notice through a shared generation file.
+
+The snapshot carries a version derived from its content, identical in every
+worker holding the same catalog, which the routes use as their ETag.
+"""
+import hashlib
+import os
+import threading
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from cache import DataVersion, SharedGeneration
+from database import SessionLocal, is_replica
+from models import Service
+from config import get_settings
+
+settings = get_settings()
+
+
+class ServiceSnapshot(NamedTuple):
+    """One service as read by the pages and the API (detached from any session)"""
+    id: int
+    nom: str
+    description: Optional[str]
+    prix_base: Decimal
+    actif: bool
+    updated_at: datetime
+
+
+class Catalog(NamedTuple):
+    version: str
+    services: Tuple[ServiceSnapshot, ...]
+    active: Tuple[ServiceSnapshot, ...]
+    by_id: Dict[int, ServiceSnapshot]
+
+
+def load_catalog(db: Session) -> Catalog:
+    rows = db.execute(
+        select(Service.id, Service.nom, Service.description, Service.prix_base, Service.actif, Service.updated_at)
+        .order_by(Service.id)
+    )
+    services = tuple(ServiceSnapshot(*row) for row in rows)
+    version = hashlib.sha1(repr(services).encode()).hexdigest()[:20]
+    return Catalog(
+        version=version,
+        services=services,
+        active=tuple(service for service in services if service.actif),
+        by_id={service.id: service for service in services},
+    )
+
+
+class ServiceCatalogCache:
+    def __init__(self, generation_path: str):
+        self._catalog: Optional[Catalog] = None
+        self._lock = threading.Lock()
+        # Bumped on invalidation, so a load that raced with a write is not kept
+        self._epoch = DataVersion()
+        self._generation = SharedGeneration(generation_path)
+
+    def get(self, db: Session) -> Catalog:
+        if self._generation.changed():
+            self._clear()
+        catalog = self._catalog
+        if catalog is not None:
+            return catalog
+        epoch = self._epoch.value
+        if is_replica(db):
+            # A lagging replica would pin the old catalog until the next write
+            with SessionLocal() as primary:
+                catalog = load_catalog(primary)
+        else:
+            catalog = load_catalog(db)
+        with self._lock:
+            if self._epoch.value == epoch:
+                self._catalog = catalog
+        return catalog
+
+    def _clear(self):
+        with self._lock:
+            self._epoch.bump()
+            self._catalog = None
+
+    def invalidate(self):
+        """Drop the catalog here and in the other workers; call after a service write"""
+        self._generation.bump()
+        self._clear()
+
+
+service_catalog = ServiceCatalogCache(os.path.join(settings.SHARED_STATE_DIR, "services.gen"))
@@ -0,0 +1,156 @@
+"""
+Slow-query log (SLOW_QUERY_LOG_ENABLED).
+
+Engine event hooks time every statement; those slower than
+SLOW_QUERY_THRESHOLD_MS are kept in a bounded in-memory ring buffer with
+their shape (query_stats.normalize_statement), the types of their
+parameters (never the values: patient data stays out of the log), the
+duration and the route of the request that ran them.
+
+The first time a SELECT shape is seen slow, a background thread runs EXPLAIN
+on it with the original parameters (EXPLAIN QUERY PLAN on SQLite) and keeps
+the plan, so the request that hit the slow statement does not wait for it.
+GET /api/slow-queries (admin) lists the records of the worker that answers.
+"""
+import queue
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import event
+
+from cache import LRUCache, MISSING
+from config import get_settings
+from query_stats import normalize_statement
+
+settings = get_settings()
+
+# Plans kept (one per statement shape) and EXPLAINs waiting for the thread
+PLAN_CACHE_SIZE = 256
+EXPLAIN_QUEUE_SIZE = 32
+
+_scope: ContextVar[Optional[dict]] = ContextVar("slow_query_scope", default=None)
+
+
+def parameters_shape(parameters, executemany: bool = False):
+    """The types of the bound parameters, e.g. ["int", "str"] or {"nom": "str"}"""
+    if executemany:
+        rows = list(parameters or [])
+        return {"rows": len(rows), "each": parameters_shape(rows[0]) if rows else None}
+    if isinstance(parameters, dict):
+        return {name: type(value).__name__ for name, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return None
+
+
+class SlowQueryLog:
+    def __init__(self, threshold_ms: float, size: int):
+        self.threshold = threshold_ms / 1000
+        self.records = deque(maxlen=size)
+        self.plans = LRUCache(maxsize=PLAN_CACHE_SIZE)
+        self._explaining = set()
+        self._queue = queue.Queue(maxsize=EXPLAIN_QUEUE_SIZE)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def install(self, engine):
+        """Time the statements of `engine`; EXPLAINs run on the same engine"""
+        if not event.contains(engine, "before_cursor_execute", self._before_cursor_execute):
+            event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+            event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        context._slow_query_start = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, "_slow_query_start", None)
+        if start is None:
+            return
+        duration = time.perf_counter() - start
+        if duration >= self.threshold and not conn.info.get("slow_query_explain"):
+            self.record(statement, parameters, executemany, duration, conn.engine)
+
+    def record(self, statement: str, parameters, executemany: bool, duration: float, engine):
+        shape = normalize_statement(statement)
+        # None outside of a request (background threads, scripts)
+        route = None
+        scope = _scope.get()
+        if scope is not None:
+            matched = scope.get("route")
+            route = f"{scope['method']} {matched.path if matched is not None else scope['path']}"
+        self.records.append({
+            "at": datetime.utcnow().isoformat(timespec="seconds"),
+            "duration_ms": round(duration * 1000, 2),
+            "statement": shape,
+            "parameters": parameters_shape(parameters, executemany),
+            "route": route,
+        })
+        # Only reads are explained: EXPLAIN of a write is not portable
+        keyword = statement.lstrip()[:6].upper()
+        if not executemany and (keyword == "SELECT" or keyword.startswith("WITH")):
+            self._explain_later(shape, statement, parameters, engine)
+
+    def _explain_later(self, shape: str, statement: str, parameters, engine):
+        with self._lock:
+            if shape in self._explaining or self.plans.get(shape) is not MISSING:
+                return
+            try:
+                self._queue.put_nowait((shape, statement, parameters, engine))
+            except queue.Full:
+                return
+            self._explaining.add(shape)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="slow-query-explain", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            shape, statement, parameters, engine = self._queue.get()
+            prefix = "EXPLAIN QUERY PLAN " if engine.dialect.name == "sqlite" else "EXPLAIN "
+            try:
+                with engine.connect() as conn:
+                    # Not a slow query of its own
+                    conn.info["slow_query_explain"] = True
+                    try:
+                        result = conn.exec_driver_sql(prefix + statement, parameters)
+                        plan = [dict(row._mapping) for row in result]
+                    finally:
+                        conn.info.pop("slow_query_explain", None)
+            except Exception as e:
+                plan = {"error": str(e)}
+            self.plans.set(shape, plan)
+            with self._lock:
+                self._explaining.discard(shape)
+
+    def entries(self) -> list:
+        """Records, newest first, with the plan of their shape when captured"""
+        records = list(self.records)
+        records.reverse()
+        return [dict(record, explain=self.plans.get(record["statement"], None)) for record in records]
+
+    def clear(self):
+        self.records.clear()
+
+
+class SlowQueryMiddleware:
+    """Exposes the request scope to the hooks, for the route of each record"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = _scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _scope.reset(token)
+
+
+slow_query_log = SlowQueryLog(settings.SLOW_QUERY_THRESHOLD_MS, settings.SLOW_QUERY_BUFFER_SIZE)
@@ -0,0 +1,141 @@
+// Patient and service pickers of the appointment forms (/rdv, /agenda).
+// Patients are searched as you type (/api/patients/suggest) instead of
+// being embedded in the page; services are loaded once, when first needed.
+
+const PATIENT_SUGGEST_LIMIT = 10;
+const PATIENT_SUGGEST_DELAY = 200;  // ms of typing pause before searching
+
+function setupPatientPicker(input, hidden, menu) {
+    let timer = null;
+    let sequence = 0;
+    let active = -1;
+
+    function close() {
+        menu.classList.remove('show');
+        menu.replaceChildren();
+        active = -1;
+    }
+
+    function choose(patient) {
+        hidden.value = patient.id;
+        input.value = `${patient.prenom} ${patient.nom}`;
+        close();
+    }
+
+    function highlight(index) {
+        const items = menu.querySelectorAll('.dropdown-item');
+        if (!items.length) return;
+        active = (index + items.length) % items.length;
+        items.forEach((item, i) => item.classList.toggle('active', i === active));
+    }
+
+    function render(patients) {
+        menu.replaceChildren();
+        active = -1;
+        if (!patients.length) {
+            const empty = document.createElement('span');
+            empty.className = 'dropdown-item-text text-muted';
+            empty.textContent = 'Aucun client trouvé';
+            menu.appendChild(empty);
+        }
+        patients.forEach(patient => {
+            const item = document.createElement('button');
+            item.type = 'button';
+            item.className = 'dropdown-item';
+            item.textContent = `${patient.prenom} ${patient.nom}`;
+            if (patient.phone) {
+                const phone = document.createElement('small');
+                phone.className = 'text-muted ms-2';
+                phone.textContent = patient.phone;
+                item.appendChild(phone);
+            }
+            // mousedown fires before the input loses focus
+            item.addEventListener('mousedown', event => {
+                event.preventDefault();
+                choose(patient);
+            });
+            menu.appendChild(item);
+        });
+        menu.classList.add('show');
+    }
+
+    function search() {
+        const term = input.value.trim();
+        if (term.length < 2) {
+            close();
+            return;
+        }
+        const current = ++sequence;
+        fetch(`/api/patients/suggest?q=${encodeURIComponent(term)}&limit=${PATIENT_SUGGEST_LIMIT}`)
+            .then(response => {
+                if (!response.ok) throw new Error(`HTTP ${response.status}`);
+                return response.json();
+            })
+            .then(patients => {
+                // Drop answers to terms the user has typed past
+                if (current === sequence) render(patients);
+            })
+            .catch(() => showToast('Erreur lors de la recherche des clients', 'error'));
+    }
+
+    input.addEventListener('input', () => {
+        hidden.value = '';
+        clearTimeout(timer);
+        timer = setTimeout(search, PATIENT_SUGGEST_DELAY);
+    });
+    input.addEventListener('keydown', event => {
+        if (!menu.classList.contains('show')) return;
+        if (event.key === 'ArrowDown' || event.key === 'ArrowUp') {
+            event.preventDefault();
+            highlight(active + (event.key === 'ArrowDown' ? 1 : -1));
+        } else if (event.key === 'Enter' && active >= 0) {
+            event.preventDefault();
+            menu.querySelectorAll('.dropdown-item')[active].dispatchEvent(new MouseEvent('mousedown'));
+        } else if (event.key === 'Escape') {
+            close();
+        }
+    });
+    input.addEventListener('blur', close);
+    // form.reset() leaves hidden inputs untouched
+    if (input.form) {
+        input.form.addEventListener('reset', () => {
+            hidden.value = '';
+            close();
+        });
+    }
+}
+
+let servicesRequest = null;
+
+function loadServiceOptions(select, priceInput) {
+    if (select.dataset.loaded) return;
+    select.dataset.loaded = 'true';
+
+    if (!servicesRequest) {
+        servicesRequest = fetch('/api/services').then(response => {
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+            return response.json();
+        });
+    }
+    servicesRequest
+        .then(services => {
+            services.forEach(service => {
+                const option = document.createElement('option');
+                option.value = service.id;
+                option.textContent = `${service.nom} - ${parseFloat(service.prix_base).toFixed(2)} TND`;
+                option.dataset.prix = service.prix_base;
+                select.appendChild(option);
+            });
+            if (priceInput) {
+                select.addEventListener('change', () => {
+                    const prix = select.options[select.selectedIndex].dataset.prix;
+                    if (prix) priceInput.value = prix;
+                });
+            }
+        })
+        .catch(() => {
+            servicesRequest = null;
+            delete select.dataset.loaded;
+            showToast('Erreur lors du chargement des services', 'error');
+        });
+}
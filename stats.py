@@ -1,99 +1,168 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, text
+from sqlalchemy import func, and_, case, cast, select, true, Integer
 from datetime import date
 from decimal import Decimal
 from typing import Optional
-from models import Patient, Appointment, Payment, Service, AppointmentState
+from models import Patient, Service, AppointmentState, DailyAppointmentStats, DailyRevenueStats, CashRegisterDay
+from cache import LRUCache, DataVersion, MISSING
+from database import is_replica
+from config import get_settings
 
+settings = get_settings()
 
-def get_dashboard_stats(db: Session, date_from: Optional[date] = None, date_to: Optional[date] = None) -> dict:
-    """Get comprehensive dashboard statistics"""
+# Dashboard figures keyed by (date_from, date_to, today, data version, replica). Every
+# crud write bumps the version, so stale entries are simply never hit again;
+# the TTL bounds staleness for writes made by other worker processes.
+# Figures read on the replica are cached apart: computed before the replica
+# caught up, they must not be served to a user whose reads are on the primary.
+dashboard_cache = LRUCache(maxsize=settings.STATS_CACHE_SIZE, ttl=settings.STATS_CACHE_TTL)
+data_version = DataVersion()
 
-    # Basic counts
-    total_patients = db.query(func.count(Patient.id)).scalar()
 
-    query = db.query(Appointment)
-    if date_from:
-        query = query.filter(Appointment.date >= date_from)
-    if date_to:
-        query = query.filter(Appointment.date <= date_to)
+# Day names in the order the dashboard charts expect them
+DAY_NAMES = ["Lundi", "Mardi", "Mercredi", "Jeudi", "Vendredi", "Samedi", "Dimanche"]
 
-    total_rdv = query.count()
+# MySQL DAYOFWEEK: 1=Sunday, 2=Monday, 3=Tuesday, ..., 7=Saturday
+MYSQL_DAY_MAPPING = {
+    2: "Lundi", 3: "Mardi", 4: "Mercredi", 5: "Jeudi",
+    6: "Vendredi", 7: "Samedi", 1: "Dimanche"
+}
 
-    today = date.today()
-    rdv_passes = query.filter(Appointment.date < today).count()
-    rdv_futurs = query.filter(Appointment.date >= today).count()
-
-    # Revenue - sum all payments
-    payment_query = db.query(func.sum(Payment.montant))
-    if date_from or date_to:
-        payment_query = payment_query.join(Appointment)
-        if date_from:
-            payment_query = payment_query.filter(Appointment.date >= date_from)
-        if date_to:
-            payment_query = payment_query.filter(Appointment.date <= date_to)
-
-    revenu_total = payment_query.scalar() or Decimal("0")
-
-    # Caisse du jour
-    from crud import get_caisse_du_jour
-    caisse_jour = get_caisse_du_jour(db)
-
-    # Répartition par état
-    repartition_etat = {}
-    for state in AppointmentState:
-        count_query = query.filter(Appointment.etat == state)
-        repartition_etat[state.value] = count_query.count()
-
-    # RDV par jour de la semaine (0=Monday, 6=Sunday)
-    rdv_par_jour = {
-        "Lundi": 0, "Mardi": 0, "Mercredi": 0, "Jeudi": 0,
-        "Vendredi": 0, "Samedi": 0, "Dimanche": 0
-    }
+# SQLite strftime('%w'): 0=Sunday, 1=Monday, ..., 6=Saturday
+SQLITE_DAY_MAPPING = {
+    1: "Lundi", 2: "Mardi", 3: "Mercredi", 4: "Jeudi",
+    5: "Vendredi", 6: "Samedi", 0: "Dimanche"
+}
 
-    # Get appointments grouped by day of week (MySQL compatible)
-    # DAYOFWEEK returns 1=Sunday, 2=Monday, ..., 7=Saturday
-    appointments_by_day = db.query(
-        func.dayofweek(Appointment.date).label('day_of_week'),
-        func.count(Appointment.id).label('count')
-    ).filter(
-        and_(
-            Appointment.date >= date_from if date_from else True,
-            Appointment.date <= date_to if date_to else True
-        )
-    ).group_by(func.dayofweek(Appointment.date)).all()
-
-    # MySQL DAYOFWEEK: 1=Sunday, 2=Monday, 3=Tuesday, ..., 7=Saturday
-    day_mapping = {
-        2: "Lundi", 3: "Mardi", 4: "Mercredi", 5: "Jeudi",
-        6: "Vendredi", 7: "Samedi", 1: "Dimanche"
-    }
 
-    for day_num, count in appointments_by_day:
-        day_name = day_mapping.get(int(day_num), "Lundi")
-        rdv_par_jour[day_name] = count
+def _weekday_expr(db: Session, column):
+    """Dialect-specific day-of-week expression and its number -> name mapping"""
+    if db.get_bind().dialect.name == "sqlite":
+        return cast(func.strftime("%w", column), Integer), SQLITE_DAY_MAPPING
+    return func.dayofweek(column), MYSQL_DAY_MAPPING
 
-    # Top 5 services
-    top_services_query = db.query(
-        Service.nom,
-        func.count(Appointment.id).label('count')
-    ).join(Appointment).filter(
-        and_(
-            Appointment.date >= date_from if date_from else True,
-            Appointment.date <= date_to if date_to else True
-        )
-    ).group_by(Service.id, Service.nom).order_by(func.count(Appointment.id).desc()).limit(5)
 
-    top_services = [{"nom": nom, "count": count} for nom, count in top_services_query.all()]
+def _date_range_filter(column, date_from: Optional[date], date_to: Optional[date]):
+    conditions = []
+    if date_from:
+        conditions.append(column >= date_from)
+    if date_to:
+        conditions.append(column <= date_to)
+    return and_(true(), *conditions)
+
+
+def _appointment_aggregates(db: Session, date_from: Optional[date], date_to: Optional[date], today: date) -> dict:
+    """
+    Every appointment-side figure from the daily_appointment_stats rollup in a
+    single statement. Rows are grouped by (service, weekday), which yields at
+    most a few hundred groups whatever the range; they are folded into the
+    dashboard figures in Python. The service name is a correlated subquery so
+    it is looked up once per group.
+    """
+    rollup = DailyAppointmentStats
+    weekday, day_mapping = _weekday_expr(db, rollup.date)
+    weekday = weekday.label("day_of_week")
+    service_nom = select(Service.nom).where(Service.id == rollup.service_id).scalar_subquery()
+
+    columns = [
+        rollup.service_id,
+        service_nom.label("nom"),
+        weekday,
+        func.sum(rollup.total).label("total"),
+        func.sum(case((rollup.date < today, rollup.total), else_=0)).label("passes"),
+    ]
+    columns += [func.sum(getattr(rollup, state.value)).label(f"etat_{state.value}") for state in AppointmentState]
+
+    rows = db.query(*columns).filter(
+        _date_range_filter(rollup.date, date_from, date_to)
+    ).group_by(rollup.service_id, weekday).all()
+
+    total_rdv = 0
+    rdv_passes = 0
+    repartition_etat = {state.value: 0 for state in AppointmentState}
+    rdv_par_jour = {day_name: 0 for day_name in DAY_NAMES}
+    per_service = {}
+    names = {}
+
+    for row in rows:
+        total = int(row.total or 0)
+        total_rdv += total
+        rdv_passes += int(row.passes or 0)
+        for state in AppointmentState:
+            repartition_etat[state.value] += int(getattr(row, f"etat_{state.value}") or 0)
+        rdv_par_jour[day_mapping.get(int(row.day_of_week), "Lundi")] += total
+        if row.nom is not None and total:
+            names[row.service_id] = row.nom
+            per_service[row.service_id] = per_service.get(row.service_id, 0) + total
+
+    top_ids = sorted(per_service, key=per_service.get, reverse=True)[:5]
+    top_services = [{"nom": names[service_id], "count": per_service[service_id]} for service_id in top_ids]
 
     return {
-        "total_patients": total_patients,
         "total_rdv": total_rdv,
         "rdv_passes": rdv_passes,
-        "rdv_futurs": rdv_futurs,
-        "revenu_total": float(revenu_total),
-        "caisse_jour": float(caisse_jour),
+        "rdv_futurs": total_rdv - rdv_passes,
         "repartition_etat": repartition_etat,
         "rdv_par_jour": rdv_par_jour,
-        "top_services": top_services
+        "top_services": top_services,
+    }
+
+
+def _payment_aggregates(db: Session, date_from: Optional[date], date_to: Optional[date], today: date) -> dict:
+    """Patient count, revenue for the range (daily_revenue_stats) and today's cash box in one statement"""
+    total_patients = select(func.count(Patient.id)).scalar_subquery()
+    revenu_total = select(func.sum(DailyRevenueStats.total)).where(
+        _date_range_filter(DailyRevenueStats.date, date_from, date_to)
+    ).scalar_subquery()
+    caisse_jour = select(CashRegisterDay.total).where(CashRegisterDay.date == today).scalar_subquery()
+
+    row = db.query(
+        total_patients.label("total_patients"),
+        revenu_total.label("revenu_total"),
+        caisse_jour.label("caisse_jour"),
+    ).one()
+
+    return {
+        "total_patients": row.total_patients,
+        "revenu_total": row.revenu_total or Decimal("0"),
+        "caisse_jour": row.caisse_jour or Decimal("0"),
+    }
+
+
+def invalidate_dashboard_stats():
+    """Called by crud after every write that can change the dashboard figures"""
+    data_version.bump()
+
+
+def get_dashboard_cache_info() -> dict:
+    return {**dashboard_cache.info(), "data_version": data_version.value}
+
+
+def get_dashboard_stats(db: Session, date_from: Optional[date] = None, date_to: Optional[date] = None) -> dict:
+    """Get comprehensive dashboard statistics, served from the cache when the data has not changed"""
+    today = date.today()
+    key = (date_from, date_to, today, data_version.value, is_replica(db))
+
+    stats = dashboard_cache.get(key)
+    if stats is MISSING:
+        stats = compute_dashboard_stats(db, date_from, date_to, today)
+        dashboard_cache.set(key, stats)
+    return stats
+
+
+def compute_dashboard_stats(db: Session, date_from: Optional[date], date_to: Optional[date], today: date) -> dict:
+    """Dashboard statistics from the daily rollups (two statements per call)"""
+    appointments = _appointment_aggregates(db, date_from, date_to, today)
+    payments = _payment_aggregates(db, date_from, date_to, today)
+
+    return {
+        "total_patients": payments["total_patients"],
+        "total_rdv": appointments["total_rdv"],
+        "rdv_passes": appointments["rdv_passes"],
+        "rdv_futurs": appointments["rdv_futurs"],
+        "revenu_total": float(payments["revenu_total"]),
+        "caisse_jour": float(payments["caisse_jour"]),
+        "repartition_etat": appointments["repartition_etat"],
+        "rdv_par_jour": appointments["rdv_par_jour"],
+        "top_services": appointments["top_services"]
     }
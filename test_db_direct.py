@@ -1,5 +1,6 @@
+import os
 import sys
-sys.path.insert(0, r'C:\Users\KIRA\PycharmProjects\care')
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 # Direct database test - bypass the API
 from database import SessionLocal
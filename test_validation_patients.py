@@ -1,8 +1,9 @@
 """
 Quick test to verify validation patients page
 """
+import os
 import sys
-sys.path.insert(0, r'C:\Users\KIRA\PycharmProjects\care')
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from database import SessionLocal
 from crud import get_patients_requiring_validation
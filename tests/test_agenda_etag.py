@@ -0,0 +1,80 @@
+"""
+GET /api/agenda revalidation: 304 while the window is unchanged, 200 with a
+new ETag once an appointment in it is updated or paid.
+
+    python -m pytest tests/test_agenda_etag.py
+"""
+import os
+import sys
+import tempfile
+from datetime import date, time as dtime
+from decimal import Decimal
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+DB_FILE = os.path.join(tempfile.gettempdir(), "clinic_test_agenda_etag.db")
+if os.path.exists(DB_FILE):
+    os.remove(DB_FILE)
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_FILE}"
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+# Private cache generations and metrics snapshots, not the host-wide default
+os.environ["SHARED_STATE_DIR"] = tempfile.mkdtemp(prefix="clinic_test_state_")
+os.environ["PATIENT_INDEX_ENABLED"] = "false"
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import crud  # noqa: E402
+import schemas  # noqa: E402
+from auth import get_password_hash  # noqa: E402
+from database import engine, SessionLocal, Base  # noqa: E402
+from models import User, UserRole, PaymentMode  # noqa: E402
+
+WINDOW = {"start": "2025-03-01T00:00:00+01:00", "end": "2025-04-01T00:00:00+01:00"}
+
+
+def _revalidate(client, etag: str):
+    return client.get("/api/agenda", params=WINDOW, headers={"If-None-Match": etag})
+
+
+def test_agenda_etag():
+    import main
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        db.add(User(username="admin", password_hash=get_password_hash("admin123"), role=UserRole.admin))
+        db.commit()
+        patient = crud.create_patient(db, schemas.PatientCreate(nom="Agenda", prenom="Test"))
+        service = crud.create_service(db, schemas.ServiceCreate(nom="Detartrage", prix_base=Decimal("60")))
+        appointment = crud.create_appointment(db, schemas.AppointmentCreate(
+            patient_id=patient.id, service_id=service.id, date=date(2025, 3, 10), heure=dtime(9, 0), prix=Decimal("60"),
+        ))
+
+        with TestClient(main.app) as client:
+            client.post("/login", data={"username": "admin", "password": "admin123"}, follow_redirects=False)
+            response = client.get("/api/agenda", params=WINDOW)
+            assert response.status_code == 200
+            assert [event["id"] for event in response.json()] == [appointment.id]
+            etag = response.headers["ETag"]
+
+            response = _revalidate(client, etag)
+            assert response.status_code == 304
+            assert response.headers["ETag"] == etag
+
+            crud.update_appointment(db, appointment.id, schemas.AppointmentUpdate(heure=dtime(11, 0)))
+            response = _revalidate(client, etag)
+            assert response.status_code == 200
+            assert response.json()[0]["start"] == "2025-03-10T11:00:00"
+            assert response.headers["ETag"] != etag
+            etag = response.headers["ETag"]
+            assert _revalidate(client, etag).status_code == 304
+
+            crud.create_payment(db, schemas.PaymentCreate(appointment_id=appointment.id, montant=Decimal("25"), mode=PaymentMode.espece))
+            response = _revalidate(client, etag)
+            assert response.status_code == 200
+            assert response.json()[0]["extendedProps"]["verse"] == 25.0
+            assert response.headers["ETag"] != etag
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
@@ -0,0 +1,112 @@
+"""
+POST /api/rdv/series: recurrence expansion, the rows created for the free
+slots (returned by primary key) and the conflicts reported for taken ones.
+
+    python -m pytest tests/test_appointment_series.py
+"""
+import os
+import sys
+import tempfile
+from datetime import date, time as dtime
+from decimal import Decimal
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+DB_FILE = os.path.join(tempfile.gettempdir(), "clinic_test_series.db")
+if os.path.exists(DB_FILE):
+    os.remove(DB_FILE)
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_FILE}"
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+# Private cache generations and metrics snapshots, not the host-wide default
+os.environ["SHARED_STATE_DIR"] = tempfile.mkdtemp(prefix="clinic_test_state_")
+
+import pytest  # noqa: E402
+
+from database import engine, SessionLocal, Base  # noqa: E402
+from models import Appointment, AppointmentState, DailyAppointmentStats  # noqa: E402
+from recurrence import RecurrenceFrequency, MAX_OCCURRENCES, expand  # noqa: E402
+import crud  # noqa: E402
+import schemas  # noqa: E402
+
+NINE = dtime(9, 0)
+
+
+@pytest.fixture()
+def db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(bind=engine)
+
+
+def _series(db, **slots) -> schemas.AppointmentSeriesCreate:
+    patient = crud.create_patient(db, schemas.PatientCreate(nom="Serie", prenom="Test"))
+    service = crud.create_service(db, schemas.ServiceCreate(nom="Orthodontie", prix_base=Decimal("80")))
+    return schemas.AppointmentSeriesCreate(patient_id=patient.id, service_id=service.id, heure=NINE, prix=Decimal("80"), **slots)
+
+
+def test_expand():
+    monday = date(2025, 1, 6)
+    assert expand(monday, RecurrenceFrequency.weekly, count=4, byweekday=[3, 0]) == [
+        date(2025, 1, 6), date(2025, 1, 9), date(2025, 1, 13), date(2025, 1, 16),
+    ]
+    # Starts on its first matching weekday, every other week
+    assert expand(date(2025, 1, 7), RecurrenceFrequency.weekly, interval=2, until=date(2025, 2, 1), byweekday=[0, 2]) == [
+        date(2025, 1, 8), date(2025, 1, 20), date(2025, 1, 22),
+    ]
+    assert expand(monday, RecurrenceFrequency.daily, interval=3, until=date(2025, 1, 15)) == [
+        date(2025, 1, 6), date(2025, 1, 9), date(2025, 1, 12), date(2025, 1, 15),
+    ]
+    # Months without a 31st are skipped, not clamped
+    assert expand(date(2025, 1, 31), RecurrenceFrequency.monthly, count=3) == [
+        date(2025, 1, 31), date(2025, 3, 31), date(2025, 5, 31),
+    ]
+    with pytest.raises(ValueError):
+        expand(monday, RecurrenceFrequency.daily, until=date(2026, 1, 1))
+    assert len(expand(monday, RecurrenceFrequency.daily, count=MAX_OCCURRENCES)) == MAX_OCCURRENCES
+
+
+def test_series_creates_the_expanded_dates(db):
+    series = _series(
+        db, start_date=date(2025, 1, 6),
+        recurrence=schemas.AppointmentRecurrence(freq="weekly", count=4, byweekday=[0, 3]),
+    )
+    result = crud.create_appointment_series(db, series)
+
+    created = result["created"]
+    assert result["conflicts"] == []
+    assert [appt.date for appt in created] == expand(date(2025, 1, 6), RecurrenceFrequency.weekly, count=4, byweekday=[0, 3])
+    assert all(appt.patient.nom == "Serie" and appt.service.nom == "Orthodontie" for appt in created)
+    assert {appt.id for appt in created} == {row.id for row in db.query(Appointment.id)}
+    assert sum(row.total for row in db.query(DailyAppointmentStats)) == 4
+
+
+def test_series_reports_conflicts(db):
+    dates = [date(2025, 3, 3), date(2025, 3, 10), date(2025, 3, 17)]
+    series = _series(db, dates=dates, skip_conflicts=False)
+    taken = crud.create_appointment(db, schemas.AppointmentCreate(
+        patient_id=series.patient_id, service_id=series.service_id, date=dates[1], heure=NINE, prix=Decimal("80"),
+    ))
+    # A cancelled appointment does not hold its slot
+    cancelled = crud.create_appointment(db, schemas.AppointmentCreate(
+        patient_id=series.patient_id, service_id=series.service_id, date=dates[2], heure=NINE, prix=Decimal("80"),
+    ))
+    crud.update_appointment(db, cancelled.id, schemas.AppointmentUpdate(etat=AppointmentState.annule))
+
+    # All or nothing: the conflict is reported, no row is created
+    result = crud.create_appointment_series(db, series)
+    assert result["created"] == []
+    assert [(conflict.date, conflict.existing_id) for conflict in result["conflicts"]] == [(dates[1], taken.id)]
+    assert db.query(Appointment).count() == 2
+
+    # Skipping conflicts creates the free slots only
+    result = crud.create_appointment_series(db, series.model_copy(update={"skip_conflicts": True}))
+    assert [appt.date for appt in result["created"]] == [dates[0], dates[2]]
+    assert [conflict.existing_id for conflict in result["conflicts"]] == [taken.id]
+    assert taken.id not in {appt.id for appt in result["created"]}
+    assert db.query(Appointment).count() == 4
@@ -0,0 +1,59 @@
+"""
+CSV exports escape text cells that a spreadsheet would run as a formula.
+
+    python -m pytest tests/test_exports.py
+"""
+import csv
+import io
+import os
+import sys
+import tempfile
+from datetime import date, time as dtime
+from decimal import Decimal
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+DB_FILE = os.path.join(tempfile.gettempdir(), "clinic_test_exports.db")
+if os.path.exists(DB_FILE):
+    os.remove(DB_FILE)
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_FILE}"
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+# Private cache generations and metrics snapshots, not the host-wide default
+os.environ["SHARED_STATE_DIR"] = tempfile.mkdtemp(prefix="clinic_test_state_")
+
+from database import engine, SessionLocal, Base  # noqa: E402
+from models import Patient, Service, Appointment  # noqa: E402
+import exports  # noqa: E402
+
+
+def test_csv_escapes_formulas():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        patient = Patient(nom='=HYPERLINK("http://example.com","Cliquer")', prenom="+216 Test")
+        service = Service(nom="@Export formules", prix_base=Decimal("50"))
+        db.add_all([patient, service])
+        db.flush()
+        appointment = Appointment(
+            patient_id=patient.id, service_id=service.id, date=date.today(), heure=dtime(9, 0),
+            prix=Decimal("50"), verse=Decimal("0"), reste=Decimal("50"), notes="-2+3",
+        )
+        db.add(appointment)
+        db.commit()
+
+        stmt = exports.export_query("appointments", [Appointment.id == appointment.id])
+        content = b"".join(exports.iter_csv(db, "appointments", stmt)).decode("utf-8-sig")
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+    header, row = list(csv.reader(io.StringIO(content)))
+    cells = dict(zip(header, row))
+    assert cells["patient_nom"] == '\'=HYPERLINK("http://example.com","Cliquer")'
+    assert cells["patient_prenom"] == "'+216 Test"
+    assert cells["service"] == "'@Export formules"
+    assert cells["notes"] == "'-2+3"
+    # Numbers and dates are left alone
+    assert cells["prix"] == "50.00"
+    assert cells["date"] == date.today().isoformat()
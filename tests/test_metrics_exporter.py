@@ -0,0 +1,60 @@
+"""
+Snapshots of exited workers are folded into retired.json and deleted; the
+totals served at /metrics do not change.
+
+    python -m pytest tests/test_metrics_exporter.py
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+os.environ["SHARED_STATE_DIR"] = tempfile.mkdtemp(prefix="clinic_test_state_")
+
+from metrics import MetricsExporter, MetricsRegistry, RETIRED_FILE  # noqa: E402
+
+
+def _dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def _registry(requests: int) -> MetricsRegistry:
+    registry = MetricsRegistry()
+    for _ in range(requests):
+        registry.start("GET")
+        registry.finish("GET", "/api/rdv", 200, 0.01, 100)
+    return registry
+
+
+def _write(directory: str, name: str, snapshot: dict):
+    with open(os.path.join(directory, name), "w") as f:
+        json.dump(snapshot, f)
+
+
+def test_dead_workers_are_retired():
+    directory = tempfile.mkdtemp(prefix="clinic_test_metrics_")
+    exporter = MetricsExporter(_registry(1), directory, flush_interval=60)
+
+    dead = _registry(2).snapshot()
+    dead["in_progress"] = {"GET": 3}
+    _write(directory, f"{_dead_pid()}-aaaa.json", dead)
+    # Same pid as this process on another file: its owner exited
+    _write(directory, f"{os.getpid()}-bbbb.json", _registry(4).snapshot())
+
+    exposition = exporter.collect()
+    assert 'http_requests_total{method="GET",route="/api/rdv",status="200"} 7' in exposition
+    assert 'http_requests_in_progress{method="GET"} 0' in exposition
+    assert sorted(os.listdir(directory)) == [RETIRED_FILE]
+
+    # A later scrape reads the aggregate: same totals
+    exporter.flush()
+    assert exporter.collect() == exposition
+    assert sorted(os.listdir(directory)) == sorted([RETIRED_FILE, os.path.basename(exporter.path)])
@@ -0,0 +1,73 @@
+"""
+Bulk patient import of a mixed CSV: valid rows are imported, suspicious
+ones imported and flagged for validation, invalid ones rejected to the
+error file; each new patient is indexed under its own id.
+
+    python -m pytest tests/test_patient_import.py
+"""
+import csv
+import io
+import os
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+DB_FILE = os.path.join(tempfile.gettempdir(), "clinic_test_patient_import.db")
+if os.path.exists(DB_FILE):
+    os.remove(DB_FILE)
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_FILE}"
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+# Private cache generations and metrics snapshots, not the host-wide default
+os.environ["SHARED_STATE_DIR"] = tempfile.mkdtemp(prefix="clinic_test_state_")
+os.environ["PATIENT_INDEX_ENABLED"] = "false"
+
+from database import engine, SessionLocal, Base  # noqa: E402
+from models import Patient, PatientSearchToken  # noqa: E402
+import patient_import  # noqa: E402
+
+CSV = """nom,prenom,telephone,date_naissance
+Ben Salah,Amine,20123456,1980-05-01
+Trabelsi,Sarra,+216 20 123 456,
+,Sans Nom,22000000,
+Gharbi,Ines,123,
+Jaziri,Omar,98765432,1985-13-40
+Mejri,Lina,55555555,
+Haddad,Karim,20123456,
+Chebbi,Nour,71000000,
+"""
+
+
+def test_mixed_csv():
+    Base.metadata.create_all(bind=engine)
+    errors_path = os.path.join(tempfile.mkdtemp(prefix="clinic_test_import_"), "rejets.csv")
+    db = SessionLocal()
+    try:
+        # Two batches: Ben Salah and Trabelsi share a number inside the first,
+        # Haddad reuses it in the second
+        report = patient_import.import_patients(
+            db, io.BytesIO(CSV.encode("utf-8")), fmt="csv", errors_path=errors_path, batch_size=4,
+        )
+        assert (report["rows"], report["imported"], report["flagged"], report["rejected"]) == (8, 6, 4, 2)
+        assert report["done"] and report["errors_file"] == errors_path
+
+        flagged = {patient.nom: patient.requires_validation for patient in db.query(Patient)}
+        assert flagged == {
+            "Ben Salah": True, "Trabelsi": True, "Gharbi": True, "Haddad": True,
+            "Mejri": False, "Chebbi": False,
+        }
+
+        # Search tokens point at the row they were built from
+        for patient in db.query(Patient):
+            tokens = {row.token for row in db.query(PatientSearchToken).filter(PatientSearchToken.patient_id == patient.id)}
+            assert patient.nom.split()[-1].lower() in tokens
+            assert patient.phone.replace(" ", "").replace("+", "")[-8:] in tokens
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+    with open(errors_path, newline="", encoding="utf-8") as f:
+        rejected = list(csv.reader(f))[1:]
+    assert [int(row[0]) for row in rejected] == [4, 6]
+    assert "nom" in rejected[0][1] and "date_naissance" in rejected[1][1]
@@ -0,0 +1,86 @@
+"""
+A worker's patient index follows the writes of another worker by catching
+up on the changed rows and the deletion log, without reloading the table.
+
+The global patient_index (fed by crud) plays the writing worker; a second
+LivePatientIndex on the same generation file plays the other one.
+
+    python -m pytest tests/test_patient_index.py
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+DB_FILE = os.path.join(tempfile.gettempdir(), "clinic_test_patient_index.db")
+if os.path.exists(DB_FILE):
+    os.remove(DB_FILE)
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_FILE}"
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+# Private cache generations and metrics snapshots, not the host-wide default
+os.environ["SHARED_STATE_DIR"] = tempfile.mkdtemp(prefix="clinic_test_state_")
+os.environ["PATIENT_INDEX_ENABLED"] = "true"
+
+from sqlalchemy import insert  # noqa: E402
+
+from database import engine, SessionLocal, Base  # noqa: E402
+from models import Patient  # noqa: E402
+import crud  # noqa: E402
+import patient_index as patient_index_module  # noqa: E402
+import schemas  # noqa: E402
+from patient_index import LivePatientIndex, patient_index  # noqa: E402
+
+
+def _ready(index: LivePatientIndex):
+    deadline = time.monotonic() + 10
+    while not index.info()["ready"] or index.info()["building"]:
+        assert time.monotonic() < deadline, "patient index not built"
+        time.sleep(0.01)
+
+
+def _ids(index: LivePatientIndex, *terms) -> set:
+    return {patient["id"] for patient in index.search(list(terms), 20)}
+
+
+def test_other_worker_catches_up():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        crud.create_patient(db, schemas.PatientCreate(nom="Existant", prenom="Ali", phone="20000000"))
+        patient_index.start()
+        other = LivePatientIndex(patient_index._generation.path)
+        other.start()
+        _ready(patient_index)
+        _ready(other)
+        built = other._index
+
+        patient = crud.create_patient(db, schemas.PatientCreate(nom="Nouveau", prenom="Sami", phone="21111111"))
+        assert _ids(other, "nouv") == {patient.id}
+
+        crud.update_patient(db, patient.id, schemas.PatientUpdate(nom="Renomme"))
+        assert _ids(other, "renom") == {patient.id}
+        assert _ids(other, "nouv") == set()
+
+        crud.delete_patient(db, patient.id)
+        assert _ids(other, "renom") == set()
+        # Patched in place: no reload of the table
+        assert other._index is built
+
+        # A bulk write beyond the catch-up limit is rebuilt instead
+        stamp = datetime.utcnow()
+        db.execute(insert(Patient), [
+            {"nom": "Import", "prenom": f"P{i}", "phone": None, "created_at": stamp, "updated_at": stamp}
+            for i in range(patient_index_module.CATCH_UP_LIMIT + 1)
+        ])
+        db.commit()
+        patient_index.invalidate()
+        other.search(["import"], 20)
+        _ready(other)
+        assert other._index is not built
+        assert len(_ids(other, "import")) == 20
+    finally:
+        db.close()
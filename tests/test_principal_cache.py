@@ -0,0 +1,79 @@
+"""
+A role change or deactivation made with crud.update_user applies to the
+user's next request although their principal is cached: in this worker,
+and in another one (a subprocess standing in for a second worker).
+
+    python -m pytest tests/test_principal_cache.py
+"""
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+DB_FILE = os.path.join(tempfile.gettempdir(), "clinic_test_principal_cache.db")
+if os.path.exists(DB_FILE):
+    os.remove(DB_FILE)
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_FILE}"
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+# Private cache generations and metrics snapshots, not the host-wide default
+os.environ["SHARED_STATE_DIR"] = tempfile.mkdtemp(prefix="clinic_test_state_")
+os.environ["PATIENT_INDEX_ENABLED"] = "false"
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import auth  # noqa: E402
+import crud  # noqa: E402
+import schemas  # noqa: E402
+from auth import get_password_hash  # noqa: E402
+from database import engine, SessionLocal, Base  # noqa: E402
+from models import User, UserRole  # noqa: E402
+
+OTHER_WORKER = """
+import sys
+sys.path.insert(0, {root!r})
+import crud, schemas
+from database import SessionLocal
+db = SessionLocal()
+crud.update_user(db, {user_id}, schemas.UserUpdate(is_active=False))
+db.close()
+"""
+
+
+def _cached(client) -> bool:
+    return auth.principal_cache.get(client.cookies.get("access_token"), None) is not None
+
+
+def test_user_changes_apply_to_cached_principals():
+    import main
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        user = User(username="assistant", password_hash=get_password_hash("secret123"), role=UserRole.admin)
+        db.add(user)
+        db.commit()
+
+        with TestClient(main.app) as client:
+            response = client.post("/login", data={"username": "assistant", "password": "secret123"}, follow_redirects=False)
+            assert response.status_code == 302
+            assert client.get("/api/stats/cache").status_code == 200
+            assert _cached(client)
+
+            # Same worker
+            crud.update_user(db, user.id, schemas.UserUpdate(role=UserRole.staff))
+            assert client.get("/api/stats/cache").status_code == 403
+            assert client.get("/api/patients").status_code == 200
+            assert _cached(client)
+
+            # Another worker: only the shared generation file tells this one
+            subprocess.run(
+                [sys.executable, "-c", OTHER_WORKER.format(root=ROOT, user_id=user.id)],
+                check=True, env=os.environ.copy(), cwd=ROOT,
+            )
+            assert client.get("/api/patients").status_code == 401
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
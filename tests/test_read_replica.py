@@ -0,0 +1,94 @@
+"""
+Read-only routes read from READ_DATABASE_URL, writes and the reads of a user
+who just wrote go to the primary.
+
+Two SQLite files stand in for the primary and its replica; nothing
+replicates between them, so a row written through the API is visible on the
+replica only if the test copies it there.
+
+    python -m pytest tests/test_read_replica.py
+"""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+PRIMARY_FILE = os.path.join(tempfile.gettempdir(), "clinic_test_primary.db")
+REPLICA_FILE = os.path.join(tempfile.gettempdir(), "clinic_test_replica.db")
+for path in (PRIMARY_FILE, REPLICA_FILE):
+    if os.path.exists(path):
+        os.remove(path)
+os.environ["DATABASE_URL"] = f"sqlite:///{PRIMARY_FILE}"
+os.environ["READ_DATABASE_URL"] = f"sqlite:///{REPLICA_FILE}"
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+# Private cache generations and metrics snapshots, not the host-wide default
+os.environ["SHARED_STATE_DIR"] = tempfile.mkdtemp(prefix="clinic_test_state_")
+os.environ["PATIENT_INDEX_ENABLED"] = "false"
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+import database  # noqa: E402
+from database import Base, RECENT_WRITE_COOKIE, SessionLocal, ReadSessionLocal  # noqa: E402
+from models import Patient, User, UserRole  # noqa: E402
+from auth import get_password_hash  # noqa: E402
+
+pytestmark = pytest.mark.skipif(
+    database.read_engine is database.engine,
+    reason="settings were loaded without READ_DATABASE_URL; run this file on its own",
+)
+
+
+@pytest.fixture()
+def client():
+    import main
+
+    for bind in (database.engine, database.read_engine):
+        Base.metadata.drop_all(bind=bind)
+        Base.metadata.create_all(bind=bind)
+    db = SessionLocal()
+    try:
+        db.add(User(username="admin", password_hash=get_password_hash("admin123"), role=UserRole.admin))
+        db.commit()
+    finally:
+        db.close()
+
+    with TestClient(main.app) as client:
+        response = client.post("/login", data={"username": "admin", "password": "admin123"}, follow_redirects=False)
+        assert response.status_code == 302
+        client.cookies.delete(RECENT_WRITE_COOKIE)
+        yield client
+
+
+def _names(response) -> list:
+    assert response.status_code == 200
+    return [patient["nom"] for patient in response.json()]
+
+
+def test_writes_go_to_the_primary_and_reads_to_the_replica(client):
+    response = client.post("/api/patients", json={"nom": "Primaire", "prenom": "Test", "phone": "20000000"})
+    assert response.status_code == 200
+    assert RECENT_WRITE_COOKIE in response.cookies
+
+    db = ReadSessionLocal()
+    try:
+        assert db.query(Patient).count() == 0
+        db.add(Patient(nom="Replique", prenom="Test", phone="20000001"))
+        db.commit()
+    finally:
+        db.close()
+
+    # Right after the write: the user reads their own write on the primary
+    assert _names(client.get("/api/patients")) == ["Primaire"]
+    client.cookies.delete(RECENT_WRITE_COOKIE)
+    assert _names(client.get("/api/patients")) == ["Replique"]
+
+
+def test_expired_write_marker_reads_the_replica(client):
+    client.post("/api/patients", json={"nom": "Primaire", "prenom": "Test", "phone": "20000000"})
+    client.cookies.set(RECENT_WRITE_COOKIE, "0")
+    assert _names(client.get("/api/patients")) == []
+    # Detail routes stay on the primary
+    assert client.get("/api/patients/1").status_code == 200
@@ -0,0 +1,112 @@
+"""
+The rollups maintained by crud match a rebuild from the raw tables after
+every kind of write, and the portable UPDATE-then-INSERT upsert (dialects
+without a native one) adds to existing rows and creates missing ones.
+
+Runs against a throw-away SQLite file:
+
+    python -m pytest tests/test_rollups.py
+"""
+import os
+import sys
+import tempfile
+from datetime import date, time as dtime, timedelta
+from decimal import Decimal
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+DB_FILE = os.path.join(tempfile.gettempdir(), "clinic_test_rollups.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_FILE}"
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+# Private cache generations and metrics snapshots, not the host-wide default
+os.environ["SHARED_STATE_DIR"] = tempfile.mkdtemp(prefix="clinic_test_state_")
+
+import pytest  # noqa: E402
+
+from database import engine, SessionLocal, Base  # noqa: E402
+from models import CashRegisterDay, DailyRevenueStats, PaymentMode, AppointmentState  # noqa: E402
+from stats import compute_dashboard_stats  # noqa: E402
+import crud  # noqa: E402
+import rollups  # noqa: E402
+import schemas  # noqa: E402
+
+
+@pytest.fixture()
+def db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(bind=engine)
+
+
+def _figures(db) -> tuple:
+    today = date.today()
+    cash = [(row.date, row.total, row.espece, row.carte, row.nb_paiements) for row in db.query(CashRegisterDay).order_by(CashRegisterDay.date)]
+    return compute_dashboard_stats(db, None, None, today), cash
+
+
+def _assert_matches_rebuild(db, step: str):
+    maintained = _figures(db)
+    rollups.rebuild_rollups(db)
+    assert _figures(db) == maintained, f"rollups drifted after: {step}"
+
+
+def test_rollups_follow_the_writes(db):
+    patient = crud.create_patient(db, schemas.PatientCreate(nom="Rollup", prenom="Test"))
+    consultation = crud.create_service(db, schemas.ServiceCreate(nom="Consultation", prix_base=Decimal("50")))
+    couronne = crud.create_service(db, schemas.ServiceCreate(nom="Couronne", prix_base=Decimal("400")))
+    today = date.today()
+
+    appointment = crud.create_appointment(db, schemas.AppointmentCreate(
+        patient_id=patient.id, service_id=consultation.id, date=today, heure=dtime(9, 0), prix=Decimal("50"),
+    ))
+    _assert_matches_rebuild(db, "create")
+
+    crud.create_payment(db, schemas.PaymentCreate(appointment_id=appointment.id, montant=Decimal("20"), mode=PaymentMode.carte))
+    _assert_matches_rebuild(db, "payment")
+
+    crud.update_appointment(db, appointment.id, schemas.AppointmentUpdate(date=today - timedelta(days=3)))
+    _assert_matches_rebuild(db, "date change")
+
+    crud.update_appointment(db, appointment.id, schemas.AppointmentUpdate(etat=AppointmentState.valide))
+    _assert_matches_rebuild(db, "etat change")
+
+    crud.update_appointment(db, appointment.id, schemas.AppointmentUpdate(service_id=couronne.id, prix=Decimal("400")))
+    _assert_matches_rebuild(db, "service change")
+
+    crud.create_payment(db, schemas.PaymentCreate(appointment_id=appointment.id, montant=Decimal("30"), mode=PaymentMode.espece))
+    _assert_matches_rebuild(db, "second payment")
+
+    crud.update_appointment(db, appointment.id, schemas.AppointmentUpdate(etat=AppointmentState.annule))
+    _assert_matches_rebuild(db, "cancel")
+
+    # Paid appointments are cancelled, not deleted
+    with pytest.raises(ValueError):
+        crud.delete_appointment(db, appointment.id)
+    unpaid = crud.create_appointment(db, schemas.AppointmentCreate(
+        patient_id=patient.id, service_id=couronne.id, date=today, heure=dtime(10, 0), prix=Decimal("400"),
+    ))
+    assert crud.delete_appointment(db, unpaid.id)
+    _assert_matches_rebuild(db, "delete")
+
+
+def test_update_then_insert(db):
+    table = DailyRevenueStats.__table__
+    day, next_day = date(2001, 2, 3), date(2001, 2, 4)
+    rows = [
+        {"date": day, "total": Decimal("10"), "espece": Decimal("10"), "carte": 0, "virement": 0, "cheque": 0},
+        {"date": next_day, "total": Decimal("5"), "espece": 0, "carte": Decimal("5"), "virement": 0, "cheque": 0},
+    ]
+    columns = ["total", "espece", "carte", "virement", "cheque"]
+    rollups._update_then_insert(db, table, ["date"], columns, rows)
+    rollups._update_then_insert(db, table, ["date"], columns, rows[:1])
+    db.commit()
+
+    stats = {row.date: row for row in db.query(DailyRevenueStats).all()}
+    assert stats[day].total == Decimal("20") and stats[day].espece == Decimal("20")
+    assert stats[next_day].total == Decimal("5") and stats[next_day].carte == Decimal("5")